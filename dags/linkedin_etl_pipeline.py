@@ -3,25 +3,20 @@ from airflow.operators.python import PythonOperator
 from datetime import datetime
 from etl.csv_to_parquet import convert_csv_to_parquet
 from etl.listing_parquet_files import list_parquet_files
-from etl.cleaning_job_posting_staging import cleaning_job_posting_staging
-from etl.config import WANTED_COLUMNS, VAR_CHAR_LIMITS, NATURAL_KEY_COLUMNS
+from etl.config import WANTED_COLUMNS, VAR_CHAR_LIMITS, NATURAL_KEY_COLUMNS, WORKER_MEMORY_BYTES
 from etl.dedup_job_postings_etl import curated_job_posting
 from airflow.providers.amazon.aws.operators.athena import AthenaOperator
 from etl.athena_tables import CREATE_DB, CREATE_CURATED_JOB_POSTING, CREATE_JOB_POSTINGS_SKILLS_JUNCTION, CREATE_SKILLS_TABLE, CREATE_CURATED_SEARCH_CONTEXT,CREATE_JOB_TITLE_STAGING,CREATE_JOB_TITLE,CREATE_JOB_TYPE,CREATE_CURATED_LOCATION,CREATE_JOB_LEVEL,CREATE_CURATED_COMPANY,CREATE_CURATED_COMPANY_W_UNKNOWN
 from etl.athena_partitions import ADD_CURATED_JOB_POSTINGS_PARTITION_SQL, ADD_JOB_POSTINGS_SKILLS_JUNCTION_PARTITION_SQL, ADD_SKILLS_TABLE_PARTITION_SQL,ADD_CURATED_SEARCH_CONTEXT_PARTITION_SQL,ADD_JOB_TITLE_STAGING_PARTITION_SQL,ADD_JOB_TITLE_PARTITION_SQL, ADD_JOB_TYPE_PARTITION_SQL,ADD_CURATED_LOCATION_PARTITION_SQL,ADD_JOB_LEVEL_PARTITION_SQL,ADD_CURATED_COMPANY_PARTITION_SQL,ADD_CURATED_COMPANY_W_UNKNOWN_PARTITION_SQL
-from etl.skills_parsing_etl import cleaning_skills_junction_staging_1, build_skills_table
+from etl.skills_parsing_etl import build_skills_table
 from etl.dedup_job_postings_skills_stage import curate_job_postings_skills_stage_streaming
-from etl.search_context_build_etl import cleaning_search_context_table
 from etl.dedup_search_context import curate_search_context_stage_streaming
-from etl.job_title_etl import cleaning_job_title
 from etl.dedup_job_title import curate_job_titles_streaming
-from etl.job_type_etl import build_job_type
-from etl.location_etl import clean_location
 from etl.dedup_location_etl import curate_location_streaming
 from datetime import timedelta
-from etl.job_level_etl import build_job_level
-from etl.clean_company_etl import clean_company_parts
 from etl.dedup_company_parts_etl import curate_company_streaming
+from etl.raw_fan_out_etl import raw_fan_out
+from etl.parallel_parts_etl import memory_bounded_workers
 from etl.env import BUCKET, AWS_REGION, ATHENA_WORKGROUP, ATHENA_RESULTS_S3, ATHENA_DB
 from etl.env import RAW_ROOT_PREFIX, CLEAN_ROOT_PREFIX, CURATED_ROOT_PREFIX
 
@@ -38,14 +33,29 @@ def ingest_task(**run_info):
 bucket = BUCKET
 
 
-def transform_stage_job_postings(**run_info):
+def transform_raw_fan_out(**run_info):
+    #one scan of the raw partition feeds every cleaned table plus the job_type/job_level dimensions
     run_date = run_info['ds']
     prefix = f'{RAW_ROOT_PREFIX}/run_date={run_date}'
     files = list_parquet_files(bucket, prefix)
 
-    clean_prefix = f'{CLEAN_ROOT_PREFIX}/staging_job_postings/run_date={run_date}'
-    wanted_cols = WANTED_COLUMNS['job_postings_staging']
-    cleaning_job_posting_staging(files, wanted_cols, bucket, clean_prefix, debug=False)
+    prefixes = {
+        'job_postings_staging': f'{CLEAN_ROOT_PREFIX}/staging_job_postings/run_date={run_date}',
+        'job_postings_skills_staging': f'{CLEAN_ROOT_PREFIX}/job_postings_skills_staging/run_date={run_date}',
+        'search_context': f'{CLEAN_ROOT_PREFIX}/search_context/run_date={run_date}',
+        'job_title_staging': f'{CLEAN_ROOT_PREFIX}/job_title_staging/run_date={run_date}',
+        'location': f'{CLEAN_ROOT_PREFIX}/location/run_date={run_date}',
+        'company': f'{CLEAN_ROOT_PREFIX}/company/run_date={run_date}',
+        'company_w_unknown': f'{CLEAN_ROOT_PREFIX}/company_w_unknown/run_date={run_date}',
+        'job_type': f'{CURATED_ROOT_PREFIX}/job_type/run_date={run_date}',
+        'job_level': f'{CURATED_ROOT_PREFIX}/job_level/run_date={run_date}',
+    }
+    #resume=True: a retry skips raw parts already fanned out by the failed attempt (ledger keyed by part URI + ETag)
+    #use_cache=True: raw parts identical to an earlier run_date (same CSV snapshot) are copied, not recomputed
+    #workers: one per core, but only as many as the worker's free memory holds
+    workers = memory_bounded_workers(WORKER_MEMORY_BYTES['raw_fan_out'])
+    raw_fan_out(files, bucket, prefixes, WANTED_COLUMNS, debug=False, max_rows_per_part=250_000, workers=workers, resume=True,
+                use_cache=True)
 
 
 def transform_curate_job_postings(**run_info):
@@ -57,17 +67,9 @@ def transform_curate_job_postings(**run_info):
     key_columns = NATURAL_KEY_COLUMNS['job_postings_staging']
     var_char = VAR_CHAR_LIMITS['job_postings_staging']
     curated_prefix = f'{CURATED_ROOT_PREFIX}/staging_job_postings'
-    curated_job_posting(s3_parquet_files, key_columns, bucket, curated_prefix, wanted_cols, var_char, run_date)
-
-
-def transform_job_postings_skills_staging(**run_info):
-    run_date = run_info['ds']
-    prefix = f'{RAW_ROOT_PREFIX}/run_date={run_date}'
-    files = list_parquet_files(bucket, prefix)
+    #job_link cardinality is the largest in the pipeline, so use the compact hashed seen-keys store
+    curated_job_posting(s3_parquet_files, key_columns, bucket, curated_prefix, wanted_cols, var_char, run_date, dedup_backend='hash')
 
-    clean_prefix = f'{CLEAN_ROOT_PREFIX}/job_postings_skills_staging/run_date={run_date}'
-    wanted_cols = WANTED_COLUMNS['job_postings_skills_staging']
-    cleaning_skills_junction_staging_1(files, bucket, clean_prefix,wanted_cols, debug=False, batch_size=1,max_rows_per_part=250_000)
 
 def transform_curate_job_postings_skills_staging(**run_info):
     run_date = run_info['ds']
@@ -78,7 +80,11 @@ def transform_curate_job_postings_skills_staging(**run_info):
     key_columns = NATURAL_KEY_COLUMNS['job_postings_skills_staging']
     var_char = VAR_CHAR_LIMITS['job_postings_skills_staging']
     curated_prefix = f'{CURATED_ROOT_PREFIX}/job_postings_skills_stage'
-    curate_job_postings_skills_stage_streaming(s3_parquet_files,key_columns,bucket,curated_prefix,wanted_cols,var_char,run_date)
+    #largest table: shuffle into hash buckets on (job_skills, job_link) and curate the buckets in parallel, as many
+    #at once as cores and free memory allow
+    workers = memory_bounded_workers(WORKER_MEMORY_BYTES['job_postings_skills_staging'])
+    curate_job_postings_skills_stage_streaming(s3_parquet_files,key_columns,bucket,curated_prefix,wanted_cols,var_char,run_date,
+                                               buckets=16, workers=workers)
 
 def transform_build_skills_table(**run_info):
     run_date = run_info['ds']
@@ -89,15 +95,6 @@ def transform_build_skills_table(**run_info):
     build_skills_table(files, bucket, out_prefix, run_date)
 
     
-def transform_search_context(**run_info):
-    run_date = run_info['ds']
-    prefix = f'{RAW_ROOT_PREFIX}/run_date={run_date}'
-    files = list_parquet_files(bucket, prefix)
-
-    clean_prefix = f'{CLEAN_ROOT_PREFIX}/search_context/run_date={run_date}'
-    wanted_cols = WANTED_COLUMNS['search_context']
-    cleaning_search_context_table(files, wanted_cols, bucket, clean_prefix, debug=False)
-
 def transform_curate_search_context(**run_info):
     run_date = run_info['ds']
     clean_prefix = f'{CLEAN_ROOT_PREFIX}/search_context/run_date={run_date}'
@@ -109,15 +106,6 @@ def transform_curate_search_context(**run_info):
     curated_prefix = f'{CURATED_ROOT_PREFIX}/search_context'
     curate_search_context_stage_streaming(s3_parquet_files,key_columns,bucket,curated_prefix,wanted_cols,var_char,run_date)
 
-def transform_job_title_table_staging(**run_info):
-    run_date = run_info['ds']
-    prefix = f'{RAW_ROOT_PREFIX}/run_date={run_date}'
-    files = list_parquet_files(bucket, prefix)
-    
-    clean_prefix = f'{CLEAN_ROOT_PREFIX}/job_title_staging/run_date={run_date}'
-    cleaning_job_title(files,bucket,clean_prefix, debug=False) 
-
-
 def transform_curate_job_title_table(**run_info):
     run_date = run_info['ds']
     clean_prefix = f'{CLEAN_ROOT_PREFIX}/job_title_staging/run_date={run_date}'
@@ -128,23 +116,6 @@ def transform_curate_job_title_table(**run_info):
     curate_job_titles_streaming(s3_parquet_files,bucket,curated_prefix,var_char,run_date)
 
 
-def transform_job_type(**run_info):
-    run_date = run_info['ds']
-    prefix = f'{RAW_ROOT_PREFIX}/run_date={run_date}'
-    files = list_parquet_files(bucket, prefix)
-
-    clean_prefix = f'{CURATED_ROOT_PREFIX}/job_type/run_date={run_date}'
-    build_job_type(files, bucket, clean_prefix)
-
-def transform_location(**run_info):
-    run_date = run_info['ds']
-    prefix = f'{RAW_ROOT_PREFIX}/run_date={run_date}'
-    files = list_parquet_files(bucket, prefix)
-
-    clean_prefix = f'{CLEAN_ROOT_PREFIX}/location/run_date={run_date}'
-    clean_location(files, bucket, clean_prefix, debug=False)
-
-
 def transform_curate_location(**run_info):
     run_date = run_info['ds']
     clean_prefix = f'{CLEAN_ROOT_PREFIX}/location/run_date={run_date}'
@@ -156,23 +127,6 @@ def transform_curate_location(**run_info):
     curated_prefix = f'{CURATED_ROOT_PREFIX}/location/run_date={run_date}'
     curate_location_streaming(files, keys, bucket, curated_prefix, wanted_cols,var_char)
 
-def transform_job_level(**run_info):
-    run_date = run_info['ds']
-    prefix = f'{RAW_ROOT_PREFIX}/run_date={run_date}'
-    files = list_parquet_files(bucket, prefix)
-
-    clean_prefix = f'{CURATED_ROOT_PREFIX}/job_level/run_date={run_date}'
-    build_job_level(files, bucket, clean_prefix)
-
-def transform_company(**run_info):
-    run_date = run_info['ds']
-    clean_prefix = f'{RAW_ROOT_PREFIX}/run_date={run_date}'
-    files = list_parquet_files(bucket, clean_prefix)
-
-    clean_prefix = f'{CLEAN_ROOT_PREFIX}/company/run_date={run_date}'
-    clean_prefix_w_unknown = f'{CLEAN_ROOT_PREFIX}/company_w_unknown/run_date={run_date}'
-    clean_company_parts(files, bucket, clean_prefix, clean_prefix_w_unknown, debug=False)
-
 def transform_curate_company(**run_info):
     run_date = run_info['ds']
     clean_prefix = f'{CLEAN_ROOT_PREFIX}/company/run_date={run_date}'
@@ -204,9 +158,9 @@ with DAG(
         retry_delay=timedelta(minutes=2)
     )
 
-    transform_stage_job_postings_task = PythonOperator(
-        task_id='transform_stage_job_postings',
-        python_callable=transform_stage_job_postings,
+    transform_raw_fan_out_task = PythonOperator(
+        task_id='transform_raw_fan_out',
+        python_callable=transform_raw_fan_out,
         retries=5,
         retry_delay=timedelta(minutes=2)
     )
@@ -218,13 +172,6 @@ with DAG(
         retry_delay=timedelta(minutes=2)
     )
 
-    transform_job_postings_skills_staging_task = PythonOperator(
-        task_id='transform_job_postings_skills_staging',
-        python_callable=transform_job_postings_skills_staging,
-        retries=5,
-        retry_delay=timedelta(minutes=2)
-    )
-
     transform_curated_job_postings_skills_staging_task = PythonOperator(
         task_id='transform_curated_job_postings_skills_staging',
         python_callable=transform_curate_job_postings_skills_staging,
@@ -241,13 +188,6 @@ with DAG(
     )
 
 
-    transform_search_context_task = PythonOperator(
-        task_id='transform_search_context',
-        python_callable=transform_search_context,
-        retries=5,
-        retry_delay=timedelta(minutes=2)
-    )
-
     transform_curated_search_context_task = PythonOperator(
         task_id='transform_curated_search_context',
         python_callable=transform_curate_search_context,
@@ -256,13 +196,6 @@ with DAG(
     )
 
 
-    transform_job_title_table_staging_task = PythonOperator(
-        task_id='transform_job_title_staging',
-        python_callable=transform_job_title_table_staging,
-        retries=5,
-        retry_delay=timedelta(minutes=2)
-    )
-
     transform_curated_job_title_table_task = PythonOperator(
         task_id='transform_curated_job_title_table',
         python_callable=transform_curate_job_title_table,
@@ -270,20 +203,6 @@ with DAG(
         retry_delay=timedelta(minutes=2)
     )
 
-    transform_job_type_task = PythonOperator(
-        task_id='transform_job_type',
-        python_callable=transform_job_type,
-        retries=5,
-        retry_delay=timedelta(minutes=2),
-    )
-
-    transform_location_task = PythonOperator(
-        task_id='transform_location',
-        python_callable=transform_location,
-        retries=5,
-        retry_delay=timedelta(minutes=2),       
-    )
-
     transform_curated_location_task = PythonOperator(
         task_id='transform_curated_location',
         python_callable=transform_curate_location,
@@ -291,20 +210,6 @@ with DAG(
         retry_delay=timedelta(minutes=2),
     )
 
-    transform_job_level_task = PythonOperator(
-        task_id='transform_job_level',
-        python_callable=transform_job_level,
-        retries=5,
-        retry_delay=timedelta(minutes=2),
-    )
-
-    transform_company_task = PythonOperator(
-        task_id='transform_company',
-        python_callable=transform_company,
-        retries=5,
-        retry_delay=timedelta(minutes=2),       
-    )
-
     transform_curated_company_task = PythonOperator(
         task_id='transform_curated_company',
         python_callable=transform_curate_company,
@@ -528,32 +433,21 @@ with DAG(
 # DEPENDENCY CHAIN
 
 
-# 1)Raw ingest first
-ingest_task >> [
-    transform_stage_job_postings_task,
-    transform_job_postings_skills_staging_task,
-    transform_search_context_task,
-    transform_job_title_table_staging_task,
-    transform_job_type_task,
-    transform_location_task,
-    transform_job_level_task,
-    transform_company_task,
-]
+# 1)Raw ingest first, then a single fan-out scan of the raw partition
+ingest_task >> transform_raw_fan_out_task
 
 # 2)Cleaned to curated transforms
-transform_stage_job_postings_task >> transform_curated_job_postings_task
+transform_raw_fan_out_task >> [
+    transform_curated_job_postings_task,
+    transform_curated_job_postings_skills_staging_task,
+    transform_curated_search_context_task,
+    transform_curated_job_title_table_task,
+    transform_curated_location_task,
+    transform_curated_company_task,
+]
 
-transform_job_postings_skills_staging_task >> transform_curated_job_postings_skills_staging_task
 transform_curated_job_postings_skills_staging_task >> transform_build_skills_table_task
 
-transform_search_context_task >> transform_curated_search_context_task
-
-transform_job_title_table_staging_task >> transform_curated_job_title_table_task
-
-transform_location_task >> transform_curated_location_task
-
-transform_company_task >> transform_curated_company_task
-
 # 3)Athena DB must exist before any CREATE TABLE
 create_db_task >> [
     create_staging_job_postings_task,
@@ -584,17 +478,17 @@ create_db_task >> [
 [transform_curated_search_context_task, create_curated_search_context_task] >> add_search_context_partition_task
 
 #job_title staging + curated
-[transform_job_title_table_staging_task, create_job_title_staging_task] >> add_job_title_staging_partition_task
+[transform_raw_fan_out_task, create_job_title_staging_task] >> add_job_title_staging_partition_task
 [transform_curated_job_title_table_task, create_job_title_task] >> add_job_title_partition_task
 
 #job_type
-[transform_job_type_task, create_job_type_task] >> add_job_type_partition_task
+[transform_raw_fan_out_task, create_job_type_task] >> add_job_type_partition_task
 
 #location
 [transform_curated_location_task, create_curate_location_task] >> add_curated_location_partition_task
 
 # job_level
-[transform_job_level_task, create_job_level_task] >> add_job_level_partition_task
+[transform_raw_fan_out_task, create_job_level_task] >> add_job_level_partition_task
 
 # company + company_w_unknown
 [transform_curated_company_task, create_curated_company_task] >> add_curated_company_partition_task
@@ -1,8 +1,61 @@
 import pandas as pd
-from etl.unknown_placeholders_replace_etl import replace_unknown_placeholders
+from etl.text_normalise_etl import normalise_text
+from etl.unknown_placeholders_replace_etl import replace_unknown_placeholders, fill_unknown
 from etl.debug_tools_etl import debug_function
+from etl.parallel_parts_etl import run_parts
+from etl.parquet_writer_etl import write_parquet
+from etl.part_ledger_etl import PartLedger, LEDGER_NAME
+from etl.part_cache_etl import PartCache
 
-def clean_company_parts(s3_parquet_files, bucket, prefix, prefix_2, debug):
+def clean_company_frame(df):
+    """
+    Clean company for one raw part and return (company, company_w_unknown) frames
+
+    Only company/job_link are copied out, so the caller's frame is left untouched.
+
+    :param df: Raw DataFrame containing at least company and job_link
+    :return: Tuple of (company DataFrame, staging/link DataFrame)
+    """
+    df = df[['company','job_link']].copy()
+
+    df['company'] = normalise_text(df['company'], collapse_whitespace=False)
+
+    df_staging = pd.DataFrame({'company':df['company'],
+                               'job_link':df['job_link']})
+    #Convert messy unknown placeholders to NULLs) so null-handling is consistent.
+    df['company'] = replace_unknown_placeholders(df['company'])
+
+    #For the staging/link table do not keep NULL, otherwise a stable join value is lost
+    df['company'] = fill_unknown(df['company'], 'unknown_company')
+
+    #df_staging["company"] contains the raw value
+    #df_staging["company_plus_unknown"] is guaranteed non-null for linking/joins
+    df_staging['company_plus_unknown'] = df['company']
+
+    df = df[['company']]
+
+    return df, df_staging
+
+
+def _clean_company_part(df, n, bucket, prefix, prefix_2, debug):
+    #One input part -> one part in each of the two outputs. Part numbers start at 0
+    df, df_staging = clean_company_frame(df)
+
+    #Optional diagnostics for development/troubleshooting.
+    if debug:
+        debug_function(df, debug=True, columns=['company'])
+        debug_function(df_staging, debug=True, columns=['company','company_plus_unknown','job_link',])
+
+    out_path = f's3://{bucket}/{prefix}/part_{n:05d}.parquet'
+    write_parquet(df, out_path, table='company')
+
+    out_path_2 = f's3://{bucket}/{prefix_2}/part_{n:05d}.parquet'
+    write_parquet(df_staging, out_path_2, table='company_w_unknown')
+
+    return {'outputs': [out_path, out_path_2]}
+
+
+def clean_company_parts(s3_parquet_files, bucket, prefix, prefix_2, debug, read_options=None, workers=None, resume=False, use_cache=False):
     """
     Purpose:
     Build cleaned company outputs from raw parquet parts
@@ -21,36 +74,19 @@ def clean_company_parts(s3_parquet_files, bucket, prefix, prefix_2, debug):
     :param prefix: prefix for s3 file for company table
     :param prefix_2: prefix for s3 file for company_w_unknown table
     :param debug: If True, logs diagnostics, if False, does nothing
+    :param read_options: Optional prefetch settings passed to read_parts
+    :param workers: Optional process count (-1 for all cores). Default None runs serially
+    :param resume: If True, skip parts already cleaned by an earlier attempt (ledger at <prefix>/_ledger.json)
+    :param use_cache: If True, replay parts from identical inputs of an earlier run (etl/part_cache_etl.py)
     """
-    for n,file in enumerate(s3_parquet_files):
-        df = pd.read_parquet(file, columns=['company','job_link'])
-
-
-        df['company'] = df['company'].astype('string').str.casefold().str.strip()
-
-        df_staging = pd.DataFrame({'company':df['company'],
-                                   'job_link':df['job_link']})
-        #Convert messy unknown placeholders to NULLs) so null-handling is consistent.
-        df['company'] = replace_unknown_placeholders(df['company'])
-
-        #For the staging/link table do not keep NULL, otherwise a stable join value is lost
-        mask_condition = (df['company'].isna())
-        df['company'] = df['company'].mask(mask_condition, 'unknown_company')
-
-        #df_staging["company"] contains the raw value
-        #df_staging["company_plus_unknown"] is guaranteed non-null for linking/joins
-        df_staging['company_plus_unknown'] = df['company']
-
-        df = df[['company']]
-
-        #Optional diagnostics for development/troubleshooting.
-        if debug:
-            debug_function(df, debug=True, columns=['company'])
-            debug_function(df_staging, debug=True, columns=['company','company_plus_unknown','job_link',])
+    ledger = None
+    if resume:
+        ledger = PartLedger(bucket, f'{prefix}/{LEDGER_NAME}', config={'task': 'clean_company_parts', 'prefix_2': prefix_2})
 
-        df.to_parquet(f's3://{bucket}/{prefix}/part_{n:05d}.parquet',index=False)
+    cache = PartCache(bucket, 'clean_company_parts', {}, {'company': prefix, 'company_w_unknown': prefix_2}) if use_cache else None
 
-        df_staging.to_parquet(f's3://{bucket}/{prefix_2}/part_{n:05d}.parquet',index=False)
+    run_parts(_clean_company_part, s3_parquet_files, (bucket, prefix, prefix_2, debug),
+              columns=['company','job_link'], workers=workers, read_options=read_options, ledger=ledger, cache=cache)
         
         
 
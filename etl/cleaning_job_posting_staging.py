@@ -1,9 +1,41 @@
-import pandas as pd
+from etl.text_normalise_etl import normalise_frame
 from etl.debug_tools_etl import debug_function
 from etl.unknown_placeholders_replace_etl import replace_unknown_placeholders
+from etl.parallel_parts_etl import run_parts
+from etl.parquet_writer_etl import write_parquet
+from etl.part_ledger_etl import PartLedger, LEDGER_NAME
+from etl.part_cache_etl import PartCache
 
 
-def cleaning_job_posting_staging(s3_parquet_files, wanted_columns, bucket, prefix, debug=False):
+def clean_job_posting_frame(df, wanted_columns):
+    '''
+    Clean/normalise one raw job_postings frame (no deduplication)
+
+    Shared by cleaning_job_posting_staging and the raw fan-out stage so both produce identical parts.
+
+    :param df: Raw job_postings DataFrame (one parquet part)
+    :param wanted_columns: Columns to keep for schema creation
+    :return: Cleaned DataFrame
+    '''
+    df_new = normalise_frame(df, wanted_columns)
+
+    return replace_unknown_placeholders(df_new)
+
+
+def _clean_job_posting_part(df, i, wanted_columns, bucket, prefix, debug):
+    #One input part -> one output part. Part numbers start at 1
+    df_new = clean_job_posting_frame(df, wanted_columns)
+    #run the debug finction
+    if debug:
+        debug_function(df_new,True, wanted_columns)
+    #build cleaned dataframe
+    out_path = f's3://{bucket}/{prefix}/part_{i+1:05d}.parquet'
+    write_parquet(df_new, out_path, table='job_postings_staging')
+
+    return {'outputs': [out_path]}
+
+
+def cleaning_job_posting_staging(s3_parquet_files, wanted_columns, bucket, prefix, debug=False, read_options=None, workers=None, resume=False, use_cache=False):
     '''
     Docstring for cleaning_job_posting_staging
 
@@ -17,20 +49,17 @@ def cleaning_job_posting_staging(s3_parquet_files, wanted_columns, bucket, prefi
     :param bucket: S3 bucket name for output
     :param prefix: S3 prefix for output
     :param debug: If True, logs diagnostic summarise. Default False
+    :param read_options: Optional prefetch settings passed to read_parts
+    :param workers: Optional process count (-1 for all cores). Default None runs serially
+    :param resume: If True, skip parts already cleaned by an earlier attempt (ledger at <prefix>/_ledger.json)
     :return: None (writes parquet parts to s3)
     '''
-    n = 1
-    for file in s3_parquet_files:
-        df = pd.read_parquet(file)
-        df_new = df[wanted_columns].astype('string').apply(lambda col:col.str.replace(r'\s+', ' ', regex=True))
-        df_new = df_new.apply(lambda col:col.str.strip().str.casefold())
-
-        df_new = replace_unknown_placeholders(df_new)
-        #run the debug finction
-        if debug:
-            debug_function(df_new,True, wanted_columns)
-        #build cleaned dataframe
-        
-        df_new.to_parquet(f's3://{bucket}/{prefix}/part_{n:05d}.parquet',index=False)
-        
-        n+=1
+    ledger = None
+    if resume:
+        ledger = PartLedger(bucket, f'{prefix}/{LEDGER_NAME}', config={'task': 'cleaning_job_posting_staging', 'wanted_columns': wanted_columns})
+
+    #use_cache=True replays parts from identical inputs of an earlier run (content-addressed, see etl/part_cache_etl.py)
+    cache = PartCache(bucket, 'cleaning_job_posting_staging', {'wanted_columns': wanted_columns}, {'output': prefix}) if use_cache else None
+
+    run_parts(_clean_job_posting_part, s3_parquet_files, (wanted_columns, bucket, prefix, debug), columns=wanted_columns,
+              workers=workers, read_options=read_options, ledger=ledger, cache=cache)
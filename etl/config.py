@@ -33,3 +33,27 @@ NATURAL_KEY_COLUMNS = {'job_postings_staging': ['job_link'],
                        'job_postings_skills_staging':['job_skills','job_link'],
                        'search_context':['search_country','search_city','search_position'],
                        'location':['job_location']}
+
+
+#Low-cardinality text columns. They are read as Arrow dictionary arrays (pandas categoricals), normalised on
+#their distinct values only and written with parquet dictionary encoding
+DICTIONARY_COLUMNS = ['job_level', 'job_type', 'search_country', 'search_city', 'search_position', 'company']
+
+
+#Values replace_unknown_placeholders turns into NULL, per column. Columns without an entry use 'default'
+UNKNOWN_PLACEHOLDERS = {'default': ['','n/a','na','none','nan','-','?','unknown']}
+
+
+#Parquet write settings per table ('default' for the rest): compression codec ('snappy', 'zstd', ...) and rows
+#per row group (None keeps pyarrow's default)
+PARQUET_WRITE_OPTIONS = {'default': {'compression': 'snappy', 'row_group_size': None},
+                         #job_summary text dominates this table and compresses far better with zstd
+                         'job_postings_staging': {'compression': 'zstd'},
+                         #bounded row groups: a reader decodes one group at a time instead of the whole raw part
+                         'raw': {'row_group_size': 64 * 1024}}
+
+#Estimated peak memory of one worker process per parallel task: a raw fan-out part (max_rows_per_part rows with
+#job_summary plus the cleaned copies) and one skills junction hash bucket. memory_bounded_workers starts no more
+#workers than fit in the available memory
+WORKER_MEMORY_BYTES = {'raw_fan_out': 2 * 1024 ** 3,
+                       'job_postings_skills_staging': 1024 ** 3}
@@ -1,12 +1,94 @@
-import pandas as pd
+import csv
+import contextlib
+import tempfile
+import pyarrow as pa
+import pyarrow.csv as pv
+from etl.job_link_index_etl import JobLinkIndex, spill_batches, strip_job_link
+from etl.partition_publish_etl import PartitionPublisher
 from etl.env import LINKEDIN_DATA_DIR,BUCKET,RAW_ROOT_PREFIX
 import os
 
+#Raw part sizing, measured on the joined rows (job_summary text included). A part is flushed as soon as either
+#limit is reached (None switches a limit off, both None writes a single part).
+#Parts stay small enough for one fan-out worker to hold the part and its cleaned copies in memory
+TARGET_PART_ROWS = 100_000
+TARGET_PART_BYTES = None
+
+#Size of each CSV block handed to pyarrow's multithreaded parser
+CSV_BLOCK_SIZE = 64 * 1024 * 1024
+
+
+def _csv_options(path):
+    """
+    Build pyarrow CSV read/parse/convert options that read every column as a nullable string.
+
+    Types are forced because the streaming reader infers them from the first block only, and a later block that
+    disagrees would fail the whole ingest. Downstream transforms cast to string anyway.
+
+    Quoted values may contain newlines (job summaries do): newlines_in_values makes the block splitter respect
+    quotes, otherwise a multi-line value crossing a block boundary fails the read.
+    """
+    with open(path, newline='') as f:
+        header = next(csv.reader(f))
+
+    read_options = pv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE)
+    parse_options = pv.ParseOptions(newlines_in_values=True)
+    convert_options = pv.ConvertOptions(column_types={col: pa.string() for col in header}, strings_can_be_null=True)
+    return read_options, parse_options, convert_options
+
+
+def _read_side_table(path, spill_dir=None):
+    """
+    Read a job_link keyed side table (job_summary, job_skills) and index it by job_link.
+
+    Without spill_dir the file is read whole with the multithreaded reader. With spill_dir it is streamed block by
+    block into a memory-mapped Arrow file, so the side table never has to fit in memory.
+    """
+    read_options, parse_options, convert_options = _csv_options(path)
+
+    #normalise job_link first so can then join
+    if spill_dir:
+        reader = pv.open_csv(path, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+        batches = (strip_job_link(pa.Table.from_batches([batch])) for batch in reader)
+        table = spill_batches(batches, reader.schema, spill_dir)
+    else:
+        table = strip_job_link(pv.read_csv(path, read_options=read_options, parse_options=parse_options,
+                                           convert_options=convert_options))
+
+    return JobLinkIndex(table)
+
+
+def _part_row_limit(pending_rows, pending_bytes, target_part_rows, target_part_bytes):
+    #Translate the byte target into rows using the average row width seen so far
+    limits = []
+    if target_part_rows:
+        limits.append(target_part_rows)
+    if target_part_bytes and pending_rows:
+        limits.append(max(1, int(target_part_bytes // (pending_bytes / pending_rows))))
+    return min(limits) if limits else None
+
+
 # ** means this function can accept any number of named arguments, and I'll collect them into a dict
-def convert_csv_to_parquet(**run_info):
+def convert_csv_to_parquet(target_part_rows=TARGET_PART_ROWS, target_part_bytes=TARGET_PART_BYTES, spill_dir=None, **run_info):
     """
     Ingest raw CSV exports and write partitioned Parquet to S3.
     Airflow passes context kwargs. Use run_info['ds'] as the run_date partition key. This results in reproducibility and idempotent reruns at partition level).
+
+    linkedin_job_postings.csv is streamed through pyarrow's multithreaded CSV reader. Each batch is joined to
+    job_summary and job_skills as it arrives, and the joined rows are regrouped into parts of target_part_rows rows
+    and/or target_part_bytes (in-memory Arrow bytes of the joined rows, so the summary text counts).
+
+    job_summary and job_skills are indexed once by job_link (JobLinkIndex) and probed per batch. With spill_dir
+    they are kept in memory-mapped Arrow files on local disk instead of in memory, in a temporary directory that is
+    deleted when the ingest returns or fails.
+
+    Parts are published through a PartitionPublisher (table 'raw' in PARQUET_WRITE_OPTIONS: bounded row groups):
+    uploads run on the background writer pool while the next batches are parsed, and the run_date= prefix is only
+    replaced once every part is written, so parts left by an earlier run with a different part count are removed.
+
+    :param target_part_rows: Maximum rows per raw part (None for no row limit)
+    :param target_part_bytes: Approximate maximum bytes per raw part (None for no byte limit)
+    :param spill_dir: Optional local directory for memory-mapped side tables (their files are removed afterwards)
     """
     run_date = run_info['ds']
 
@@ -16,33 +98,47 @@ def convert_csv_to_parquet(**run_info):
     job_skills_path = os.path.join(base_dir, 'job_skills.csv')
     job_postings_path = os.path.join(base_dir, 'linkedin_job_postings.csv')
 
-    with open(job_summary_path) as f1:
-        job_summary = pd.read_csv(f1)
+    #Spilled side tables live in a temporary directory under spill_dir, removed once the ingest ends or fails
+    if spill_dir:
+        os.makedirs(spill_dir, exist_ok=True)
+    side_dir = tempfile.TemporaryDirectory(dir=spill_dir, prefix='side_tables_') if spill_dir else contextlib.nullcontext()
+
+    with side_dir as side_table_dir:
+        summary_index = _read_side_table(job_summary_path, side_table_dir)
+        skills_index = _read_side_table(job_skills_path, side_table_dir)
 
-    with open(job_skills_path) as f2:
-        job_skills = pd.read_csv(f2)
+        #process job_postings file as a stream of record batches as it is extremely large
+        read_options, parse_options, convert_options = _csv_options(job_postings_path)
+        reader = pv.open_csv(job_postings_path, read_options=read_options, parse_options=parse_options,
+                             convert_options=convert_options)
 
+        pending = []
+        pending_rows = 0
+        pending_bytes = 0
+        part = 1
 
-    summary_df = pd.DataFrame(job_summary)
-    skills_df = pd.DataFrame(job_skills)
+        #adding run date causes idempotency, partitioning, reproducibility
+        with PartitionPublisher(BUCKET, f'{RAW_ROOT_PREFIX}/run_date={run_date}', table='raw') as publisher:
+            for batch in reader:
+                #Probe the prebuilt job_link indexes instead of re-hashing the side tables for every part
+                joined = skills_index.join(summary_index.join(strip_job_link(pa.Table.from_batches([batch]))))
+                pending.append(joined)
+                pending_rows += joined.num_rows
+                pending_bytes += joined.nbytes
 
-    #normalise job_link first so can then merge
-    df_list = [summary_df, skills_df]
+                limit = _part_row_limit(pending_rows, pending_bytes, target_part_rows, target_part_bytes)
 
-    for item in df_list:
-        item['job_link'] = item['job_link'].astype('string')
-        #logging.info('data type values in column job_link: %s', item['job_link'].astype('string'))
-        item['job_link'] = item['job_link'].str.strip()
+                #Cut as many full parts as the buffered rows allow, carry the remainder over (no limit: one part at the end)
+                while limit is not None and pending_rows >= limit:
+                    table = pa.concat_tables(pending)
+                    publisher.write(table.slice(0, limit), f'part_{part:05d}.parquet')
+                    part += 1
 
-    #process job_postings file in chunks as it is extremely large
-    with open(job_postings_path) as f:
-        for i, chunk in enumerate(pd.read_csv(f, chunksize=10000)):
-            chunk['job_link'] = chunk['job_link'].astype('string').str.strip()
-            df = chunk.merge(summary_df, how='left', on='job_link')
-            df_1 = df.merge(skills_df, how='left', on='job_link')
+                    rest = table.slice(limit)
+                    pending = [rest]
+                    pending_rows = rest.num_rows
+                    pending_bytes = rest.nbytes
 
-            #write to s3
-            #adding run date causes idempotency, partitioning, reproducibility
-            
-            out_path = f's3://{BUCKET}/{RAW_ROOT_PREFIX}/run_date={run_date}/part_{i+1}.parquet'
-            df_1.to_parquet(out_path, index=False)
+            #write leftovers
+            if pending_rows:
+                publisher.write(pa.concat_tables(pending), f'part_{part:05d}.parquet')
@@ -0,0 +1,266 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from etl.parquet_reader_etl import STRING_DTYPE
+from etl.job_link_index_etl import spill_batches
+
+#Multi-column keys are encoded as one string for the hash and sqlite backends. Control characters never occur in the cleaned
+#text columns, so they can separate columns and stand in for null
+_COLUMN_SEP = '\x1f'
+_NA_TOKEN = '\x00'
+
+
+def key_frame(keys):
+    """
+    Normalise dedup keys to a DataFrame of string columns, so a key compares and hashes the same whatever dtype
+    a part was read with.
+
+    :param keys: Series (single key column) or DataFrame (composite key)
+    """
+    if isinstance(keys, pd.Series):
+        keys = keys.to_frame()
+    return keys.astype(STRING_DTYPE)
+
+
+def encode_keys(frame):
+    """
+    Encode every row of a key_frame as one string: columns joined by _COLUMN_SEP, null as _NA_TOKEN. Equal keys
+    (null included) give equal strings.
+
+    :param frame: DataFrame returned by key_frame
+    :return: STRING_DTYPE Series
+    """
+    frame = frame.fillna(_NA_TOKEN)
+    encoded = frame.iloc[:, 0]
+    for col in frame.columns[1:]:
+        encoded = encoded.str.cat(frame[col], sep=_COLUMN_SEP)
+    return encoded
+
+
+def hash_keys(keys):
+    """
+    Vectorised 64-bit hash of every row of a (possibly composite) key. Null hashes like any other value.
+
+    :param keys: Series or DataFrame of key columns
+    :return: numpy uint64 array
+    """
+    return pd.util.hash_pandas_object(key_frame(keys), index=False).to_numpy()
+
+
+class SetSeenKeys:
+    """
+    Exact cross-file dedup using an in-process Python set of keys (strings, or tuples for composite keys).
+
+    Reference implementation: every key costs Python objects and a per-row interpreter loop.
+    """
+
+    def __init__(self):
+        self.seen = set()
+
+    def filter_new(self, keys):
+        """
+        Return a boolean mask (numpy) that is True for the first occurrence of every key not seen in earlier calls,
+        and remember those keys. Null is treated as a key value like any other.
+
+        :param keys: Series or DataFrame of key columns
+        """
+        frame = key_frame(keys)
+        if frame.shape[1] == 1:
+            values = frame.iloc[:, 0].tolist()
+        else:
+            values = list(frame.itertuples(index=False, name=None))
+
+        is_new = np.zeros(len(values), dtype=bool)
+        for i, k in enumerate(values):
+            if k not in self.seen:
+                self.seen.add(k)
+                is_new[i] = True
+        return is_new
+
+    def close(self):
+        self.seen = set()
+
+
+class HashSeenKeys:
+    """
+    Exact cross-file dedup: a sorted NumPy array of the keys' 64-bit hashes in memory, with the keys themselves
+    spilled to local disk and only read back to confirm a hash hit.
+
+    Memory: 16 bytes per key (hash and key id), whatever the key length. Lookups and inserts are vectorised
+    (searchsorted / insert on the sorted array). Each batch's new keys are written once, encoded as one string per
+    key (see encode_keys), to a memory-mapped Arrow IPC file (see spill_batches): the OS pages them in when a hit
+    has to be confirmed and drops them again under memory pressure.
+
+    Exactness: a hash hit only counts as a duplicate when the stored key is equal, so two different keys sharing a
+    64-bit hash are both kept (they sit next to each other in the sorted array).
+    """
+
+    def __init__(self, max_bytes=None, spill_dir=None):
+        """
+        :param max_bytes: Optional cap on the in-memory hashes and key ids. Growing past it raises MemoryError
+        :param spill_dir: Optional directory for the key files (defaults to the system temp dir)
+        """
+        self.max_bytes = max_bytes
+        self.dir = tempfile.mkdtemp(prefix='seen_keys_', dir=spill_dir)
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        #Key id of each hash: position in the concatenation of key_chunks
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.key_chunks = []
+        self.chunk_starts = []
+
+    @property
+    def size(self):
+        return len(self.hashes)
+
+    @property
+    def nbytes(self):
+        return self.hashes.nbytes + self.ids.nbytes
+
+    def _check_size(self, extra=0):
+        if self.max_bytes is not None and self.nbytes + extra > self.max_bytes:
+            raise MemoryError(f'HashSeenKeys needs {self.nbytes + extra} bytes for {self.size} keys, above '
+                              f"max_bytes={self.max_bytes}. Use the 'sqlite' dedup backend for this table")
+
+    def _stored_keys_equal(self, ids, query, positions):
+        #Stored key of each id == query[positions], one Arrow take per key chunk involved
+        equal = np.zeros(len(ids), dtype=bool)
+        chunk_of = np.searchsorted(self.chunk_starts, ids, side='right') - 1
+        for c in np.unique(chunk_of):
+            rows = np.flatnonzero(chunk_of == c)
+            stored = self.key_chunks[c].take(pa.array(ids[rows] - self.chunk_starts[c]))
+            equal[rows] = pc.equal(stored, query.take(pa.array(positions[rows]))).to_numpy(zero_copy_only=False)
+        return equal
+
+    def _seen(self, hashes, query):
+        """
+        Which of the (distinct) query keys are already stored, comparing each against every stored key with the
+        same hash (a run in the sorted array, almost always of length 0 or 1).
+
+        :return: Tuple of (mask of stored keys, insertion position of every hash)
+        """
+        left = np.searchsorted(self.hashes, hashes, side='left')
+        run = np.searchsorted(self.hashes, hashes, side='right') - left
+        found = np.zeros(len(hashes), dtype=bool)
+        for k in range(int(run.max()) if len(run) else 0):
+            rows = np.flatnonzero((run > k) & ~found)
+            if rows.size:
+                found[rows] = self._stored_keys_equal(self.ids[left[rows] + k], query, rows)
+        return found, left
+
+    def filter_new(self, keys):
+        """
+        Return a boolean mask (numpy) that is True for the first occurrence of every key not seen in earlier calls,
+        and remember those keys. Null is treated as a key value like any other.
+
+        :param keys: Series or DataFrame of key columns
+        """
+        frame = key_frame(keys)
+        encoded = encode_keys(frame)
+        is_new = np.zeros(len(encoded), dtype=bool)
+        if not len(encoded):
+            return is_new
+
+        #First occurrence of each distinct key in this batch (exact, first wins), then look those up only
+        first = np.flatnonzero(~encoded.duplicated().to_numpy())
+        hashes = hash_keys(frame.iloc[first])
+        query = pa.array(encoded.iloc[first])
+        found, left = self._seen(hashes, query)
+
+        #New keys in hash order, so np.insert keeps the array sorted when several land on the same position
+        new = np.flatnonzero(~found)
+        new = new[np.argsort(hashes[new], kind='stable')]
+        if new.size:
+            self._check_size(extra=new.size * 16)
+            start = self.chunk_starts[-1] + len(self.key_chunks[-1]) if self.key_chunks else 0
+            batch = pa.record_batch([query.take(pa.array(new))], names=['key'])
+            self.key_chunks.append(spill_batches([batch], batch.schema, self.dir).column('key'))
+            self.chunk_starts.append(start)
+            self.hashes = np.insert(self.hashes, left[new], hashes[new])
+            self.ids = np.insert(self.ids, left[new], start + np.arange(new.size))
+
+        is_new[first[new]] = True
+        return is_new
+
+    def close(self):
+        #Drop the memory maps before deleting their files
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.key_chunks = []
+        self.chunk_starts = []
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+class SqliteSeenKeys:
+    """
+    Exact cross-file dedup spilled to a temporary SQLite database on local disk.
+
+    Memory is bounded by the SQLite page cache (max_bytes), so cardinality is limited by disk, not RAM.
+    """
+
+    def __init__(self, max_bytes=None, spill_dir=None):
+        """
+        :param max_bytes: Optional page cache size for SQLite
+        :param spill_dir: Optional directory for the database file (defaults to the system temp dir)
+        """
+        self.dir = tempfile.mkdtemp(prefix='seen_keys_', dir=spill_dir)
+        self.conn = sqlite3.connect(os.path.join(self.dir, 'seen_keys.sqlite'))
+        #Scratch database: durability is not needed, a crashed task starts again from scratch
+        self.conn.execute('PRAGMA journal_mode=OFF')
+        self.conn.execute('PRAGMA synchronous=OFF')
+        if max_bytes:
+            self.conn.execute(f'PRAGMA cache_size=-{max(int(max_bytes) // 1024, 1)}')
+        self.conn.execute('CREATE TABLE seen (k TEXT PRIMARY KEY) WITHOUT ROWID')
+        self.conn.execute('CREATE TEMP TABLE batch (k TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def filter_new(self, keys):
+        """
+        Return a boolean mask (numpy) that is True for the first occurrence of every key not seen in earlier calls,
+        and remember those keys. Null is treated as a key value like any other.
+
+        :param keys: Series or DataFrame of key columns
+        """
+        encoded = encode_keys(key_frame(keys))
+
+        first = ~encoded.duplicated().to_numpy()
+
+        batch = encoded[first].tolist()
+        self.conn.executemany('INSERT INTO batch (k) VALUES (?)', ((k,) for k in batch))
+        existing = {row[0] for row in self.conn.execute('SELECT b.k FROM batch b JOIN seen s ON s.k = b.k')}
+        self.conn.execute('INSERT OR IGNORE INTO seen (k) SELECT k FROM batch')
+        self.conn.execute('DELETE FROM batch')
+
+        return first & ~encoded.isin(existing).to_numpy()
+
+    def close(self):
+        self.conn.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+
+DEDUP_BACKENDS = {'set': SetSeenKeys, 'hash': HashSeenKeys, 'sqlite': SqliteSeenKeys}
+
+
+def make_seen_keys(backend='hash', max_bytes=None, spill_dir=None):
+    """
+    Build the "seen keys" store used for cross-file deduplication by the curate functions.
+
+    Usage: df = df.loc[seen.filter_new(df[key_columns])] keeps the first occurrence of each key across all parts
+    (within-part duplicates included), then seen.close() once the table is written.
+
+    :param backend: 'hash' (exact, default: 16 bytes of RAM per key for its 64-bit hash and id, the keys spilled to
+                    memory-mapped local files), 'set' (exact, Python set) or 'sqlite' (exact, on disk)
+    :param max_bytes: Memory cap. 'hash' raises MemoryError once its hashes and ids would exceed it, 'sqlite' uses it
+                      as its page cache size
+    :param spill_dir: Local directory for the 'hash' key files and the 'sqlite' database file
+    """
+    if backend not in DEDUP_BACKENDS:
+        raise ValueError(f'Unknown dedup backend {backend!r}. Expected one of {sorted(DEDUP_BACKENDS)}')
+    if backend == 'set':
+        return SetSeenKeys()
+    if backend == 'hash':
+        return HashSeenKeys(max_bytes=max_bytes, spill_dir=spill_dir)
+    return SqliteSeenKeys(max_bytes=max_bytes, spill_dir=spill_dir)
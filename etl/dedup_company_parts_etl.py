@@ -1,66 +1,56 @@
-import pandas as pd
-from etl.delete_s3_URI import delete_s3_prefix
-from etl.parquet_validation_etl import validate_table
+from etl.partition_publish_etl import PartitionPublisher
+from etl.parquet_validation_etl import TableValidator
+from etl.parquet_reader_etl import read_parts
+from etl.dedup_backends_etl import make_seen_keys
 
 def curate_company_streaming(s3_parquet_files, unknown_files, bucket, curated_prefix, curated_prefix_w_unknown,VAR_CHAR_LIMITS_company, 
-                             VAR_CHAR_LIMITS_company_w_unknown):       
+                             VAR_CHAR_LIMITS_company_w_unknown, read_options=None,
+                             dedup_backend='hash', dedup_max_bytes=None, dedup_spill_dir=None):       
 
-    out_base = f's3://{bucket}/{curated_prefix}'
-    
     #Cross-file dedup so each company appears once in curated output
-    seen = set()
+    seen = make_seen_keys(dedup_backend, max_bytes=dedup_max_bytes, spill_dir=dedup_spill_dir)
     n = 1
     wanted_column = ['company']
-    deleted=False
 
-    for file in s3_parquet_files:
-        # column projection: only read what is needed to minimise s3 timeouts
-        df = pd.read_parquet(file, columns=['company'])[['company']]
+    try:
+        # Idempotent rerun: stage the parts, then publish them over the curated company output in one step
+        #filter_new already keeps one row per company across chunks, so only totals are checked (at publish)
+        validator = TableValidator(wanted_column, VAR_CHAR_LIMITS_company, ['company'], check_duplicates=False)
+        with PartitionPublisher(bucket, curated_prefix, validator=validator) as publisher:
+            # column projection: only read what is needed to minimise s3 timeouts
+            for df in read_parts(s3_parquet_files, columns=['company'], read_options=read_options):
+                df = df[['company']]
 
-        # within-file dedup
-        df = df.drop_duplicates(subset=['company'], keep='first')
+                # within-file and global dedup
+                df = df.loc[seen.filter_new(df['company'])]
 
-        # global dedup
-        keys = df['company'].astype('string').tolist()
-        keep_mask = [k not in seen for k in keys]
+                if df.empty:
+                    continue
 
-        df = df.loc[keep_mask]
-        seen.update([k for k, keep in zip(keys, keep_mask) if keep])
+                validator.update(df)
 
-        if df.empty:
-            continue
-
-        validate_table(df, wanted_column, VAR_CHAR_LIMITS_company, natural_key_columns=['company'])
-
-        if not deleted:
-            # Idempotent rerun: clear curated company output once, then stream write parts
-            delete_s3_prefix(bucket, f"{curated_prefix}")
-            deleted=True
-        
-        df.to_parquet(f'{out_base}/part_{n:04d}.parquet', index=False)
-        n += 1
+                publisher.write(df, f'part_{n:04d}.parquet')
+                n += 1
+    finally:
+        seen.close()
 
 
 
  # CURATE COMPANY, COMPANY_W_UNKNOWN,JOB_LINK table (validate only)
 
-    out_base_unknowns = f's3://{bucket}/{curated_prefix_w_unknown}'
- 
-    deleted_1=False
     m = 1
     wanted_cols = ['job_link', 'company', 'company_plus_unknown']
 
-    for file in unknown_files:
-        df = pd.read_parquet(file, columns=wanted_cols)[wanted_cols]
-
-        if df.empty:
-            continue
+    #No cross-file dedup here: job_link duplicates are counted within each chunk, as before
+    validator = TableValidator(wanted_cols, VAR_CHAR_LIMITS_company_w_unknown, ['job_link'])
+    with PartitionPublisher(bucket, curated_prefix_w_unknown, validator=validator) as publisher:
+        for df in read_parts(unknown_files, columns=wanted_cols, read_options=read_options):
+            df = df[wanted_cols]
 
-        validate_table(df, wanted_cols, VAR_CHAR_LIMITS_company_w_unknown, natural_key_columns=['job_link'])
+            if df.empty:
+                continue
 
-        if not deleted_1:
-            delete_s3_prefix(bucket, f'{curated_prefix_w_unknown}')
-            deleted_1=True
+            validator.update(df)
 
-        df.to_parquet(f'{out_base_unknowns}/part_{m:04d}.parquet', index=False)
-        m += 1
+            publisher.write(df, f'part_{m:04d}.parquet')
+            m += 1
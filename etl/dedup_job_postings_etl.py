@@ -1,9 +1,20 @@
-import pandas as pd
-from etl.parquet_validation_etl import validate_table
-from etl.delete_s3_URI import delete_s3_prefix
-
-
-def curated_job_posting(s3_parquet_files, natural_key_columns,bucket,prefix,wanted_columns,VAR_CHAR_LIMITS,run_date):
+from etl.parquet_validation_etl import TableValidator
+from etl.partition_publish_etl import PartitionPublisher
+from etl.parquet_reader_etl import read_parts
+from etl.dedup_backends_etl import make_seen_keys
+
+
+def curated_job_posting(s3_parquet_files, natural_key_columns,bucket,prefix,wanted_columns,VAR_CHAR_LIMITS,run_date,read_options=None,
+                        dedup_backend='hash', dedup_max_bytes=None, dedup_spill_dir=None):
+    """
+    Deduplicate cleaned job postings on job_link across all input parts, validate and write the curated partition.
+
+    The cross-file "seen job_links" store is pluggable (see etl/dedup_backends_etl.py):
+    - 'hash': exact, sorted 64-bit hashes in memory (16 bytes per key, optional dedup_max_bytes cap), keys spilled
+      under dedup_spill_dir and read back only to confirm hash hits (default)
+    - 'set': exact, Python set of strings
+    - 'sqlite': exact, spilled to a local SQLite file under dedup_spill_dir, dedup_max_bytes as page cache
+    """
     #This function approach assumes a single natural key: job_link
     if natural_key_columns != ['job_link'] and natural_key_columns != ('job_link'):
         raise ValueError(
@@ -12,43 +23,36 @@ def curated_job_posting(s3_parquet_files, natural_key_columns,bucket,prefix,want
         )
 
     #Cross-file dedup to ensure one row per job_link across all input parts
-    seen_links = set()
+    seen_links = make_seen_keys(dedup_backend, max_bytes=dedup_max_bytes, spill_dir=dedup_spill_dir)
 
     #Partitioned output location for idempotent reruns of the same run_date
-    out_base = f's3://{bucket}/{prefix}/run_date={run_date}/'
     out_prefix_key = f'{prefix}/run_date={run_date}/'
-    
-    #delete output partition only once, and only after we have valid data
-    deleted = False
-    part = 1
-
-    for file in s3_parquet_files:
-        df = pd.read_parquet(file)
 
-        if wanted_columns:
-            df = df[wanted_columns]
-
-        df = df.drop_duplicates(subset=['job_link'], keep='first')
-
-        #Cross-file dedup: drop any job_links already written in earlier parts
-        mask_new = ~df['job_link'].isin(seen_links)
-        df = df.loc[mask_new]
+    part = 1
 
-        new_links = df['job_link'].dropna().astype('string').tolist()
-        seen_links.update(new_links)
+    try:
+        #Parts are staged in an attempt prefix and only published once every chunk validated
+        #filter_new already keeps one row per key across chunks, so only totals are checked (at publish)
+        validator = TableValidator(wanted_columns, VAR_CHAR_LIMITS, natural_key_columns, check_duplicates=False)
+        with PartitionPublisher(bucket, out_prefix_key, table='job_postings_staging', validator=validator) as publisher:
+            #Projection pushed down to the parquet reader: only wanted_columns are downloaded
+            for df in read_parts(s3_parquet_files, columns=wanted_columns or None, read_options=read_options):
 
-        #Skip empty chunks (nothing new to write)
-        if df.empty:
-            continue
+                if wanted_columns:
+                    df = df[wanted_columns]
 
-        #Validate before deleting existing output (prevents wiping good data if this run is bad)
-        validate_table(df, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
+                #Within-file and cross-file dedup: keep the first row of each job_link not written in earlier parts
+                df = df.loc[seen_links.filter_new(df['job_link'])]
 
-        #Idempotency: delete the run_date partition once it's known that there is least one valid chunk to write
-        if not deleted:
-            delete_s3_prefix(bucket, out_prefix_key)
-            deleted = True
+                #Skip empty chunks (nothing new to write)
+                if df.empty:
+                    continue
 
+                #Validation statistics, checked for the whole table before publishing (a bad run never reaches the live partition)
+                validator.update(df)
 
-        df.to_parquet(f'{out_base}part_{part:04d}.parquet', index=False)
-        part += 1
+                publisher.write(df, f'part_{part:04d}.parquet')
+                part += 1
+    finally:
+        #release the seen-keys store (the sqlite backend removes its spill file)
+        seen_links.close()
@@ -1,48 +1,56 @@
-import pandas as pd
-from etl.parquet_validation_etl import validate_table
-from etl.delete_s3_URI import delete_s3_prefix
-
-def curate_job_postings_skills_stage_streaming(s3_parquet_files, natural_key_columns,bucket,curated_prefix,wanted_columns,VAR_CHAR_LIMITS,run_date):
+from etl.parquet_validation_etl import TableValidator
+from etl.partition_publish_etl import PartitionPublisher
+from etl.parquet_reader_etl import read_parts
+from etl.dedup_backends_etl import make_seen_keys
+from etl.hash_partition_etl import curate_hash_partitioned
+
+def curate_job_postings_skills_stage_streaming(s3_parquet_files, natural_key_columns,bucket,curated_prefix,wanted_columns,VAR_CHAR_LIMITS,run_date,read_options=None,
+                                               dedup_backend='hash', dedup_max_bytes=None, dedup_spill_dir=None,
+                                               buckets=None, workers=None, shuffle_dir=None):
+    """
+    Deduplicate the (job_skills, job_link) junction across all cleaned parts, validate and write the curated partition.
+
+    Modes:
+    - buckets None: single streaming pass with one global seen-keys store
+    - buckets=K: hash-partitioned two-phase curation (see etl/hash_partition_etl.py). Parts are shuffled into K
+      buckets on the composite key under shuffle_dir (local dir or s3:// URI), then buckets are deduplicated and
+      validated in worker processes (-1 for all cores). Output is written only after every bucket validated.
+    """
     #check that have the expected natural key combo
     expected = ['job_skills', 'job_link']
     if list(natural_key_columns) != expected:
         raise ValueError(f'Expected natural_key_columns={expected}, got {natural_key_columns}')
 
-    out_base = f's3://{bucket}/{curated_prefix}/run_date={run_date}/'
-
     out_prefix_key = f'{curated_prefix}/run_date={run_date}/'
 
+    if buckets:
+        curate_hash_partitioned(s3_parquet_files, expected, bucket, out_prefix_key, wanted_columns, VAR_CHAR_LIMITS,
+                                buckets, workers=workers, shuffle_dir=shuffle_dir, read_options=read_options,
+                                dedup_backend=dedup_backend, table='job_postings_skills_staging',
+                                dedup_max_bytes=dedup_max_bytes, dedup_spill_dir=dedup_spill_dir)
+        return
+
     #cross-file dedup so each (job_skills, job_link) pair appears once
+    seen_keys = make_seen_keys(dedup_backend, max_bytes=dedup_max_bytes, spill_dir=dedup_spill_dir)
     part = 1
-    seen_keys = set()
-    part = 1
-    deleted=False
-
-    for file in s3_parquet_files:
-        df = pd.read_parquet(file)
-
-        df = df[wanted_columns]
-        df = df.drop_duplicates(subset=expected, keep='first')
-
-        #Build tuple keys as strings for consistent comparisons across files
-        key_df = df[expected].astype('string')
-        keys = list(zip(key_df['job_skills'], key_df['job_link']))
 
-        #Streaming global dedup across files
-        keep_mask = [k not in seen_keys for k in keys]
-        df = df.loc[keep_mask]
+    try:
+        #filter_new already keeps one row per key across chunks, so only totals are checked (at publish)
+        validator = TableValidator(wanted_columns, VAR_CHAR_LIMITS, natural_key_columns, check_duplicates=False)
+        with PartitionPublisher(bucket, out_prefix_key, table='job_postings_skills_staging', validator=validator) as publisher:
+            for df in read_parts(s3_parquet_files, columns=wanted_columns, read_options=read_options):
 
-        #Update seen set
-        seen_keys.update([k for k, keep in zip(keys, keep_mask) if keep])
+                df = df[wanted_columns]
 
-        if df.empty:
-            continue
+                #Streaming dedup within-file and across files, the composite key is hashed column-wise as strings
+                df = df.loc[seen_keys.filter_new(df[expected])]
 
-        validate_table(df, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
+                if df.empty:
+                    continue
 
-        if not deleted:
-            delete_s3_prefix(bucket, out_prefix_key)
-            deleted=True
+                validator.update(df)
 
-        df.to_parquet(f'{out_base}part_{part:04d}.parquet', index=False)
-        part += 1
+                publisher.write(df, f'part_{part:04d}.parquet')
+                part += 1
+    finally:
+        seen_keys.close()
@@ -1,28 +1,27 @@
 import pandas as pd
+import pyarrow.compute as pc
 from etl.parquet_validation_etl import validate_table
-from etl.delete_s3_URI import delete_s3_prefix
+from etl.partition_publish_etl import PartitionPublisher
+from etl.parquet_reader_etl import read_parts, STRING_DTYPE
 
-def curate_job_titles_streaming(s3_parquet_files,bucket,curated_prefix,var_char,run_date):
+def curate_job_titles_streaming(s3_parquet_files,bucket,curated_prefix,var_char,run_date,read_options=None):
     #Curated output is partitioned by run_date for idempotent reruns
     out_prefix = f'{curated_prefix}/run_date={run_date}'
 
-    #Make an array of unique canonical_job_title values across all input parts
-    seen = set()
+    #Make an array of unique canonical_job_title values across all input parts (kept Arrow-backed, no Python set)
+    part_uniques = []
 
-    for file in s3_parquet_files:
-        df = pd.read_parquet(file, columns=['canonical_job_title'])
-        vals = df['canonical_job_title'].dropna().astype('string').unique().tolist()
-        for v in vals:
-            seen.add(v)
+    #Null titles are dropped by the reader (row filter pushed down to pyarrow.dataset)
+    for df in read_parts(s3_parquet_files, columns=['canonical_job_title'], filter=pc.field('canonical_job_title').is_valid(),
+                         read_options=read_options):
+        part_uniques.append(pd.Series(df['canonical_job_title'].dropna().astype(STRING_DTYPE).unique(), dtype=STRING_DTYPE))
 
-    canonical_df = pd.DataFrame({'canonical_job_title': list(seen)})
+    titles = pd.concat(part_uniques, ignore_index=True).drop_duplicates() if part_uniques else pd.Series([], dtype=STRING_DTYPE)
+    canonical_df = pd.DataFrame({'canonical_job_title': titles.reset_index(drop=True)})
     
     # Validate uniqueness + varchar limits before deleting/writing
     validate_table(canonical_df,wanted_columns=['canonical_job_title'],VAR_CHAR_LIMITS=var_char,natural_key_columns=['canonical_job_title'])
 
-    #Idempotency: delete the run_date partition once there is at least one bit of valid data to write
-    delete_s3_prefix(bucket, out_prefix)
-
-    
-    out_path = f's3://{bucket}/{out_prefix}/data.parquet'
-    canonical_df.to_parquet(out_path, index=False)
+    #Idempotency: publish replaces the run_date partition only once the new data has been written
+    with PartitionPublisher(bucket, out_prefix) as publisher:
+        publisher.write(canonical_df, 'data.parquet')
@@ -1,40 +1,34 @@
-import pandas as pd
-from etl.parquet_validation_etl import validate_table
-from etl.delete_s3_URI import delete_s3_prefix
+from etl.parquet_validation_etl import TableValidator
+from etl.partition_publish_etl import PartitionPublisher
+from etl.parquet_reader_etl import read_parts
+from etl.dedup_backends_etl import make_seen_keys
 
 
-def curate_location_streaming(s3_parquet_files,natural_key_columns,bucket,curated_prefix,wanted_columns,VAR_CHAR_LIMITS):
-    out_base = f's3://{bucket}/{curated_prefix}/'
-
+def curate_location_streaming(s3_parquet_files,natural_key_columns,bucket,curated_prefix,wanted_columns,VAR_CHAR_LIMITS,read_options=None,
+                              dedup_backend='hash', dedup_max_bytes=None, dedup_spill_dir=None):
     #Cross-file dedup so each location appears once across all input parts
-    seen = set()
+    seen = make_seen_keys(dedup_backend, max_bytes=dedup_max_bytes, spill_dir=dedup_spill_dir)
     n = 1
-    deleted=False
-
-    for file in s3_parquet_files:
-        #Read only the column needed for this curated dimension-style output as it causes fewer S3 timeouts
-        df = pd.read_parquet(file)[['job_location']]
-
-        df = df.drop_duplicates(subset=natural_key_columns, keep='first')
 
-        #Cross-file dedup: keep only locations not already produced
-        keys = df['job_location'].astype('string').tolist()
-        keep_mask = [k not in seen for k in keys]
+    try:
+        #Idempotent reruns: refreshed parts replace the curated output only when the whole table has been written
+        #filter_new already keeps one row per key across chunks, so only totals are checked (at publish)
+        validator = TableValidator(wanted_columns, VAR_CHAR_LIMITS, natural_key_columns, check_duplicates=False)
+        with PartitionPublisher(bucket, curated_prefix, validator=validator) as publisher:
+            for df in read_parts(s3_parquet_files, columns=['job_location'], read_options=read_options):
+                #Keep only the column needed for this curated dimension-style output
+                df = df[['job_location']]
 
-        df = df.loc[keep_mask]
-        #Update seen with the new locations kept
-        seen.update([k for k, keep in zip(keys, keep_mask) if keep])
-        
-        #Skip if nothing new to write from this part
-        if df.empty:
-            continue
+                #Within-file and cross-file dedup: keep only locations not already produced
+                df = df.loc[seen.filter_new(df[natural_key_columns])]
 
-        validate_table(df, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
+                #Skip if nothing new to write from this part
+                if df.empty:
+                    continue
 
-        #Idempotent reruns: clear existing curated outputs before writing refreshed parts
-        if not deleted:
-            delete_s3_prefix(bucket, f'{curated_prefix}/')
-            deleted=True
+                validator.update(df)
 
-        df.to_parquet(f'{out_base}part_{n:04d}.parquet', index=False)
-        n+=1
+                publisher.write(df, f'part_{n:04d}.parquet')
+                n+=1
+    finally:
+        seen.close()
@@ -1,50 +1,39 @@
-import pandas as pd
-from etl.parquet_validation_etl import validate_table
-from etl.delete_s3_URI import delete_s3_prefix
+from etl.parquet_validation_etl import TableValidator
+from etl.partition_publish_etl import PartitionPublisher
+from etl.parquet_reader_etl import read_parts
+from etl.dedup_backends_etl import make_seen_keys
 
 
-def curate_search_context_stage_streaming(s3_parquet_files,natural_key_columns,bucket,curated_prefix,wanted_columns,VAR_CHAR_LIMITS,run_date):
+def curate_search_context_stage_streaming(s3_parquet_files,natural_key_columns,bucket,curated_prefix,wanted_columns,VAR_CHAR_LIMITS,run_date,read_options=None,
+                                          dedup_backend='hash', dedup_max_bytes=None, dedup_spill_dir=None):
     expected = ['search_country', 'search_city', 'search_position']
     if list(natural_key_columns) != expected:
         raise ValueError(f'Expected natural_key_columns={expected}, got {natural_key_columns}')
 
-    out_base = f's3://{bucket}/{curated_prefix}/run_date={run_date}/'
-
-    # idempotent reruns: clear the target partition
+    # idempotent reruns: the target partition is replaced on publish
     out_prefix_key = f'{curated_prefix}/run_date={run_date}/'
     
 
-    seen_keys = set()
+    seen_keys = make_seen_keys(dedup_backend, max_bytes=dedup_max_bytes, spill_dir=dedup_spill_dir)
     part = 1
-    deleted=False
-    for file in s3_parquet_files:
-        df = pd.read_parquet(file)
-
-        df = df[wanted_columns]
-
-        # dedup within-file
-        df = df.drop_duplicates(subset=expected, keep='first')
-
-        # build tuple keys as strings for consistent hashing
-        key_df = df[expected].astype('string')
-        keys = list(zip(key_df['search_country'], key_df['search_city'], key_df['search_position']))
-
-        # streaming global dedup across files
-        keep_mask = [k not in seen_keys for k in keys]
-        df = df.loc[keep_mask]
+    try:
+        #filter_new already keeps one row per key across chunks, so only totals are checked (at publish)
+        validator = TableValidator(wanted_columns, VAR_CHAR_LIMITS, natural_key_columns, check_duplicates=False)
+        with PartitionPublisher(bucket, out_prefix_key, validator=validator) as publisher:
+            for df in read_parts(s3_parquet_files, columns=wanted_columns, read_options=read_options):
 
-        # update global set
-        seen_keys.update([k for k, keep in zip(keys, keep_mask) if keep])
+                df = df[wanted_columns]
 
-        if df.empty:
-            continue
+                # streaming dedup within-file and across files on the composite key (hashed as strings)
+                df = df.loc[seen_keys.filter_new(df[expected])]
 
-        # validate this chunk before writing
-        validate_table(df, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
+                if df.empty:
+                    continue
 
-        if not deleted:
-            delete_s3_prefix(bucket, out_prefix_key)
-            deleted=True
+                # gather this chunk's statistics, the table is validated before publishing
+                validator.update(df)
 
-        df.to_parquet(f'{out_base}part_{part:04d}.parquet', index=False)
-        part += 1
+                publisher.write(df, f'part_{part:04d}.parquet')
+                part += 1
+    finally:
+        seen_keys.close()
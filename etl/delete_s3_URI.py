@@ -1,40 +1,92 @@
 import boto3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-def delete_s3_prefix(bucket, prefix):
+#Concurrent delete_objects requests. Listing keeps going while earlier batches are being deleted
+DELETE_WORKERS = 8
+
+
+def _delete_batch(s3, bucket, batch):
+    resp = s3.delete_objects(Bucket=bucket, Delete={'Objects': batch})
+    return len(resp.get('Deleted', [])), resp.get('Errors', [])
+
+
+def delete_s3_keys(bucket, keys, max_workers=DELETE_WORKERS, s3=None):
     """
-    Delete all objects under an S3 prefix
-    
-    Purpose:
-    - Deleting a partition before rewriting it makes reruns idempotent
-      (prevents mixing old and new parquet parts under the same run_date)
+    Delete an iterable of object keys in concurrent 1000-key delete_objects batches
 
     Implementation notes:
-    - Uses a paginator because listing can exceed 1000 keys.
-    - Deletes in batches of 1000 because delete_objects has a 1000-key limit per request.
+    - Batches are deleted concurrently on a thread pool while keys are still being produced (e.g. listed). At most
+      2 * max_workers batches are in flight, so memory stays bounded on very large prefixes.
+    - delete_objects reports per-key failures in its response instead of raising. They are collected, printed
+      and raised as a RuntimeError once every batch has been attempted.
 
     :param bucket: S3 bucket name
-    :param prefix: Key prefix to delete under 
+    :param keys: Iterable of object keys
+    :param max_workers: Number of concurrent delete_objects requests
+    :param s3: Optional boto3 S3 client
 
-    Returns:Number of objects *attempted* to delete.
+    Returns:Number of objects S3 confirmed as deleted.
     """
-    s3 = boto3.client('s3')
-    paginator = s3.get_paginator('list_objects_v2')
+    s3 = s3 or boto3.client('s3')
 
     deleted = 0
+    errors = []
     batch = []
+    in_flight = deque()
 
-    #Paginate through all objects that match the prefix
-    for page in paginator.paginate(bucket, prefix):
-        for obj in page.get('Contents', []):
-            batch.append({'Key': obj['Key']})
+    def collect(future):
+        nonlocal deleted
+        n, batch_errors = future.result()
+        deleted += n
+        errors.extend(batch_errors)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for key in keys:
+            batch.append({'Key': key})
             #S3 delete_objects limit: max 1000 objects per request
             if len(batch) == 1000:
-                s3.delete_objects(Bucket=bucket, Delete={'Objects': batch})
-                deleted += 1000
+                in_flight.append(pool.submit(_delete_batch, s3, bucket, batch))
                 batch = []
-    #Delete any remaining keys that didn't fill a full batch
-    if batch:
-        s3.delete_objects(Bucket=bucket, Delete={'Objects': batch})
-        deleted += len(batch)
+                #Backpressure: wait for the oldest batch before producing further keys
+                if len(in_flight) >= 2 * max_workers:
+                    collect(in_flight.popleft())
+        #Delete any remaining keys that didn't fill a full batch
+        if batch:
+            in_flight.append(pool.submit(_delete_batch, s3, bucket, batch))
+
+        while in_flight:
+            collect(in_flight.popleft())
+
+    if errors:
+        for err in errors[:10]:
+            print(f"[delete_s3_keys] failed to delete s3://{bucket}/{err.get('Key')}: {err.get('Code')} {err.get('Message')}")
+        raise RuntimeError(f'Failed to delete {len(errors)} object(s) in s3://{bucket} ({deleted} deleted)')
 
     return deleted
+
+
+def delete_s3_prefix(bucket, prefix, max_workers=DELETE_WORKERS):
+    """
+    Delete all objects under an S3 prefix
+
+    Purpose:
+    - Deleting a partition before rewriting it makes reruns idempotent
+      (prevents mixing old and new parquet parts under the same run_date)
+
+    Implementation notes:
+    - Uses a paginator because listing can exceed 1000 keys.
+    - Listing is pipelined with concurrent deletes (see delete_s3_keys).
+
+    :param bucket: S3 bucket name
+    :param prefix: Key prefix to delete under
+    :param max_workers: Number of concurrent delete_objects requests
+
+    Returns:Number of objects S3 confirmed as deleted.
+    """
+    s3 = boto3.client('s3')
+    paginator = s3.get_paginator('list_objects_v2')
+
+    #Paginate through all objects that match the prefix
+    keys = (obj['Key'] for page in paginator.paginate(Bucket=bucket, Prefix=prefix) for obj in page.get('Contents', []))
+    return delete_s3_keys(bucket, keys, max_workers=max_workers, s3=s3)
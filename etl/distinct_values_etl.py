@@ -0,0 +1,93 @@
+import pandas as pd
+from collections import OrderedDict
+
+#Default number of distinct raw values remembered by a DistinctValueCache
+DISTINCT_CACHE_SIZE = 1 << 18
+
+_MISSING = object()
+
+
+class DistinctValueCache:
+    """
+    LRU of {raw value: cleaned value} for map_distinct, shared by every part a process cleans
+
+    Purpose:
+    - The same city, company or skill repeats across parts. A module-level cache lets a worker clean a value once
+      per process instead of once per part. Missing (NA) values are never cached.
+    """
+
+    def __init__(self, maxsize=DISTINCT_CACHE_SIZE):
+        """
+        :param maxsize: Maximum number of distinct raw values kept (least recently used are evicted)
+        """
+        self.maxsize = maxsize
+        self.values = OrderedDict()
+        self.dtype = None
+
+    def get(self, key):
+        value = self.values.get(key, _MISSING)
+        if value is not _MISSING:
+            self.values.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self.values[key] = value
+        self.values.move_to_end(key)
+        if len(self.values) > self.maxsize:
+            self.values.popitem(last=False)
+
+
+def _clean_uniques(uniques, clean, cache):
+    #Apply clean to the distinct values, through the cache if there is one. Returns a positional array.
+    #No values: clean the empty Series so the result has the cleaner's dtype
+    if cache is None or uniques.empty:
+        return pd.array(clean(uniques))
+
+    keys = uniques.tolist()
+    values = [_MISSING if pd.isna(key) else cache.get(key) for key in keys]
+    todo = [i for i, value in enumerate(values) if value is _MISSING]
+
+    if todo:
+        cleaned = pd.array(clean(uniques.iloc[todo].reset_index(drop=True)))
+        cache.dtype = cleaned.dtype
+        for i, value in zip(todo, cleaned):
+            values[i] = value
+            if not pd.isna(keys[i]):
+                cache.put(keys[i], value)
+
+    return pd.array(values, dtype=cache.dtype)
+
+
+def map_distinct(series, clean, cache=None):
+    """
+    Run a column cleaner on the distinct values of a Series only, then map the results back to the rows
+
+    Purpose:
+    - Cleaned columns repeat the same values millions of times. factorize -> clean uniques -> take makes the
+      cleaning cost scale with cardinality instead of row count (the factorize/take themselves are C loops).
+    - Categorical input is cleaned through its categories and stays categorical. Categories that clean to the
+      same value are merged.
+
+    :param series: pandas Series
+    :param clean: Function of a Series of distinct values (NA included) returning values of the same length, in order
+    :param cache: Optional DistinctValueCache reused across calls (cross-part memoisation)
+    :return: Series with the cleaned values, same index and name
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        #NA rows (code -1) point at an NA appended after the categories
+        categories = series.cat.categories
+        uniques = pd.Series(pd.array(list(categories) + [None], dtype=categories.dtype), name=series.name)
+        codes = series.cat.codes.to_numpy().copy()
+        codes[codes < 0] = len(categories)
+    else:
+        codes, uniques = pd.factorize(series, use_na_sentinel=False)
+        uniques = pd.Series(uniques, name=series.name)
+
+    cleaned = _clean_uniques(uniques, clean, cache)
+
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        remap, merged = pd.factorize(cleaned)
+        values = pd.Categorical.from_codes(remap[codes], categories=merged)
+    else:
+        values = cleaned.take(codes)
+    return pd.Series(values, index=series.index, name=series.name)
@@ -0,0 +1,167 @@
+import os
+import shutil
+import tempfile
+import uuid
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from etl.parquet_validation_etl import validate_table, TableValidator
+from etl.delete_s3_URI import delete_s3_prefix
+from etl.dedup_backends_etl import hash_keys, make_seen_keys
+from etl.parallel_parts_etl import run_parts, resolve_workers
+from etl.parquet_reader_etl import read_part
+from etl.partition_publish_etl import PartitionPublisher
+from etl.parquet_writer_etl import put_parquet
+from etl.part_ledger_etl import _split_s3_uri
+
+
+def bucket_ids(hashes, buckets):
+    """
+    Bucket number of each key hash, taken from the high 32 bits (multiply-shift, any bucket count < 2^32).
+
+    hash % buckets would leave every key of a bucket sharing its low bits, so a power-of-two hash table built over
+    a bucket's keys from the same hashes would only ever use 1/buckets of its slots.
+
+    :param hashes: numpy uint64 array from hash_keys
+    :return: numpy uint64 array of bucket numbers in [0, buckets)
+    """
+    return ((hashes >> np.uint64(32)) * np.uint64(buckets)) >> np.uint64(32)
+
+
+def _shuffle_part(df, i, key_columns, buckets, shuffle_root):
+    """
+    Split one cleaned part into hash buckets on the key columns and write each non-empty slice as
+    <shuffle_root>/bucket_<b>/part_<i>.parquet.
+
+    :return: Dictionary of {bucket number: written path}
+    """
+    written = {}
+
+    for b, rows in df.groupby(bucket_ids(hash_keys(df[key_columns]), buckets), sort=True):
+        b = int(b)
+        bucket_dir = f'{shuffle_root}/bucket_{b:04d}'
+        if not bucket_dir.startswith('s3://'):
+            os.makedirs(bucket_dir, exist_ok=True)
+        path = f'{bucket_dir}/part_{i+1:05d}.parquet'
+        rows.to_parquet(path, index=False)
+        written[b] = path
+
+    return written
+
+
+def _curate_bucket(files, b, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns, bucket, attempt_prefix, dedup_backend, table=None,
+                   dedup_max_bytes=None, dedup_spill_dir=None):
+    """
+    Dedup (first wins, in input part order) and validate one hash bucket, then write it as a single part into the
+    publisher's attempt prefix.
+
+    Runs in a worker process. Every row of a key lands in the same bucket, so per-bucket dedup equals global dedup.
+
+    :return: Tuple of (part name, put_parquet info, validation stats), or None if the bucket is empty
+    """
+    seen = make_seen_keys(dedup_backend, max_bytes=dedup_max_bytes, spill_dir=dedup_spill_dir)
+    kept = []
+    try:
+        for file in files:
+            df = read_part(file, wanted_columns)
+            kept.append(df.loc[seen.filter_new(df[natural_key_columns])])
+    finally:
+        seen.close()
+
+    if not kept:
+        return None
+    df = pd.concat(kept, ignore_index=True)
+    if df.empty:
+        return None
+
+    stats = validate_table(df, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
+
+    name = f'part_{b+1:04d}.parquet'
+    return name, put_parquet(df, bucket, f'{attempt_prefix}/{name}', table=table), stats
+
+
+def curate_hash_partitioned(s3_parquet_files, natural_key_columns, bucket, out_prefix_key, wanted_columns, VAR_CHAR_LIMITS,
+                            buckets, workers=None, shuffle_dir=None, read_options=None, dedup_backend='hash', table=None,
+                            dedup_max_bytes=None, dedup_spill_dir=None):
+    """
+    Two-phase curation of a large table: hash shuffle on the natural key, then dedup/validate every bucket in parallel
+
+    Purpose:
+    - A single streaming pass keeps one global seen-keys store and runs on one core. Hash partitioning on the
+      natural key sends every row of a key to the same bucket, so buckets can be deduplicated independently:
+      memory per worker is ~1/buckets of the table and the step scales with cores.
+
+    Phases:
+    1. Shuffle: every cleaned part is split into buckets and written under shuffle_dir (through run_parts, so
+       parts are shuffled in parallel too)
+    2. Curate: each bucket is read back in input part order, deduplicated first-wins, validated and written to a
+       PartitionPublisher attempt prefix as part_<bucket>.parquet
+    3. Publish: only once every bucket passed validation, the attempt replaces the output partition. Bucket
+       statistics are merged into table totals (TableValidator) for the manifest
+
+    Rows kept are exactly those of the serial pass. Row order in the output follows the buckets instead.
+
+    :param s3_parquet_files: List of s3 URIs (s3://...) that point to cleaned parquet files
+    :param natural_key_columns: Column(s) that define uniqueness for the table
+    :param bucket: S3 bucket name for output
+    :param out_prefix_key: Output partition key prefix (replaced on publish)
+    :param wanted_columns: Columns to keep
+    :param VAR_CHAR_LIMITS: Dictionary of {column_name: max_length}
+    :param buckets: Number of hash buckets
+    :param workers: Number of worker processes (-1 for all cores). Default None runs serially
+    :param shuffle_dir: Local directory or s3:// URI for the shuffle files. Defaults to the system temp dir
+    :param read_options: Optional prefetch settings passed to read_parts (serial shuffle)
+    :param dedup_backend: Seen-keys backend used inside each bucket
+    :param table: Optional table name selecting the parquet write options (PARQUET_WRITE_OPTIONS)
+    :param dedup_max_bytes: Memory cap of each bucket's seen-keys store (see make_seen_keys). Every worker process
+                            holds one, so up to workers * dedup_max_bytes in total
+    :param dedup_spill_dir: Local directory for the seen-keys spill files of each bucket
+    """
+    if not buckets or buckets < 1:
+        raise ValueError(f'buckets must be a positive integer, got {buckets}')
+
+    natural_key_columns = list(natural_key_columns)
+
+    #Unique shuffle root per run so concurrent or crashed runs never mix files
+    if shuffle_dir and shuffle_dir.startswith('s3://'):
+        shuffle_root = f"{shuffle_dir.rstrip('/')}/shuffle_{uuid.uuid4().hex}"
+    else:
+        if shuffle_dir:
+            os.makedirs(shuffle_dir, exist_ok=True)
+        shuffle_root = tempfile.mkdtemp(prefix='shuffle_', dir=shuffle_dir)
+
+    try:
+        written = run_parts(_shuffle_part, s3_parquet_files, (natural_key_columns, buckets, shuffle_root),
+                            columns=wanted_columns, workers=workers, read_options=read_options)
+
+        #Bucket file lists in input part order, which keeps first-wins identical to the serial pass
+        bucket_files = [[w[b] for w in written if b in w] for b in range(buckets)]
+
+        n_workers = min(resolve_workers(workers), buckets)
+
+        #Publishing happens on leaving the block, i.e. only if every bucket validated
+        #Buckets hold disjoint keys, so their statistics add up to the table's
+        validator = TableValidator(wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
+        with PartitionPublisher(bucket, out_prefix_key, table=table, validator=validator) as publisher:
+            part_args = (wanted_columns, VAR_CHAR_LIMITS, natural_key_columns, bucket, publisher.attempt_prefix, dedup_backend, table,
+                         dedup_max_bytes, dedup_spill_dir)
+            if n_workers == 1:
+                written_parts = [_curate_bucket(files, b, *part_args) for b, files in enumerate(bucket_files)]
+            else:
+                with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                    written_parts = list(pool.map(_curate_bucket,
+                                                  bucket_files,
+                                                  range(buckets),
+                                                  *[[arg] * buckets for arg in part_args]))
+
+            for written_part in written_parts:
+                if written_part is not None:
+                    name, info, stats = written_part
+                    publisher.add_part(name, info)
+                    validator.merge(stats)
+    finally:
+        if shuffle_root.startswith('s3://'):
+            shuffle_bucket, shuffle_key = _split_s3_uri(shuffle_root)
+            delete_s3_prefix(shuffle_bucket, f'{shuffle_key}/')
+        else:
+            shutil.rmtree(shuffle_root, ignore_errors=True)
@@ -1,31 +1,86 @@
 import pandas as pd
-from etl.delete_s3_URI import delete_s3_prefix
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from etl.text_normalise_etl import normalise_text
+from etl.partition_publish_etl import PartitionPublisher
+from etl.parquet_reader_etl import read_parts, STRING_DTYPE, PREFETCH_WORKERS
+from etl.parquet_footer_etl import dictionary_column_values
 
-def build_job_level(s3_parquet_files, bucket, prefix):
-    unique_values = set()
-    na = 0
-    empty = 0
+def job_level_part_values(df):
+    """
+    Scan one part's job_level column.
+
+    :param df: DataFrame containing a job_level column
+    :return: Tuple of (NA count, empty string count, set of distinct non-empty values)
+    """
+    series = normalise_text(df['job_level'], collapse_whitespace=False)
+
+    na = int(series.isna().sum())
+    empty = int((series == "").sum())
 
+    na_removed = series.dropna()
+    na_and_empty_strings_removed = na_removed[na_removed != '']
 
-    for file in s3_parquet_files:
-        # Column pruning: read only job_level from Parquet to avoid pulling wide rows over the network. It faster & causes fewer S3 timeouts)
-        series = pd.read_parquet(file,columns=['job_level'])['job_level'].astype('string').str.strip().str.casefold()
+    return na, empty, set(na_and_empty_strings_removed.unique())
 
-        na += int(series.isna().sum())
-        empty += int((series == "").sum())
 
-        na_removed = series.dropna()
-        na_and_empty_strings_removed = na_removed[na_removed != '']
-        unique_values.update(na_and_empty_strings_removed.unique())
+def job_level_metadata_values(file):
+    """
+    Scan one part's job_level column from its parquet footer and dictionary pages, without reading the data pages.
 
+    Distinct raw values come from the dictionary pages and nulls from the footer statistics (see
+    dictionary_column_values). Empty strings have to be counted on the rows, so a part whose dictionary has a value
+    that normalises to '' is not answered either.
+
+    :param file: s3 URI (s3://...) or local path of a parquet part
+    :return: Tuple as job_level_part_values, or None when the column has to be read
+    """
+    summary = dictionary_column_values(file, 'job_level')
+    if summary is None:
+        return None
+    na, raw_values = summary
+    values = normalise_text(pd.Series(sorted(raw_values), dtype=STRING_DTYPE), collapse_whitespace=False)
+    if (values == '').any():
+        return None
+    return na, 0, set(values)
+
+
+def write_job_level(unique_values, na, empty, bucket, prefix):
+    """
+    Enforce job_level data quality, then write the canonical list as a single parquet file.
+    """
     if na:
         raise ValueError(f'{na} NAs in job_level')
     if empty:
         raise ValueError(f'{empty} empty strings in job_level')
-    
 
-    delete_s3_prefix(bucket,f'{prefix}/')
+    #Idempotency: the new canonical list replaces the existing output on publish
+    with PartitionPublisher(bucket, prefix) as publisher:
+        publisher.write(pd.DataFrame({'job_level': sorted(unique_values)}), 'data.parquet')
+
+
+def build_job_level(s3_parquet_files, bucket, prefix, read_options=None):
+    unique_values = set()
+    na = 0
+    empty = 0
+
+
+    files = list(s3_parquet_files)
+
+    #Footer + dictionary page reads first (a few KB per part), max_workers parts at a time
+    max_workers = (read_options or {}).get('max_workers', PREFETCH_WORKERS)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers or 1)) as pool:
+        summaries = list(pool.map(job_level_metadata_values, files))
+
+    #Parts the metadata can't answer are read as before
+    unread = [file for file, summary in zip(files, summaries) if summary is None]
+    # Column pruning: read only job_level from Parquet to avoid pulling wide rows over the network. It faster & causes fewer S3 timeouts)
+    parts = (part for part in summaries if part is not None)
+    read = (job_level_part_values(df) for df in read_parts(unread, columns=['job_level'], read_options=read_options))
 
-    out_uri = f's3://{bucket}/{prefix}/data.parquet'
+    for part_na, part_empty, part_values in chain(parts, read):
+        na += part_na
+        empty += part_empty
+        unique_values.update(part_values)
 
-    pd.DataFrame({'job_level': sorted(unique_values)}).to_parquet(out_uri, index=False)
+    write_job_level(unique_values, na, empty, bucket, prefix)
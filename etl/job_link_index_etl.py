@@ -0,0 +1,99 @@
+import os
+import uuid
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+class JobLinkIndex:
+    """
+    Hash index over a job_link keyed side table (job_summary, job_skills), built once and probed per chunk
+
+    Purpose:
+    - chunk.merge(side_df, on='job_link') rebuilds a hash table over the whole side table for every chunk.
+      Here the side table is factorised once: a pandas Index over the distinct job_links (its hash table is built
+      on first lookup and then reused) plus, per key, the positions of its rows in the side table.
+    - The side table itself stays as Arrow buffers (no Python string objects for the summary text). It can be a
+      memory-mapped table (see spill_batches) so the OS pages it in and out instead of holding it in RSS.
+
+    Join semantics match a pandas left merge on job_link: left row order is kept, a key with several side rows
+    repeats the left row once per side row (in side table order), and missing keys get nulls.
+    """
+
+    def __init__(self, table):
+        """
+        :param table: pyarrow Table with a job_link column (already stripped)
+        """
+        keys = table['job_link'].to_pandas()
+        #use_na_sentinel=False: pandas merge matches null keys with each other, so null gets its own code
+        codes, uniques = pd.factorize(keys, use_na_sentinel=False)
+
+        self.keys = pd.Index(uniques)
+        #Positions of each key's rows, grouped by key and stable so duplicates keep side table order
+        self.order = np.argsort(codes, kind='stable')
+        self.counts = np.bincount(codes, minlength=len(uniques))
+        self.starts = np.cumsum(self.counts) - self.counts
+
+        self.side = table.drop_columns(['job_link'])
+
+    def join(self, chunk):
+        """
+        Left join a chunk of postings to the side table on job_link.
+
+        :param chunk: pyarrow Table with a job_link column
+        :return: pyarrow Table with the chunk's columns followed by the side table's columns
+        """
+        pos = self.keys.get_indexer(chunk['job_link'].to_pandas())
+        matched = pos >= 0
+        if not matched.any():
+            #No match (or an empty side table): every left row once, side columns all null
+            return self._append_side(chunk, pa.nulls(len(pos), pa.int64()))
+
+        #Every left row appears max(1, number of matching side rows) times
+        reps = np.where(matched, self.counts[np.where(matched, pos, 0)], 1)
+        left_take = np.repeat(np.arange(len(pos)), reps)
+
+        #Offset of each output row within its left row's group of matches
+        within = np.arange(len(left_take)) - np.repeat(np.cumsum(reps) - reps, reps)
+        right_pos = np.repeat(np.where(matched, self.starts[np.where(matched, pos, 0)], 0), reps) + within
+        missing = ~np.repeat(matched, reps)
+        right_take = pa.array(self.order[np.where(missing, 0, right_pos)], mask=missing)
+
+        return self._append_side(chunk.take(pa.array(left_take)), right_take)
+
+    def _append_side(self, joined, right_take):
+        side_rows = self.side.take(right_take)
+        for name, column in zip(side_rows.column_names, side_rows.columns):
+            joined = joined.append_column(name, column)
+        return joined
+
+
+def spill_batches(batches, schema, spill_dir):
+    """
+    Stream record batches to an uncompressed Arrow IPC file and reopen it zero-copy from a memory map.
+
+    Only one batch is held in memory while writing, so a multi-GB side table never has to fit in RSS. The file is
+    left in spill_dir: pass a temporary directory (convert_csv_to_parquet does) so it is removed afterwards.
+
+    :param batches: Iterable of pyarrow RecordBatches (or small Tables)
+    :param schema: Schema of the batches
+    :param spill_dir: Local directory for the IPC file
+    :return: Memory-mapped pyarrow Table
+    """
+    os.makedirs(spill_dir, exist_ok=True)
+    path = os.path.join(spill_dir, f'side_table_{uuid.uuid4().hex}.arrow')
+
+    with pa.OSFile(path, 'wb') as sink:
+        with pa.ipc.new_file(sink, schema) as writer:
+            for batch in batches:
+                writer.write(batch)
+
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def strip_job_link(table):
+    """
+    Strip whitespace from a table's job_link column so keys compare equal across files.
+    """
+    return table.set_column(table.schema.get_field_index('job_link'), 'job_link', pc.utf8_trim_whitespace(table['job_link']))
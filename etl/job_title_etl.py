@@ -1,67 +1,160 @@
+import os
+import re
+import json
+from functools import lru_cache
 import pandas as pd
+from etl.text_normalise_etl import normalise_text
+from etl.parquet_reader_etl import STRING_DTYPE
+from etl.distinct_values_etl import map_distinct, DistinctValueCache
 from etl.unknown_placeholders_replace_etl import replace_unknown_placeholders
 from etl.delete_s3_URI import delete_s3_prefix
+from etl.parallel_parts_etl import run_parts
+from etl.parquet_writer_etl import write_parquet
+from etl.part_ledger_etl import PartLedger, LEDGER_NAME
+from etl.part_cache_etl import PartCache
 
-def cleaning_job_title(s3_parquet_files,bucket,prefix,debug=False):
-    
-    #idempotent rerun
-    delete_s3_prefix(bucket, prefix)
-
-    #Common noisy token seen in titles after splitting on hyphen (e.g. 'Engineer - Remote')
-    work_pattern = ['part time','full time','2nd shift','prn','virtual/remote','remote','per diem','hybrid',
-                    '1st shift','3rd shift','travel contract','part-time','mobile','night shift','nights',
-                    'full-time','entry level','onsite','prn/part time']
-    employer_name = ["spencer's",'tj maxx','tommy hilfiger',"chico's",'homegoods','calvin klein','the forklift']
-    posting_noise = ['broil/grill','rhrp','2+yrs paid tax experience required','shortage control',
-                     '$250,000/yearly - $400,000/yearly','fix cars as a mobile mechanic***',
-                     'rn at fresenius medical care north america','potential relocation assistance',
-                     'manufacturing','level 2','21 and older only','retail','personal financial services',
-                     'automotive','us','site)','on bonus','li','employee benefits','07532802']
-    dropable_list = work_pattern + employer_name + posting_noise
-
-    #Output schema for the staging table
-    output_cols = ['canonical_job_title', 'raw_job_title', 'job_link']
-
-    for i, file in enumerate(s3_parquet_files):
-        df = pd.read_parquet(file)[['job_link', 'job_title']].copy()
-
-        series_job_title = df['job_title']
-        #Normalise titles so downstream grouping/dedup is consistent
-        normalised_series_job_title = (series_job_title.astype('string').str.replace(r'\s+', ' ', regex=True).str.strip().str.casefold())
-        # Split on hyphen to separate title vs trailing noise
-        before_hypen = normalised_series_job_title.str.split(' *- *', n=1).str[0]
-        after_hypen  = normalised_series_job_title.str.split(' *- *', n=1).str[1]
-
-        if debug:
-            print(after_hypen.value_counts().head(100)[:50])
-            print(after_hypen.value_counts().head(100)[50:100])
-        #If one side is “noise” and the other is not, keep the non-noise side as canonical
-        condition   = after_hypen.isin(dropable_list)
-        condition_2 = before_hypen.isin(dropable_list)
-
-        suffix_only = condition & ~condition_2
-        prefix_only = ~condition & condition_2
-
-        canonical = normalised_series_job_title.copy()
-        canonical = canonical.mask(suffix_only, before_hypen)
-        canonical = canonical.mask(prefix_only, after_hypen)
-        
-        #Staging output: raw title, canonical title, job_link for joining back to postings
-        canonical_raw_staging_df = pd.DataFrame({
-            'canonical_job_title': canonical,
-            'raw_job_title': normalised_series_job_title,
-            'job_link': df['job_link'].astype('string'),
-        })
-
-        canonical_raw_staging_df['canonical_job_title'] = replace_unknown_placeholders(
-            canonical_raw_staging_df['canonical_job_title']
-        )
-        canonical_raw_staging_df['canonical_job_title'] = canonical_raw_staging_df['canonical_job_title'].mask(
-            canonical_raw_staging_df['canonical_job_title'].isna(),
-            'unknown_title'
-        )
-
-        canonical_raw_staging_df = canonical_raw_staging_df[output_cols]
-
-        out_path = f's3://{bucket}/{prefix}/part_{i:05d}.parquet'
-        canonical_raw_staging_df.to_parquet(out_path, index=False)
+#Noise tokens seen in titles around hyphens (e.g. 'Engineer - Remote'): work patterns, employer names and
+#posting noise. Kept in a JSON file so the lists can change without a code change
+JOB_TITLE_NOISE_PATH = os.getenv('JOB_TITLE_NOISE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_title_noise.json'))
+
+#Titles seen per process whose canonical form is memoised
+CANONICAL_CACHE_SIZE = 1 << 18
+
+#A run of hyphens ('nurse -- remote') is one separator
+_SEGMENT_SEPARATOR = re.compile(' *(?:- *)+')
+
+
+def load_noise_tokens(path=JOB_TITLE_NOISE_PATH):
+    """
+    Load the noise token lists ({group name: [token, ...]}) and return them as one flat list.
+    """
+    with open(path, encoding='utf-8') as f:
+        groups = json.load(f)
+    return [token for tokens in groups.values() for token in tokens]
+
+
+dropable_list = load_noise_tokens()
+
+#Tokens are matched segment-wise, so noise that itself contains a hyphen ('part-time') is a tuple of segments
+_NOISE_SEGMENTS = {tuple(_SEGMENT_SEPARATOR.split(token)) for token in dropable_list}
+_MAX_NOISE_SEGMENTS = max(map(len, _NOISE_SEGMENTS), default=0)
+
+
+def _noise_length(segments, start, stop, from_end):
+    #Number of segments of the longest noise token at the start (or end) of segments[start:stop], 0 if none
+    for k in range(min(_MAX_NOISE_SEGMENTS, stop - start), 0, -1):
+        candidate = segments[stop - k:stop] if from_end else segments[start:start + k]
+        if tuple(candidate) in _NOISE_SEGMENTS:
+            return k
+    return 0
+
+
+@lru_cache(maxsize=CANONICAL_CACHE_SIZE)
+def canonical_job_title(title):
+    """
+    Canonical form of one normalised title: leading and trailing noise segments are stripped
+    ('senior nurse - part-time - remote' -> 'senior nurse').
+
+    - If every segment is noise the full title is kept ('remote - hybrid'), except a title that is a single noise
+      token without any hyphen, which has no title left (None, later 'unknown_title').
+    - Kept segments are sliced from the original text, so their inner separators are unchanged.
+    """
+    bounds = [0]
+    for m in _SEGMENT_SEPARATOR.finditer(title):
+        bounds.extend((m.start(), m.end()))
+    bounds.append(len(title))
+    #Segment i spans title[bounds[2i]:bounds[2i+1]]
+    segments = [title[bounds[2 * i]:bounds[2 * i + 1]] for i in range(len(bounds) // 2)]
+
+    start, stop = 0, len(segments)
+    while start < stop:
+        k = _noise_length(segments, start, stop, from_end=True)
+        if not k:
+            break
+        stop -= k
+    while start < stop:
+        k = _noise_length(segments, start, stop, from_end=False)
+        if not k:
+            break
+        start += k
+
+    if start == stop:
+        return None if len(segments) == 1 else title
+    return title[bounds[2 * start]:bounds[2 * stop - 1]]
+
+
+#Normalised titles memoised across the parts a process handles
+_TITLE_VALUES = DistinctValueCache()
+
+#Output schema for the staging table
+output_cols = ['canonical_job_title', 'raw_job_title', 'job_link']
+
+
+def _canonical_values(titles):
+    return pd.array([None if pd.isna(title) else canonical_job_title(title) for title in titles], dtype=STRING_DTYPE)
+
+
+def clean_job_title_frame(df, debug=False):
+    """
+    Canonicalise job titles for one raw part
+
+    :param df: Raw DataFrame containing at least job_link and job_title
+    :param debug: If True, prints distinct titles whose canonical form differs
+    :return: DataFrame with canonical_job_title, raw_job_title, job_link
+    """
+    series_job_title = df['job_title']
+    #Normalise titles so downstream grouping/dedup is consistent
+    #Titles repeat heavily: normalise and canonicalise each distinct title once (see map_distinct)
+    normalised_series_job_title = map_distinct(series_job_title, normalise_text, cache=_TITLE_VALUES)
+    canonical = map_distinct(normalised_series_job_title, _canonical_values)
+
+    if debug:
+        #Distinct titles whose canonical form differs
+        titles = pd.DataFrame({'title': normalised_series_job_title, 'canonical': canonical}).drop_duplicates()
+        print(titles[titles['title'].ne(titles['canonical']).fillna(True)].head(50))
+
+    #Staging output: raw title, canonical title, job_link for joining back to postings
+    canonical_raw_staging_df = pd.DataFrame({
+        'canonical_job_title': canonical,
+        'raw_job_title': normalised_series_job_title,
+        'job_link': df['job_link'].astype(STRING_DTYPE),
+    })
+
+    canonical_raw_staging_df['canonical_job_title'] = replace_unknown_placeholders(
+        canonical_raw_staging_df['canonical_job_title']
+    )
+    canonical_raw_staging_df['canonical_job_title'] = canonical_raw_staging_df['canonical_job_title'].mask(
+        canonical_raw_staging_df['canonical_job_title'].isna(),
+        'unknown_title'
+    )
+
+    return canonical_raw_staging_df[output_cols]
+
+
+def _clean_job_title_part(df, i, bucket, prefix, debug):
+    #One input part -> one output part. Part numbers start at 0
+    canonical_raw_staging_df = clean_job_title_frame(df[['job_link', 'job_title']], debug=debug)
+
+    out_path = f's3://{bucket}/{prefix}/part_{i:05d}.parquet'
+    write_parquet(canonical_raw_staging_df, out_path, table='job_title_staging')
+
+    return {'outputs': [out_path]}
+
+
+def cleaning_job_title(s3_parquet_files,bucket,prefix,debug=False,read_options=None,workers=None,resume=False,use_cache=False):
+
+    #resume=True skips parts already cleaned by an earlier attempt (ledger at <prefix>/_ledger.json)
+    ledger = None
+    if resume:
+        ledger = PartLedger(bucket, f'{prefix}/{LEDGER_NAME}', config={'task': 'cleaning_job_title'})
+
+    #idempotent rerun (kept when resuming from a ledger, the finished parts are reused)
+    if ledger is None or not ledger.entries:
+        delete_s3_prefix(bucket, prefix)
+
+    #use_cache=True replays parts from identical inputs of an earlier run (content-addressed, see etl/part_cache_etl.py)
+    cache = PartCache(bucket, 'cleaning_job_title', {'dropable_list': dropable_list}, {'output': prefix}) if use_cache else None
+
+    #workers=N (or -1 for all cores) runs the parts in a process pool, part numbering is unchanged
+    run_parts(_clean_job_title_part, s3_parquet_files, (bucket, prefix, debug), columns=['job_link', 'job_title'],
+              workers=workers, read_options=read_options, ledger=ledger, cache=cache)
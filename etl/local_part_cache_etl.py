@@ -0,0 +1,168 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+from etl.parquet_writer_etl import s3_client
+from etl.part_ledger_etl import list_etags, _split_s3_uri
+
+#Local directory shared by every task on the worker. Unset disables the cache
+LOCAL_PART_CACHE_DIR = os.getenv('LOCAL_PART_CACHE_DIR')
+
+#Total size of cached parts. Least recently read parts are evicted beyond it
+LOCAL_PART_CACHE_MAX_BYTES = int(os.getenv('LOCAL_PART_CACHE_MAX_BYTES', 20 * 1024 ** 3))
+
+_COPY_CHUNK = 8 * 1024 * 1024
+
+
+class LocalPartCache:
+    """
+    On-disk cache of S3 parquet parts, shared by the DAG tasks running on one worker
+
+    Purpose:
+    - The raw run_date= parts are read by every cleaning task and the cleaned parts again by each curate task,
+      often on the same worker minutes apart. Here a part is downloaded once and later reads are memory-mapped
+      local reads (see read_part).
+    - Entries are keyed by S3 URI + ETag, so an overwritten object is a miss, never stale data. Misses are
+      downloaded with GetObject IfMatch=ETag: the bytes on disk always belong to the ETag in their key.
+
+    Sharing and size:
+    - Downloads go to a temporary file renamed into place, so concurrent tasks, worker processes and threads
+      never see a partial part (two of them missing the same part both download it, the last rename wins).
+    - Reads touch the file's mtime. After each download the least recently read parts are deleted until the
+      cache is under max_bytes. A reader holding an evicted part keeps its open file (POSIX unlink).
+    - A directory that can't be created or written to (read-only, full, removed) never fails a read: the part is
+      read from S3 instead.
+    """
+
+    def __init__(self, directory, max_bytes=LOCAL_PART_CACHE_MAX_BYTES):
+        """
+        :param directory: Local cache directory (created if missing)
+        :param max_bytes: Size cap of the cached parts
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._s3 = None
+        self._lock = threading.Lock()
+
+    @property
+    def s3(self):
+        #One client per cache (clients are thread-safe, creating one per part is not cheap)
+        with self._lock:
+            if self._s3 is None:
+                self._s3 = s3_client()
+            return self._s3
+
+    def etags(self, uris):
+        """
+        Current ETags of the URIs, one listing per directory (see list_etags).
+        """
+        return list_etags(self.s3, uris)
+
+    def path(self, uri, etag):
+        digest = hashlib.sha256(f'{uri}\n{etag}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f'{digest}.parquet')
+
+    def cached(self, uri, etag):
+        """
+        Local path of a part already in the cache, or None. Never downloads and does not count as a read.
+        """
+        path = self.path(uri, etag)
+        return path if os.path.exists(path) else None
+
+    def fetch(self, uri, etag=None):
+        """
+        Local path of a part, downloaded on a miss.
+
+        :param uri: s3 URI (s3://...) of a parquet part
+        :param etag: Current ETag if already known (e.g. from etags()), otherwise one HEAD request
+        :return: Local file path, or None if the object does not exist, changed since etag was listed, or can't be
+                 written to the cache directory (the caller then reads from S3 directly)
+        """
+        bucket, key = _split_s3_uri(uri)
+        if etag is None:
+            try:
+                etag = self.s3.head_object(Bucket=bucket, Key=key)['ETag']
+            except self.s3.exceptions.ClientError:
+                return None
+        path = self.path(uri, etag)
+
+        try:
+            os.utime(path)
+            return path
+        except FileNotFoundError:
+            pass
+
+        try:
+            body = self.s3.get_object(Bucket=bucket, Key=key, IfMatch=etag)['Body']
+        except self.s3.exceptions.ClientError as e:
+            if e.response['Error'].get('Code') in ('PreconditionFailed', '412'):
+                return None
+            raise
+        tmp = None
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.download_')
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(body, f, _COPY_CHUNK)
+            os.replace(tmp, path)
+        except BaseException as e:
+            if tmp is not None and os.path.exists(tmp):
+                os.remove(tmp)
+            if isinstance(e, OSError):
+                #Directory removed, read-only or full: this read goes to S3, the pipeline carries on
+                print(f'[local_part_cache] could not cache {uri} in {self.directory}: {e}')
+                body.close()
+                return None
+            raise
+
+        self.evict(keep=path)
+        return path
+
+    def evict(self, keep=None):
+        """
+        Delete the least recently read parts until the cache is under max_bytes (keep is never deleted).
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.parquet'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+_shared = None
+_shared_pid = None
+
+
+def local_part_cache():
+    """
+    The LocalPartCache configured by LOCAL_PART_CACHE_DIR / LOCAL_PART_CACHE_MAX_BYTES, or None when disabled or
+    when the directory can't be created (reads then go to S3).
+    One per process (a forked worker does not reuse its parent's S3 client).
+    """
+    global _shared, _shared_pid
+    if not LOCAL_PART_CACHE_DIR:
+        return None
+    if _shared_pid != os.getpid():
+        _shared_pid = os.getpid()
+        try:
+            _shared = LocalPartCache(LOCAL_PART_CACHE_DIR, LOCAL_PART_CACHE_MAX_BYTES)
+        except OSError as e:
+            print(f'[local_part_cache] cache disabled, {LOCAL_PART_CACHE_DIR} is unusable: {e}')
+            _shared = None
+    return _shared
@@ -1,8 +1,55 @@
 import pandas as pd
-from etl.unknown_placeholders_replace_etl import replace_unknown_placeholders
+from etl.text_normalise_etl import normalise_text
+from etl.unknown_placeholders_replace_etl import replace_unknown_placeholders, fill_unknown
+from etl.distinct_values_etl import map_distinct, DistinctValueCache
 from etl.debug_tools_etl import debug_function
+from etl.parallel_parts_etl import run_parts
+from etl.parquet_writer_etl import write_parquet
+from etl.part_ledger_etl import PartLedger, LEDGER_NAME
+from etl.part_cache_etl import PartCache
 
-def clean_location(s3_parquet_files, bucket, prefix, debug=False):
+#Cleaned locations memoised across the parts a process handles
+_LOCATION_VALUES = DistinctValueCache()
+
+
+def _clean_location_values(location):
+    location = normalise_text(location, collapse_whitespace=False)
+
+    location = replace_unknown_placeholders(location)
+
+    return fill_unknown(location, 'unknown_location')
+
+
+def clean_location_frame(df):
+    """
+    Standardise job_location for one raw part
+
+    Only job_location is copied out, so the caller's frame is left untouched (the raw fan-out stage
+    shares one frame between several cleaners).
+
+    :param df: Raw job_postings DataFrame (one parquet part)
+    :return: DataFrame with a single job_location column
+    """
+    #Locations repeat heavily: clean each distinct value once (see map_distinct)
+    location = map_distinct(df['job_location'], _clean_location_values, cache=_LOCATION_VALUES)
+
+    return pd.DataFrame({'job_location':location})
+
+
+def _clean_location_part(df, n, bucket, prefix, debug):
+    #One input part -> one output part. Part numbers start at 0
+    df = clean_location_frame(df)
+
+    if debug:
+        debug_function(df, debug=True, columns = 'job_location')
+    
+    out_path = f's3://{bucket}/{prefix}/part_{n:05d}.parquet'
+    write_parquet(df, out_path, table='location')
+
+    return {'outputs': [out_path]}
+
+
+def clean_location(s3_parquet_files, bucket, prefix, debug=False, read_options=None, workers=None, resume=False, use_cache=False):
     """
     Purpose:
     Extract and standardise job_location from raw parquet parts, then write cleaned parquet to S3
@@ -15,21 +62,16 @@ def clean_location(s3_parquet_files, bucket, prefix, debug=False):
 
     Output:
     - Writes one parquet file per input part to stop OOM problems
+    - workers=N (or -1 for all cores) processes parts in a process pool with the same part numbering
+    - resume=True skips parts already cleaned by an earlier attempt (ledger at <prefix>/_ledger.json)
     """
-    for n,file in enumerate(s3_parquet_files):
-        df = pd.read_parquet(file)
-
-        df['job_location'] = df['job_location'].astype('string').str.casefold().str.strip()
-
-        df['job_location'] = replace_unknown_placeholders(df['job_location'])
-
-        mask_condition = (df['job_location'].isna())
-
-        df['job_location'] = df['job_location'].mask(mask_condition, 'unknown_location')
+    ledger = None
+    if resume:
+        ledger = PartLedger(bucket, f'{prefix}/{LEDGER_NAME}', config={'task': 'clean_location'})
 
-        df = df['job_location']
+    #use_cache=True replays parts from identical inputs of an earlier run (content-addressed, see etl/part_cache_etl.py)
+    cache = PartCache(bucket, 'clean_location', {}, {'output': prefix}) if use_cache else None
 
-        if debug:
-            debug_function(df, debug=True, columns = 'job_location')
-        
-        pd.DataFrame({'job_location':df}).to_parquet(f's3://{bucket}/{prefix}/part_{n:05d}.parquet',index=False)
+    #Only job_location is downloaded (projection pushed down to the parquet reader)
+    run_parts(_clean_location_part, s3_parquet_files, (bucket, prefix, debug), columns=['job_location'],
+              workers=workers, read_options=read_options, ledger=ledger, cache=cache)
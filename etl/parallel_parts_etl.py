@@ -0,0 +1,169 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from etl.parquet_reader_etl import read_parts, read_part
+from etl.parquet_writer_etl import wait_for_writes
+
+
+def _read_and_run(part_function, file, columns, i, part_args, filter=None):
+    #Runs inside a worker process: each worker downloads its own part
+    df = read_part(file, columns, filter)
+    result = part_function(df, i, *part_args)
+    #The worker's background uploads must land before the part counts as done
+    wait_for_writes(_part_outputs(result))
+    return result
+
+
+def resolve_workers(workers):
+    """
+    Translate a workers= setting into a process count. None/0/1 means serial, -1 means one per core.
+    """
+    if workers is None or workers in (0, 1):
+        return 1
+    if workers < 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def memory_bounded_workers(worker_bytes, max_workers=None):
+    """
+    Process count for a parallel task: one per core, but no more than the available memory holds at worker_bytes
+    each (always at least 1). Use this rather than workers=-1 wherever parts are large.
+
+    :param worker_bytes: Estimated peak memory of one worker (see WORKER_MEMORY_BYTES in etl/config.py)
+    :param max_workers: Optional upper bound
+    """
+    workers = os.cpu_count() or 1
+    try:
+        available = os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+        workers = min(workers, available // worker_bytes)
+    except (ValueError, OSError, AttributeError):
+        #No sysconf memory figures on this platform: the core count alone
+        pass
+    if max_workers is not None:
+        workers = min(workers, max_workers)
+    return max(int(workers), 1)
+
+
+def _part_outputs(result):
+    #Part functions report the output URIs they wrote as result['outputs']
+    return result.get('outputs', []) if isinstance(result, dict) else []
+
+
+def run_parts(part_function, s3_parquet_files, part_args=(), columns=None, workers=None, read_options=None, ledger=None, cache=None,
+              filter=None):
+    """
+    Run part_function(df, i, *part_args) once per input part and return the results in input order
+
+    Purpose:
+    - The per-part cleaners map each input part to its own output part(s) with no shared state, so they can run
+      on every core instead of one.
+    - i is always the part's position in s3_parquet_files (never completion order), so output part numbering is
+      identical in serial and parallel mode and reruns stay idempotent.
+
+    Modes:
+    - workers None/1: serial, parts are prefetched on a thread pool (read_parts). Outputs written with
+      write_parquet upload while the next part is computed, a part's result is recorded once they have landed.
+    - workers > 1 (or -1 for all cores): ProcessPoolExecutor, each worker reads and processes its own part.
+      part_function must be a module-level function and part_args must be picklable.
+
+    Resume:
+    - With a PartLedger (etl/part_ledger_etl.py), parts whose input ETag is unchanged and whose recorded outputs
+      still exist are not read again: their stored result is returned instead. part_function should return a
+      dict with an 'outputs' list of the URIs it wrote (and JSON-serialisable values).
+    - Completed parts are checkpointed as they finish and the ledger is saved on exit, including on failure, so
+      a retry resumes with the first incomplete part.
+
+    Cache:
+    - With a PartCache (etl/part_cache_etl.py), the remaining parts are looked up by content (input ETag,
+      position, transform and config). Hits are server-side copied from an earlier run instead of recomputed,
+      and computed parts are added to the cache.
+
+    :param part_function: Function taking (df, i, *part_args)
+    :param s3_parquet_files: List of s3 URIs (s3://...) that point to parquet files
+    :param part_args: Extra positional arguments passed to every call
+    :param columns: Optional list of columns to read (pushed down to the parquet reader, see read_part)
+    :param filter: Optional row filter pushed down to the parquet reader (see read_part)
+    :param workers: Number of worker processes (see Modes)
+    :param read_options: Optional prefetch settings passed to read_parts (serial mode)
+    :param ledger: Optional PartLedger used to skip parts completed by an earlier attempt
+    :param cache: Optional PartCache used to replay parts computed by an earlier run from identical inputs
+    :return: List of part_function results, one per input part
+    """
+    files = list(s3_parquet_files)
+    n_workers = resolve_workers(workers)
+    results = [None] * len(files)
+
+    todo = list(range(len(files)))
+    etags = {}
+    if ledger is not None or cache is not None:
+        etags = (ledger or cache).etags(files)
+
+    if ledger is not None:
+        todo = []
+        for i, file in enumerate(files):
+            entry = ledger.done([file], etags)
+            if entry is None:
+                todo.append(i)
+            else:
+                results[i] = entry['result']
+        if len(todo) < len(files):
+            print(f'[run_parts] resuming: {len(files) - len(todo)} of {len(files)} parts already done')
+
+    def finished(i, result):
+        results[i] = result
+        if ledger is not None:
+            ledger.record([files[i]], etags, _part_outputs(result), result)
+
+    def computed(i, result):
+        finished(i, result)
+        if cache is not None:
+            cache.store(etags[files[i]], i, result)
+
+    #Serial mode: parts whose outputs are still uploading (etl/parquet_writer_etl.py)
+    uploading = deque()
+
+    def settle(keep=0):
+        #Record the oldest parts once their uploads have finished
+        while len(uploading) > keep:
+            i, result = uploading.popleft()
+            wait_for_writes(_part_outputs(result))
+            computed(i, result)
+
+    try:
+        if cache is not None and todo:
+            hits = cache.lookup_many({i: etags[files[i]] for i in todo})
+            for i in todo:
+                if i in hits:
+                    finished(i, hits[i])
+            todo = [i for i in todo if i not in hits]
+            if hits:
+                print(f'[run_parts] cache: {len(hits)} parts copied from earlier runs, {len(todo)} to compute')
+
+        if n_workers == 1:
+            for i, df in zip(todo, read_parts([files[i] for i in todo], columns=columns, read_options=read_options, filter=filter)):
+                uploading.append((i, part_function(df, i, *part_args)))
+                #Part i uploads while part i+1 is computed
+                settle(keep=1)
+            settle()
+        else:
+            with ProcessPoolExecutor(max_workers=min(n_workers, max(len(todo), 1))) as pool:
+                #map yields in submission order and re-raises the first failing part's exception
+                for i, result in zip(todo, pool.map(_read_and_run,
+                                                    [part_function] * len(todo),
+                                                    [files[i] for i in todo],
+                                                    [columns] * len(todo),
+                                                    todo,
+                                                    [part_args] * len(todo),
+                                                    [filter] * len(todo))):
+                    computed(i, result)
+    finally:
+        if ledger is not None:
+            #After a failure keep the parts whose uploads did complete, so a retry resumes after them
+            try:
+                settle()
+            except Exception:
+                pass
+            ledger.save()
+
+    return results
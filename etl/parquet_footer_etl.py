@@ -0,0 +1,201 @@
+import os
+import pyarrow as pa
+import pyarrow.fs
+
+#Codecs pa.decompress reads the same way parquet writes them (parquet's LZ4 is Hadoop-framed)
+_CODECS = {1: 'snappy', 2: 'gzip', 4: 'brotli', 6: 'zstd'}
+_UNCOMPRESSED = 0
+_BYTE_ARRAY = 6
+
+#parquet.thrift enums
+_DATA_PAGE, _DICTIONARY_PAGE, _DATA_PAGE_V2 = 0, 2, 3
+_PLAIN, _PLAIN_DICTIONARY, _RLE_DICTIONARY = 0, 2, 8
+
+_MAGIC = b'PAR1'
+
+
+def _open_input_file(file):
+    #Random access file: reads are S3 range requests for s3:// URIs
+    if file.startswith('s3://'):
+        fs, path = pa.fs.FileSystem.from_uri(file)
+    else:
+        fs, path = pa.fs.LocalFileSystem(), os.path.abspath(file)
+    return fs.open_input_file(path)
+
+
+class _CompactReader:
+    """
+    Just enough of the Thrift compact protocol to read parquet's FileMetaData and PageHeader structs.
+    """
+
+    def __init__(self, buf):
+        self.buf = buf
+        self.pos = 0
+
+    def byte(self):
+        b = self.buf[self.pos]
+        self.pos += 1
+        return b
+
+    def varint(self):
+        shift = result = 0
+        while True:
+            b = self.byte()
+            result |= (b & 0x7F) << shift
+            if not b & 0x80:
+                return result
+            shift += 7
+
+    def zigzag(self):
+        n = self.varint()
+        return (n >> 1) ^ -(n & 1)
+
+    def read_struct(self):
+        """
+        :return: Dictionary of {field id: value}. Nested structs are dictionaries, lists are lists, maps None
+        """
+        fields = {}
+        last = 0
+        while True:
+            header = self.byte()
+            if header == 0:
+                return fields
+            kind, delta = header & 0x0F, header >> 4
+            last = last + delta if delta else self.zigzag()
+            #Struct field booleans are carried in the type nibble
+            fields[last] = kind == 1 if kind in (1, 2) else self.value(kind)
+
+    def value(self, kind):
+        if kind in (1, 2, 3):
+            #A list element boolean is one byte
+            return self.byte()
+        if kind in (4, 5, 6):
+            return self.zigzag()
+        if kind == 7:
+            self.pos += 8
+            return None
+        if kind == 8:
+            size = self.varint()
+            self.pos += size
+            return bytes(self.buf[self.pos - size:self.pos])
+        if kind in (9, 10):
+            header = self.byte()
+            size = header >> 4 if header >> 4 != 15 else self.varint()
+            return [self.value(header & 0x0F) for _ in range(size)]
+        if kind == 11:
+            size = self.varint()
+            if size:
+                types = self.byte()
+                for _ in range(size):
+                    self.value(types >> 4)
+                    self.value(types & 0x0F)
+            return None
+        if kind == 12:
+            return self.read_struct()
+        raise ValueError(f'Unknown thrift compact type {kind}')
+
+
+def _file_metadata(f):
+    #FileMetaData struct from the footer: <metadata><4-byte length>PAR1 (encrypted footers end in PARE)
+    size = f.size()
+    tail = f.read_at(8, size - 8)
+    if tail[4:] != _MAGIC:
+        return None
+    length = int.from_bytes(tail[:4], 'little')
+    return _CompactReader(f.read_at(length, size - 8 - length)).read_struct()
+
+
+def _only_dictionary_data_pages(meta):
+    #Every data page dictionary-encoded, from the footer's per-page encoding_stats. The encodings list can't tell:
+    #a chunk that fell back to plain pages lists the same encodings as one that did not
+    encoding_stats = meta.get(13)
+    if not encoding_stats:
+        return False
+    return all(stat.get(2) in (_PLAIN_DICTIONARY, _RLE_DICTIONARY)
+               for stat in encoding_stats if stat.get(1) in (_DATA_PAGE, _DATA_PAGE_V2) and stat.get(3, 1))
+
+
+def _plain_byte_arrays(body, n):
+    #PLAIN BYTE_ARRAY: 4-byte little-endian length then the bytes, n times
+    values = []
+    pos = 0
+    for _ in range(n):
+        size = int.from_bytes(body[pos:pos + 4], 'little')
+        values.append(body[pos + 4:pos + 4 + size].decode('utf-8'))
+        pos += 4 + size
+    return values
+
+
+def _dictionary_page(f, meta):
+    #Values of a column chunk's dictionary page, or None when the chunk has no readable dictionary page
+    start, end, codec = meta.get(11), meta.get(9), meta.get(4)
+    if meta.get(1) != _BYTE_ARRAY or not start or start >= end or (codec != _UNCOMPRESSED and codec not in _CODECS):
+        return None
+
+    buf = f.read_at(end - start, start)
+    reader = _CompactReader(buf)
+    header = reader.read_struct()
+    dictionary = header.get(7)
+    if header.get(1) != _DICTIONARY_PAGE or not dictionary or dictionary.get(2) not in (_PLAIN, _PLAIN_DICTIONARY):
+        return None
+
+    body = buf[reader.pos:reader.pos + header[3]]
+    if codec != _UNCOMPRESSED:
+        body = pa.decompress(body, decompressed_size=header[2], codec=_CODECS[codec]).to_pybytes()
+    return _plain_byte_arrays(body, dictionary[1])
+
+
+def dictionary_column_values(file, column):
+    """
+    Null count and distinct values of one text column from the parquet footer and dictionary pages only
+
+    Purpose:
+    - Low-cardinality columns (job_level, job_type) are dictionary-encoded: every distinct value of a row group
+      sits in its dictionary page, and the footer statistics hold the null counts. Reading those is a few KB of
+      range reads per part, instead of downloading and decoding the column's data pages.
+
+    Safety:
+    - A dictionary page only lists every value when no data page fell back to plain encoding (writers fall back
+      once the dictionary grows past their limit). The footer's per-page encoding_stats must show that every data
+      page of every row group is dictionary-encoded.
+    - Returns None when the metadata can't answer for certain (no statistics or encoding_stats, a plain data
+      page, no dictionary page, nested column, unsupported codec, encrypted footer). The caller then reads the
+      column normally.
+
+    :param file: s3 URI (s3://...) or local path of a parquet file
+    :param column: Top-level column name
+    :return: Tuple of (null count, set of distinct non-null values), or None
+    """
+    path = [column.encode('utf-8')]
+    with _open_input_file(file) as f:
+        try:
+            metadata = _file_metadata(f)
+        except (IndexError, ValueError):
+            return None
+        if metadata is None:
+            return None
+
+        nulls = 0
+        values = set()
+        for row_group in metadata.get(4) or []:
+            meta = next((chunk.get(3) for chunk in row_group.get(1) or []
+                         if chunk.get(3) and chunk[3].get(3) == path), None)
+            if meta is None or (meta.get(12) or {}).get(3) is None:
+                return None
+
+            null_count = meta[12][3]
+            nulls += null_count
+            if null_count == meta.get(5):
+                #Only nulls: writers may not write a dictionary page for them
+                continue
+            if not _only_dictionary_data_pages(meta):
+                return None
+            try:
+                dictionary = _dictionary_page(f, meta)
+            except (IndexError, ValueError):
+                #Truncated or unexpected page header: read the column instead
+                dictionary = None
+            if dictionary is None:
+                return None
+            values.update(dictionary)
+    return nulls, values
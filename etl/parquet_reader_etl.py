@@ -0,0 +1,187 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.fs
+import pyarrow.parquet as pq
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from etl.config import DICTIONARY_COLUMNS
+from etl.local_part_cache_etl import local_part_cache
+
+#Defaults: how many parts are fetched ahead on the thread pool, and how many bytes of already-downloaded
+#(but not yet consumed) frames may sit in memory before prefetching pauses
+PREFETCH_WORKERS = 4
+PREFETCH_MAX_BYTES = 512 * 1024 * 1024
+
+#Pandas dtype of every text column in the pipeline: Arrow buffers underneath, pd.NA for missing.
+#Plain 'string' is Python-object backed on pandas < 3 and would materialise one PyObject per value
+STRING_DTYPE = pd.StringDtype('pyarrow')
+
+
+def arrow_types_mapper(arrow_type):
+    """
+    types_mapper for pyarrow's Table.to_pandas: string columns become STRING_DTYPE, everything else keeps the
+    default conversion (dictionary columns become categoricals).
+    """
+    if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+        return STRING_DTYPE
+    return None
+
+
+#DICTIONARY_COLUMNS are decoded straight from the parquet dictionary pages into categoricals
+PARQUET_FORMAT = ds.ParquetFileFormat(read_options=ds.ParquetReadOptions(dictionary_columns=DICTIONARY_COLUMNS))
+
+
+#Cached local copies are memory-mapped: repeat reads are page-cache reads, no copy into Arrow buffers
+_MMAP_FS = pa.fs.LocalFileSystem(use_mmap=True)
+
+
+def _filter_expression(filter):
+    #pyarrow.compute expressions pass through, DNF lists ([('col', '==', value), ...]) as in pq.read_table(filters=)
+    if filter is None or isinstance(filter, ds.Expression):
+        return filter
+    return pq.filters_to_expression(filter)
+
+
+def read_part(file, columns=None, filter=None, etag=None):
+    """
+    Read one parquet part into a DataFrame whose string columns are STRING_DTYPE (no Python string objects are
+    created, the Arrow buffers are shared). DICTIONARY_COLUMNS are decoded straight from the parquet dictionary
+    pages into categoricals.
+
+    Reads go through pyarrow.dataset: only the projected columns' pages are downloaded, and a filter skips row
+    groups whose statistics rule it out before the remaining rows are filtered.
+
+    With LOCAL_PART_CACHE_DIR set, s3:// parts are read from the worker's local part cache (downloaded whole on a
+    miss, see etl/local_part_cache_etl.py) and memory-mapped.
+
+    :param file: s3 URI (s3://...) or local path of a parquet file
+    :param columns: Optional list of columns to read (column projection)
+    :param filter: Optional row filter: pyarrow.compute expression (e.g. pc.field('job_skills').is_valid()) or
+                   DNF list as in pq.read_table(filters=). Filter columns do not need to be in columns
+    :param etag: Optional current ETag of an s3:// part (saves the cache a HEAD request)
+    """
+    cache = local_part_cache() if file.startswith('s3://') else None
+    local = cache.fetch(file, etag) if cache is not None else None
+    if local is not None:
+        try:
+            return _read_table(local, columns, filter, filesystem=_MMAP_FS)
+        except FileNotFoundError:
+            #Evicted by another task between fetch and open: read from S3 instead
+            pass
+    return _read_table(file, columns, filter)
+
+
+def _read_table(source, columns, filter, filesystem=None):
+    table = ds.dataset(source, format=PARQUET_FORMAT, filesystem=filesystem).to_table(columns=columns, filter=_filter_expression(filter))
+    return table.to_pandas(types_mapper=arrow_types_mapper)
+
+
+def _read_metadata(file, etag):
+    #Footer of the locally cached copy when there is one: no S3 request on the consumer thread
+    cache = local_part_cache() if etag is not None and file.startswith('s3://') else None
+    local = cache.cached(file, etag) if cache is not None else None
+    if local is not None:
+        try:
+            return pq.read_metadata(local)
+        except FileNotFoundError:
+            #Evicted meanwhile
+            pass
+    return pq.read_metadata(file)
+
+
+def _estimated_bytes(file, columns, etag=None):
+    #Uncompressed size of the projected column chunks, from the footer alone (a local read for cached parts, one
+    #small range read on S3 otherwise). Close to the Arrow size of the frame; 0 when the footer can't be read (the
+    #read itself then raises in order)
+    try:
+        metadata = _read_metadata(file, etag)
+    except (OSError, pa.ArrowException):
+        return 0
+    wanted = set(columns) if columns is not None else None
+    total = 0
+    for rg in range(metadata.num_row_groups):
+        row_group = metadata.row_group(rg)
+        for c in range(row_group.num_columns):
+            chunk = row_group.column(c)
+            if wanted is None or chunk.path_in_schema.split('.')[0] in wanted:
+                total += chunk.total_uncompressed_size
+    return total
+
+
+def _read_part(file, columns, filter, etag):
+    #Runs on the pool thread. Measure the frame here so the consumer never pays for it
+    df = read_part(file, columns, filter, etag)
+    return df, int(df.memory_usage(index=False, deep=True).sum())
+
+
+def read_parts(s3_parquet_files, columns=None, read_options=None, filter=None):
+    """
+    Yield one DataFrame per parquet part, in the same order as s3_parquet_files, while the next parts are
+    downloaded in the background.
+
+    Purpose:
+    - Streaming transforms used to read one part, process it, then read the next, so the network sat idle while
+      pandas worked and vice versa. Here the next N parts are fetched on a thread pool while the caller processes
+      the current one.
+    - Parts are always yielded in input order, so cross-file "first wins" deduplication behaves exactly as a plain
+      loop over the files.
+
+    Memory:
+    - At most max_workers parts are in flight. Each submitted part reserves its estimated size (uncompressed size of
+      the projected columns from its parquet footer, replaced by the measured frame size once downloaded) until the
+      caller consumes it, and no new fetch is started if it would take the reservations past max_buffered_bytes
+      (at least one part is always in flight so the reader cannot stall).
+
+    :param s3_parquet_files: List of s3 URIs (s3://...) that point to parquet files
+    :param columns: Optional list of columns to read (column projection). Callers should always pass the columns
+                    they use: the others are never downloaded
+    :param filter: Optional row filter pushed down to the reader (see read_part)
+    :param read_options: Optional dictionary with max_workers (int, <=1 disables prefetch) and
+                         max_buffered_bytes (int or None for no budget)
+    """
+    read_options = read_options or {}
+    max_workers = read_options.get('max_workers', PREFETCH_WORKERS)
+    max_buffered_bytes = read_options.get('max_buffered_bytes', PREFETCH_MAX_BYTES)
+
+    files = list(s3_parquet_files)
+
+    #With the local part cache, one listing per directory gives every part's ETag (no HEAD request per part)
+    cache = local_part_cache()
+    s3_files = [file for file in files if file.startswith('s3://')]
+    etags = cache.etags(s3_files) if cache is not None and s3_files else {}
+
+    #Plain sequential read when prefetching is switched off
+    if not max_workers or max_workers <= 1:
+        for file in files:
+            yield read_part(file, columns, filter, etags.get(file))
+        return
+
+    #(future, estimated bytes) per submitted part, in input order
+    pending = deque()
+    next_file = 0
+    next_estimate = None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        try:
+            while next_file < len(files) or pending:
+                #Top up the prefetch window, respecting both the concurrency and the memory budget
+                while next_file < len(files) and len(pending) < max_workers:
+                    if max_buffered_bytes is not None and next_estimate is None:
+                        next_estimate = _estimated_bytes(files[next_file], columns, etags.get(files[next_file]))
+                    if pending and max_buffered_bytes is not None:
+                        reserved = sum(f.result()[1] if f.done() and f.exception() is None else estimate
+                                       for f, estimate in pending)
+                        if reserved + next_estimate > max_buffered_bytes:
+                            break
+                    pending.append((pool.submit(_read_part, files[next_file], columns, filter, etags.get(files[next_file])),
+                                    next_estimate or 0))
+                    next_file += 1
+                    next_estimate = None
+
+                df, _ = pending.popleft()[0].result()
+                yield df
+        finally:
+            #Caller stopped early (or a read failed): don't start downloads nobody will consume
+            for future, _ in pending:
+                future.cancel()
@@ -1,3 +1,153 @@
+import pyarrow as pa
+import pyarrow.compute as pc
+
+
+def _is_text(arrow_type):
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+
+def _decoded(col):
+    #Hash and min/max kernels work on the dictionary values. All-null columns (empty frames) are read as text
+    if pa.types.is_dictionary(col.type):
+        col = pc.cast(col, col.type.value_type)
+    return pc.cast(col, pa.string()) if pa.types.is_null(col.type) else col
+
+
+def _key_codes(col):
+    #Dense int64 code per row (nulls get their own code) and the number of codes
+    encoded = pc.dictionary_encode(_decoded(col).combine_chunks(), null_encoding='encode')
+    return pc.cast(encoded.indices, pa.int64()), len(encoded.dictionary)
+
+
+def distinct_rows(table, columns):
+    """
+    Number of distinct rows of table[columns], nulls comparing equal (as in df.duplicated). A composite key is
+    reduced to one int64 code per row, re-densified after each column so the codes cannot overflow.
+    """
+    if len(columns) == 1:
+        return len(pc.unique(_decoded(table.column(columns[0]))))
+    key, size = _key_codes(table.column(columns[0]))
+    for col in columns[1:]:
+        codes, n = _key_codes(table.column(col))
+        key, size = _key_codes(pa.chunked_array([pc.add(pc.multiply(key, n), codes)]))
+    return size
+
+
+def column_stats(col, limit=None, text_bounds=True):
+    """
+    Statistics of one Arrow column in a single pass over its buffers.
+
+    - String lengths come from the offsets buffer (bytes). Character lengths are only counted when the byte
+      length exceeds the VARCHAR limit, since a value never has more characters than bytes.
+    - Dictionary (categorical) columns are measured on their distinct values, weighted by value_counts.
+
+    :param col: pyarrow ChunkedArray
+    :param limit: Optional VARCHAR limit (characters)
+    :param text_bounds: Include min/max for text columns. Off for unbounded free text (e.g. job_summary), whose
+                        min/max would be whole values copied into every manifest
+    :return: Dictionary with nulls, empty, max_bytes, max_chars (if counted), min, max, distinct (dictionary columns, single-column keys)
+    """
+    if limit is not None and not (_is_text(col.type) or pa.types.is_dictionary(col.type)):
+        #A VARCHAR limit measures the text form of the value
+        col = pc.cast(col, pa.large_string())
+
+    stats = {'nulls': col.null_count}
+
+    if pa.types.is_dictionary(col.type) and _is_text(col.type.value_type):
+        counts = pc.value_counts(col)
+        values = counts.field('values').dictionary_decode()
+        rows = counts.field('counts')
+        stats['distinct'] = len(values) - values.null_count
+    elif _is_text(col.type):
+        values = col
+        rows = None
+    else:
+        try:
+            min_max = pc.min_max(_decoded(col))
+        except pa.ArrowNotImplementedError:
+            #Unordered types (lists, structs, all-null) have no min/max
+            return stats
+        stats.update(min=min_max['min'].as_py(), max=min_max['max'].as_py())
+        return stats
+
+    lengths = pc.binary_length(values)
+    is_empty = pc.fill_null(pc.equal(lengths, 0), False)
+    stats['empty'] = int(pc.sum(rows.filter(is_empty) if rows is not None else is_empty).as_py() or 0)
+    stats['max_bytes'] = int(pc.max(lengths).as_py() or 0)
+    if limit is not None and stats['max_bytes'] > limit:
+        stats['max_chars'] = int(pc.max(pc.utf8_length(values)).as_py() or 0)
+
+    if not text_bounds:
+        return stats
+    min_max = pc.min_max(values)
+    stats.update(min=min_max['min'].as_py(), max=min_max['max'].as_py())
+    return stats
+
+
+def _check_columns(df_new, wanted_columns):
+    missing = set(wanted_columns) - set(df_new.columns)
+    if missing:
+        raise KeyError(f'column mismatch. Missing: {missing}')
+
+
+def table_stats(df_new, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns, check_duplicates=True):
+    """
+    Statistics of a DataFrame's wanted and key columns (see column_stats), without raising. Text min/max is only
+    kept for key columns and columns with a VARCHAR limit, so free-text values never end up in manifests.
+
+    :param check_duplicates: Count natural key duplicates (one hash pass over the key)
+    :return: Dictionary of {'rows', 'duplicates', 'columns': {column: column_stats}}
+    """
+    columns = list(dict.fromkeys(list(wanted_columns) + list(natural_key_columns)))
+    table = pa.Table.from_pandas(df_new[columns], preserve_index=False)
+
+    stats = {'rows': table.num_rows,
+             'columns': {col: column_stats(table.column(col), VAR_CHAR_LIMITS.get(col),
+                                           text_bounds=col in natural_key_columns or col in VAR_CHAR_LIMITS)
+                         for col in columns},
+             'duplicates': 0}
+
+    #look for duplicates in job_link as that is the determiner (nulls compare equal, as in df.duplicated)
+    if check_duplicates and table.num_rows:
+        distinct = distinct_rows(table, list(natural_key_columns))
+        stats['duplicates'] = table.num_rows - distinct
+        if len(natural_key_columns) == 1:
+            stats['columns'][natural_key_columns[0]]['distinct'] = distinct
+    return stats
+
+
+def check_stats(stats, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns):
+    """
+    Raise ValueError if table statistics break key integrity or VARCHAR limits (see validate_table).
+    """
+    dup_total = stats['duplicates']
+    na_total = {col: stats['columns'][col]['nulls'] for col in natural_key_columns}
+    empty_string_total = {col: stats['columns'][col].get('empty', 0) for col in natural_key_columns}
+
+    if dup_total > 0:
+        raise ValueError(f'The {natural_key_columns} column(s) contains {dup_total} duplicates')
+
+    if any(na_total.values()):
+        raise ValueError(f"NAs total by column: {na_total}")
+
+    if any(empty_string_total.values()):
+        raise ValueError(f'Empty strings total by column: {empty_string_total}')
+
+    #Schema sizing check to prevent MySQL truncation errors
+    violations = {}
+
+    for col, limit in VAR_CHAR_LIMITS.items():
+        if col in wanted_columns:
+            observed_max = stats['columns'][col].get('max_chars', 0)
+            if observed_max > limit:
+
+                violations.update({col: {'max_len': observed_max, 'limit': limit}})
+    #skip if column not in VAR_CHAR_LIMITS. Do not raise an error as it is just the dictionary is broader than the table
+        else:
+            continue
+    if violations:
+        raise ValueError(f'MySQL VARCHAR length limits exceeded: {violations}')
+
 
 def validate_table(df_new, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns):
         """
@@ -10,43 +160,121 @@ def validate_table(df_new, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
         - Check size constraints: max string lengths do not exceed configured VARCHAR limits.
         (Useful if later put into SQL / dashboards with fixed-width fields)
 
+        Implementation notes:
+        - The columns are viewed as Arrow arrays (no copy for Arrow-backed columns) and every statistic comes from
+          one pass per column (see column_stats). Key duplicates are counted on dense integer codes of the key (see distinct_rows).
+        - Tables written in chunks are validated with TableValidator instead.
+
         Args:
         :param df_new: DataFrame to validate.
         :param wanted_columns: Columns that must be present for dataset
         :param VAR_CHAR_LIMITS: Dictionary of {column_name: max_length}.
         :param natural_key_columns: Column(s) that define uniqueness for the table
-        """        
-        missing = set(wanted_columns) - set(df_new.columns)
-        if missing:
-            raise KeyError(f'column mismatch. Missing: {missing}')
-
-        #look for duplicates in job_link as that is the determiner
-        dup_total = df_new.duplicated(subset=natural_key_columns).sum()
-        na_total = df_new[natural_key_columns].isna().sum()
-        empty_string_total = (df_new[natural_key_columns] == '').sum()
-
-        if dup_total > 0:
-            raise ValueError(f'The {natural_key_columns} column(s) contains {dup_total} duplicates')
-        
-        if (na_total > 0).any():
-            raise ValueError(f"NAs total by column: {na_total}")
-        
-        if (empty_string_total > 0).any():
-            raise ValueError(f'Empty strings total by column: {empty_string_total}')
-
-        #Schema sizing check to prevent MySQL truncation errors
-        violations = {}
-
-        for col, limit in VAR_CHAR_LIMITS.items():
-            if col in wanted_columns:
-                observed_max = df_new[col].astype('string').str.len().dropna().max()
-                if observed_max is None:
-                    observed_max = 0
-                if observed_max > limit:
-
-                    violations.update({col: {'max_len': observed_max, 'limit': limit}})
-        #skip if column not in VAR_CHAR_LIMITS. Do not raise an error as it is just the dictionary is broader than the table
-            else:
-                continue
-        if violations:
-            raise ValueError(f'MySQL VARCHAR length limits exceeded: {violations}')
+
+        Returns: Dictionary of {'rows', 'duplicates', 'columns': {column: column_stats}} for logging or manifests.
+        """
+        _check_columns(df_new, wanted_columns)
+        stats = table_stats(df_new, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
+        check_stats(stats, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
+        return stats
+
+
+_DISTINCT_STATS = ('distinct', 'distinct_lower_bound')
+
+
+def _merge_column_stats(a, b):
+    merged = {}
+    for stat in dict.fromkeys(list(a) + list(b)):
+        values = [s[stat] for s in (a, b) if s.get(stat) is not None]
+        if stat in _DISTINCT_STATS:
+            continue
+        if not values:
+            merged[stat] = None
+        elif stat in ('nulls', 'empty'):
+            merged[stat] = sum(values)
+        elif stat == 'min':
+            merged[stat] = min(values)
+        else:
+            #max, max_bytes, max_chars
+            merged[stat] = max(values)
+
+    #Chunks can share values: the largest chunk's distinct count is only a lower bound of the table's
+    if any(stat in s for s in (a, b) for stat in _DISTINCT_STATS):
+        counts = [s[stat] for s in (a, b) for stat in _DISTINCT_STATS if s.get(stat) is not None]
+        merged['distinct_lower_bound'] = max(counts) if counts else None
+    return merged
+
+
+def merge_stats(a, b):
+    """
+    Combine the statistics of two disjoint sets of rows (see table_stats). An exact per-set distinct count becomes
+    distinct_lower_bound in the result.
+    """
+    return {'rows': a['rows'] + b['rows'],
+            'duplicates': a['duplicates'] + b['duplicates'],
+            'columns': {col: _merge_column_stats(a['columns'].get(col, {}), b['columns'].get(col, {}))
+                        for col in dict.fromkeys(list(a['columns']) + list(b['columns']))}}
+
+
+class TableValidator:
+    """
+    validate_table for a table written in chunks: cheap per-chunk aggregates, checked once for the whole table
+
+    Purpose:
+    - Per-chunk validate_table only ever sees one chunk: totals (rows, nulls, longest value) are never known for
+      the table, and each chunk pays the full set of checks. Here update() only gathers column statistics
+      (column_stats), merged with sums / min / max, and finalize() runs the checks once on the table totals.
+    - Missing columns still raise straight away in update(). Key and VARCHAR violations raise in finalize() with
+      table-level counts. Streams deduplicated by a seen-keys store pass check_duplicates=False, as filter_new
+      already guarantees one row per key across chunks (per-chunk counts could not see cross-chunk duplicates).
+    - Passed to a PartitionPublisher, finalize() runs before publishing and the table statistics are written into
+      the partition manifest, next to the row counts of the parts.
+
+    Usage:
+        validator = TableValidator(wanted_columns, VAR_CHAR_LIMITS, natural_key_columns)
+        for df in chunks:
+            validator.update(df)
+        stats = validator.finalize()
+    """
+
+    def __init__(self, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns, check_duplicates=True):
+        """
+        :param wanted_columns: Columns that must be present for dataset
+        :param VAR_CHAR_LIMITS: Dictionary of {column_name: max_length}
+        :param natural_key_columns: Column(s) that define uniqueness for the table
+        :param check_duplicates: Count key duplicates within each chunk
+        """
+        self.wanted_columns = list(wanted_columns)
+        self.VAR_CHAR_LIMITS = VAR_CHAR_LIMITS
+        self.natural_key_columns = list(natural_key_columns)
+        self.check_duplicates = check_duplicates
+        self.stats = None
+
+    def update(self, df):
+        """
+        Add one chunk's statistics. Raises KeyError on missing columns.
+        """
+        _check_columns(df, self.wanted_columns)
+        self.merge(table_stats(df, self.wanted_columns, self.VAR_CHAR_LIMITS, self.natural_key_columns,
+                               check_duplicates=self.check_duplicates))
+
+    def merge(self, stats):
+        """
+        Add statistics computed elsewhere (e.g. returned by validate_table in a worker process).
+        """
+        self.stats = stats if self.stats is None else merge_stats(self.stats, stats)
+
+    def finalize(self):
+        """
+        Check the table totals (raises ValueError like validate_table) and return them.
+
+        :return: Dictionary of {'rows', 'duplicates', 'columns': {column: stats}}
+        """
+        stats = self.stats or {'rows': 0, 'duplicates': 0, 'columns': {}}
+        if self.stats is not None:
+            check_stats(stats, self.wanted_columns, self.VAR_CHAR_LIMITS, self.natural_key_columns)
+
+        key_nulls = {col: stats['columns'][col]['nulls'] for col in self.natural_key_columns if col in stats['columns']}
+        longest = {col: s['max_bytes'] for col, s in stats['columns'].items() if s.get('max_bytes') is not None}
+        print(f"[validate] {stats['rows']} rows, key nulls {key_nulls}, max bytes {longest}")
+        return stats
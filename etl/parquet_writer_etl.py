@@ -0,0 +1,204 @@
+import io
+import os
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+from botocore.config import Config
+from boto3.s3.transfer import TransferConfig
+from etl.config import PARQUET_WRITE_OPTIONS
+
+#Concurrent uploads, and parts accepted but not yet uploaded before write_parquet blocks the caller
+UPLOAD_WORKERS = 4
+MAX_IN_FLIGHT = 4
+
+#boto3 managed transfer: parts above the threshold are uploaded as concurrent multipart chunks
+MULTIPART_THRESHOLD = 64 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+MULTIPART_CONCURRENCY = 8
+
+
+def s3_client():
+    # Robust defaults for flaky connections
+    return boto3.client('s3', config=Config(retries={'max_attempts': 10, 'mode': 'standard'},connect_timeout=30,read_timeout=300))
+
+
+def transfer_config():
+    return TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, multipart_chunksize=MULTIPART_CHUNKSIZE,
+                          max_concurrency=MULTIPART_CONCURRENCY, use_threads=True)
+
+
+def _split_s3_uri(uri):
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def write_options(table=None):
+    """
+    Parquet settings for a table: PARQUET_WRITE_OPTIONS['default'] overridden by the table's own entry.
+    """
+    return {**PARQUET_WRITE_OPTIONS['default'], **PARQUET_WRITE_OPTIONS.get(table, {})}
+
+
+def serialise_parquet(df, table=None):
+    """
+    Serialise a DataFrame to parquet bytes in memory (same layout as df.to_parquet(index=False)), with the
+    table's compression codec and row group size. A pyarrow Table is written as is.
+    """
+    options = write_options(table)
+    buf = pa.BufferOutputStream()
+    data = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(data, buf,
+                   compression=options['compression'], row_group_size=options['row_group_size'])
+    return buf.getvalue().to_pybytes()
+
+
+def _upload(s3, body, bucket, key, rows):
+    s3.upload_fileobj(io.BytesIO(body), bucket, key, Config=transfer_config())
+    return {'rows': rows, 'bytes': len(body), 'md5': hashlib.md5(body).hexdigest()}
+
+
+def put_parquet(df, bucket, key, s3=None, table=None):
+    """
+    Serialise a DataFrame to parquet in memory and upload it to s3://bucket/key (blocking).
+
+    :return: Dictionary of {'rows', 'bytes', 'md5'} describing the written object (used in manifests)
+    """
+    return _upload(s3 or s3_client(), serialise_parquet(df, table), bucket, key, int(len(df)))
+
+
+class ParquetWriterPool:
+    """
+    Asynchronous parquet writer: the caller hands over a frame and carries on computing
+
+    Purpose:
+    - Writes used to block the transform: s3fs to_parquet, or a full local write followed by an upload. Here frames
+      are serialised on one background thread while earlier parts upload on a thread pool (boto3 multipart for
+      large parts).
+    - At most max_in_flight parts are queued or uploading. submit() blocks beyond that, so memory stays bounded
+      when uploads are slower than compute.
+
+    A submitted frame must not be modified afterwards. Errors surface from the returned Future and from wait().
+    """
+
+    def __init__(self, s3=None, upload_workers=UPLOAD_WORKERS, max_in_flight=MAX_IN_FLIGHT):
+        """
+        :param s3: Optional boto3 S3 client
+        :param upload_workers: Concurrent uploads
+        :param max_in_flight: Parts accepted but not yet uploaded before submit() blocks
+        """
+        self.s3 = s3 or s3_client()
+        self._serialiser = ThreadPoolExecutor(max_workers=1)
+        self._uploader = ThreadPoolExecutor(max_workers=upload_workers)
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self.pending = {}
+
+    def submit(self, df, bucket, key, table=None, s3=None):
+        """
+        Queue one parquet part for s3://bucket/key.
+
+        :param table: Table name selecting the PARQUET_WRITE_OPTIONS entry
+        :param s3: Optional boto3 client for this write (defaults to the pool's)
+        :return: Future resolving to {'rows', 'bytes', 'md5'}
+        """
+        self._slots.acquire()
+        future = Future()
+        s3 = s3 or self.s3
+
+        def upload(body):
+            try:
+                future.set_result(_upload(s3, body, bucket, key, int(len(df))))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                self._slots.release()
+
+        def serialise():
+            try:
+                body = serialise_parquet(df, table)
+            except BaseException as e:
+                self._slots.release()
+                future.set_exception(e)
+                return
+            self._uploader.submit(upload, body)
+
+        uri = f's3://{bucket}/{key}'
+
+        def forget(done):
+            #Drop uploaded parts as they land so pending only holds writes in flight. A failed write stays until
+            #wait() re-raises it
+            with self._lock:
+                if done.exception() is None and self.pending.get(uri) is done:
+                    del self.pending[uri]
+
+        with self._lock:
+            self.pending[uri] = future
+        future.add_done_callback(forget)
+        self._serialiser.submit(serialise)
+        return future
+
+    def wait(self, uris=None):
+        """
+        Block until the given URIs (default: every pending write) are uploaded. URIs this pool never wrote, or
+        that already finished uploading, are ignored. Re-raises the first failed upload.
+
+        :return: Dictionary of {uri: {'rows', 'bytes', 'md5'}} for the writes still in flight when called
+        """
+        with self._lock:
+            uris = list(self.pending) if uris is None else [uri for uri in uris if uri in self.pending]
+            futures = {uri: self.pending[uri] for uri in uris}
+        try:
+            return {uri: future.result() for uri, future in futures.items()}
+        finally:
+            with self._lock:
+                for uri, future in futures.items():
+                    if future.done() and self.pending.get(uri) is future:
+                        del self.pending[uri]
+
+    def close(self):
+        """
+        Wait for every pending write, then stop the threads.
+        """
+        try:
+            self.wait()
+        finally:
+            self._serialiser.shutdown(wait=True)
+            self._uploader.shutdown(wait=True)
+
+
+_shared = None
+_shared_pid = None
+
+
+def parquet_writer():
+    """
+    The process-wide ParquetWriterPool (a new one after a fork, as worker processes don't inherit threads).
+    """
+    global _shared, _shared_pid
+    if _shared is None or _shared_pid != os.getpid():
+        _shared = ParquetWriterPool()
+        _shared_pid = os.getpid()
+    return _shared
+
+
+def write_parquet(df, uri, table=None, s3=None):
+    """
+    Write a DataFrame to an s3:// URI in the background (see ParquetWriterPool). Call wait_for_writes before
+    relying on the object.
+
+    :return: Future resolving to {'rows', 'bytes', 'md5'}
+    """
+    bucket, key = _split_s3_uri(uri)
+    return parquet_writer().submit(df, bucket, key, table=table, s3=s3)
+
+
+def wait_for_writes(uris=None):
+    """
+    Wait for background writes of this process (default: all of them), re-raising the first failure.
+    """
+    if _shared is None or _shared_pid != os.getpid():
+        return {}
+    return _shared.wait(uris)
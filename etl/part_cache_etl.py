@@ -0,0 +1,157 @@
+import os
+import glob
+import json
+import hashlib
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from etl.parquet_writer_etl import s3_client
+from etl.part_ledger_etl import list_etags, _split_s3_uri, _json_default
+from etl.delete_s3_URI import delete_s3_keys
+
+#Cache entries live at s3://<bucket>/<CACHE_PREFIX>/<code fingerprint>/<key>.json
+CACHE_PREFIX = '_cache/parts'
+
+#Concurrent lookups / server-side copies when replaying cache hits
+CACHE_WORKERS = 8
+
+
+@lru_cache(maxsize=1)
+def code_fingerprint():
+    """
+    Hash of every etl/*.py source file. Any code change invalidates the cache, so a hit can never replay output
+    produced by different cleaning logic.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '*.py'))):
+        digest.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class PartCache:
+    """
+    Content-addressed cache of per-part transform outputs
+
+    Purpose:
+    - Re-ingesting the same CSV snapshot under a new run_date produces byte-identical raw parts, and every cleaner
+      then recomputes byte-identical outputs. Here each part's outputs are remembered under a key built from:
+      the input part's ETag, its position, the transform name, the config (WANTED_COLUMNS, ...) and the etl code
+      fingerprint. On a hit the previous outputs are server-side copied into this run's prefixes instead of
+      downloading and recomputing the part.
+
+    Output mapping:
+    - prefixes is {name: output prefix} for this run (e.g. the fan-out tables). Outputs are stored relative to
+      those prefixes, so a hit recorded under run_date=A is replayed under run_date=B.
+    - The source outputs' ETags are stored with the entry and copies use CopySourceIfMatch: if a cached output
+      was deleted or overwritten since, the hit is treated as a miss and the part is recomputed.
+
+    Growth:
+    - Entries are grouped by code fingerprint (<CACHE_PREFIX>/<fingerprint>/). Entries written by other versions of
+      the etl code can never hit again: prune() deletes them. Entries of older CSV snapshots under the current code
+      are left to the bucket lifecycle rule on _cache/ (see README).
+    """
+
+    def __init__(self, bucket, name, config, prefixes, s3=None):
+        """
+        :param bucket: S3 bucket holding the outputs and the cache entries
+        :param name: Transform identity (e.g. 'raw_fan_out')
+        :param config: JSON-serialisable configuration that affects the outputs
+        :param prefixes: Dictionary of {name: output key prefix} for this run
+        :param s3: Optional boto3 S3 client
+        """
+        self.bucket = bucket
+        self.s3 = s3 or s3_client()
+        self.prefixes = {k: v.rstrip('/') for k, v in prefixes.items()}
+        self.identity = json.dumps({'name': name, 'config': config, 'code': code_fingerprint()}, sort_keys=True, default=str)
+
+    def etags(self, uris):
+        return list_etags(self.s3, uris)
+
+    def _key(self, etag, i):
+        digest = hashlib.sha256(json.dumps([self.identity, etag, i]).encode('utf-8')).hexdigest()
+        return f'{CACHE_PREFIX}/{code_fingerprint()}/{digest}.json'
+
+    def prune(self):
+        """
+        Delete the cache entries written by any other version of the etl code (they can never hit again).
+
+        :return: Number of entries deleted
+        """
+        current = f'{CACHE_PREFIX}/{code_fingerprint()}/'
+        paginator = self.s3.get_paginator('list_objects_v2')
+        stale = (obj['Key'] for page in paginator.paginate(Bucket=self.bucket, Prefix=f'{CACHE_PREFIX}/')
+                 for obj in page.get('Contents', []) if not obj['Key'].startswith(current))
+        deleted = delete_s3_keys(self.bucket, stale, s3=self.s3)
+        if deleted:
+            print(f'[cache] pruned {deleted} entries written by other etl code versions')
+        return deleted
+
+    def _relative(self, uri):
+        #Longest matching prefix wins, so nested prefixes map to the most specific table
+        bucket, key = _split_s3_uri(uri)
+        for name, prefix in sorted(self.prefixes.items(), key=lambda item: -len(item[1])):
+            if bucket == self.bucket and key.startswith(f'{prefix}/'):
+                return name, key[len(prefix) + 1:]
+        raise ValueError(f'Output {uri} is not under any cached prefix {self.prefixes}')
+
+    def lookup(self, etag, i):
+        """
+        Replay the cached outputs of a part if present. Returns the part result (with this run's output URIs), or
+        None on a miss.
+        """
+        if etag is None:
+            return None
+        try:
+            entry = json.loads(self.s3.get_object(Bucket=self.bucket, Key=self._key(etag, i))['Body'].read())
+        except self.s3.exceptions.NoSuchKey:
+            return None
+
+        mapping = {}
+        for out in entry['outputs']:
+            mapping[out['source']] = f"s3://{self.bucket}/{self.prefixes[out['name']]}/{out['relative']}"
+
+        try:
+            for out in entry['outputs']:
+                src_bucket, src_key = _split_s3_uri(out['source'])
+                _, dest_key = _split_s3_uri(mapping[out['source']])
+                if (src_bucket, src_key) == (self.bucket, dest_key):
+                    #Same run_date again: the output is already in place if it is unchanged
+                    if self.s3.head_object(Bucket=src_bucket, Key=src_key)['ETag'] != out['etag']:
+                        raise ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'HeadObject')
+                else:
+                    self.s3.copy_object(Bucket=self.bucket, Key=dest_key, CopySourceIfMatch=out['etag'],
+                                        CopySource={'Bucket': src_bucket, 'Key': src_key})
+        except ClientError as e:
+            print(f'[cache] stale entry for part {i} ({e.response["Error"].get("Code")}), recomputing')
+            return None
+
+        result = entry['result']
+        if isinstance(result, dict) and 'outputs' in result:
+            result = {**result, 'outputs': [mapping[uri] for uri in result['outputs']]}
+        return result
+
+    def lookup_many(self, etags_by_index):
+        """
+        Concurrent lookup for {i: etag}. Returns {i: result} for the hits.
+        """
+        with ThreadPoolExecutor(max_workers=CACHE_WORKERS) as pool:
+            futures = {i: pool.submit(self.lookup, etag, i) for i, etag in etags_by_index.items()}
+        return {i: f.result() for i, f in futures.items() if f.result() is not None}
+
+    def store(self, etag, i, result):
+        """
+        Remember a computed part's outputs (result['outputs']) and result under its content key.
+        """
+        if etag is None or not isinstance(result, dict):
+            return
+        outputs = []
+        for uri in result.get('outputs', []):
+            name, relative = self._relative(uri)
+            src_bucket, src_key = _split_s3_uri(uri)
+            etag_out = self.s3.head_object(Bucket=src_bucket, Key=src_key)['ETag']
+            outputs.append({'source': uri, 'name': name, 'relative': relative, 'etag': etag_out})
+
+        body = json.dumps({'outputs': outputs, 'result': result}, default=_json_default).encode('utf-8')
+        self.s3.put_object(Bucket=self.bucket, Key=self._key(etag, i), Body=body, ContentType='application/json')
@@ -0,0 +1,157 @@
+import json
+import posixpath
+import time
+from etl.parquet_writer_etl import s3_client
+
+LEDGER_NAME = '_ledger.json'
+
+#Minimum seconds between ledger checkpoints while parts complete (the ledger is always saved at the end)
+LEDGER_SAVE_SECONDS = 30
+
+
+def _split_s3_uri(uri):
+    bucket, _, key = uri[len('s3://'):].partition('/')
+    return bucket, key
+
+
+def _json_default(obj):
+    #Part results may carry sets of distinct values (job_type/job_level), stored as sorted lists
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f'Part result of type {type(obj).__name__} cannot be stored in the ledger')
+
+
+def list_objects_by_uri(s3, uri_prefix):
+    """
+    List the objects under an s3://bucket/prefix directory.
+
+    :return: Dictionary of {uri: object} with ETag and Size
+    """
+    bucket, prefix = _split_s3_uri(uri_prefix)
+    paginator = s3.get_paginator('list_objects_v2')
+    return {f's3://{bucket}/{obj["Key"]}': obj
+            for page in paginator.paginate(Bucket=bucket, Prefix=f'{prefix}/')
+            for obj in page.get('Contents', [])}
+
+
+def list_etags(s3, uris, listings=None):
+    """
+    Current ETag of every URI, from one listing per directory (no per-object HEAD requests).
+
+    :param listings: Optional dictionary cache of {directory uri: listing}, filled as directories are listed
+    :return: Dictionary of {uri: etag or None if missing}
+    """
+    listings = {} if listings is None else listings
+    etags = {}
+    for uri in uris:
+        directory = posixpath.dirname(uri)
+        if directory not in listings:
+            listings[directory] = list_objects_by_uri(s3, directory)
+        obj = listings[directory].get(uri)
+        etags[uri] = obj['ETag'] if obj else None
+    return etags
+
+
+class PartLedger:
+    """
+    Per-task checkpoint of which input parts have already been transformed
+
+    Purpose:
+    - Every task retry (retries=5) used to reprocess the whole run_date partition. The ledger records, per unit of
+      work (one input part, or a batch of parts), the input URIs with their S3 ETags and the output parts it
+      produced. A retry or rerun skips units whose inputs are unchanged and whose outputs still exist.
+    - The ledger is a JSON object in S3 (e.g. <output prefix>/_ledger.json). It starts with '_' and is not a
+      .parquet file, so list_parquet_files and Athena ignore it.
+    - config identifies what produced the outputs (task name, columns, ...). A ledger written with a different
+      config is ignored and the task runs from scratch.
+
+    Unit keys are the first input URI of the unit. list_parquet_files returns a sorted list, so units line up
+    between runs of the same partition.
+    """
+
+    def __init__(self, bucket, key, config=None, s3=None):
+        """
+        :param bucket: S3 bucket holding the ledger
+        :param key: Ledger object key
+        :param config: JSON-serialisable description of the task configuration
+        :param s3: Optional boto3 S3 client
+        """
+        self.bucket = bucket
+        self.key = key
+        self.config = json.loads(json.dumps(config, default=str))
+        self.s3 = s3 or s3_client()
+        self.entries = {}
+        self._last_save = time.monotonic()
+        self._dirty = False
+        self._listings = {}
+
+        try:
+            stored = json.loads(self.s3.get_object(Bucket=bucket, Key=key)['Body'].read())
+        except self.s3.exceptions.NoSuchKey:
+            stored = None
+
+        if stored and stored.get('config') == self.config:
+            self.entries = stored.get('entries', {})
+        elif stored:
+            print(f'[ledger] s3://{bucket}/{key} was written with a different config, ignoring it')
+
+    def _list(self, uri_prefix):
+        #One listing per directory, reused for input ETags and output existence checks
+        if uri_prefix not in self._listings:
+            self._listings[uri_prefix] = list_objects_by_uri(self.s3, uri_prefix)
+        return self._listings[uri_prefix]
+
+    def etags(self, uris):
+        """
+        Current ETag of every input URI (see list_etags).
+
+        :return: Dictionary of {uri: etag}
+        """
+        return list_etags(self.s3, uris, self._listings)
+
+    def _outputs_exist(self, outputs):
+        return all(out in self._list(posixpath.dirname(out)) for out in outputs)
+
+    def done(self, inputs, etags):
+        """
+        Return the stored entry if this unit already completed with the same inputs and its outputs still exist,
+        otherwise None.
+
+        :param inputs: List of input URIs of the unit
+        :param etags: Dictionary of {uri: current etag}
+        """
+        entry = self.entries.get(inputs[0])
+        if entry is None:
+            return None
+        if entry['inputs'] != {uri: etags[uri] for uri in inputs}:
+            return None
+        if not self._outputs_exist(entry['outputs']):
+            return None
+        return entry
+
+    def record(self, inputs, etags, outputs, result=None):
+        """
+        Record a completed unit and checkpoint the ledger if the last save is older than LEDGER_SAVE_SECONDS.
+
+        :param inputs: List of input URIs of the unit
+        :param etags: Dictionary of {uri: etag} observed before the unit was processed
+        :param outputs: List of output URIs the unit wrote
+        :param result: Optional JSON-serialisable result, returned again when the unit is skipped
+        """
+        self.entries[inputs[0]] = json.loads(json.dumps({'inputs': {uri: etags[uri] for uri in inputs},
+                                                         'outputs': list(outputs),
+                                                         'result': result}, default=_json_default))
+        self._dirty = True
+        if time.monotonic() - self._last_save >= LEDGER_SAVE_SECONDS:
+            self.save()
+
+    def save(self):
+        """
+        Write the ledger to S3 (no-op if nothing changed since the last save).
+        """
+        if not self._dirty:
+            return
+        body = json.dumps({'config': self.config, 'entries': self.entries}, indent=1).encode('utf-8')
+        self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=body, ContentType='application/json')
+        self._last_save = time.monotonic()
+        self._dirty = False
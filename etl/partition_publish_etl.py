@@ -0,0 +1,172 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, wait
+from etl.delete_s3_URI import delete_s3_keys, delete_s3_prefix
+from etl.parquet_writer_etl import s3_client, parquet_writer
+
+MANIFEST_NAME = '_manifest.json'
+
+#Concurrent server-side copies when publishing
+PUBLISH_WORKERS = 8
+
+
+def _list_objects(s3, bucket, prefix):
+    paginator = s3.get_paginator('list_objects_v2')
+    return {obj['Key']: obj for page in paginator.paginate(Bucket=bucket, Prefix=prefix) for obj in page.get('Contents', [])}
+
+
+def _read_manifest(s3, bucket, key):
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=key)['Body'].read())
+    except s3.exceptions.NoSuchKey:
+        return None
+
+
+class PartitionPublisher:
+    """
+    Write a partition's parts under a private attempt prefix and publish them to the live prefix in one short step
+
+    Purpose:
+    - delete-then-write leaves the live run_date= prefix empty or half-written for the whole transform, and a crash
+      mid-way leaves partial data behind.
+    - Here parts are written to <parent>/_attempts/<leaf>/<attempt_id>/ (Athena and list_parquet_files skip
+      paths starting with '_'). Only publish() touches the live prefix, after every part has been written:
+      1. write _manifest.json (part names, row counts, sizes, md5) in the attempt prefix
+      2. server-side copy changed parts into the live prefix. A part whose md5 and size match the live manifest is
+         skipped, so reruns producing the same output copy nothing
+      3. delete live objects that are not in the new manifest, then copy the manifest in last
+      4. delete the attempt prefix
+    - Readers see at worst a mix of old and new parts during steps 2-3 (seconds of server-side copies), never an
+      empty or partially computed partition.
+
+    Usage:
+        with PartitionPublisher(bucket, out_prefix_key) as publisher:
+            publisher.write(df, 'part_0001.parquet')
+    Leaving the block publishes. An exception aborts: the attempt is deleted and the live prefix is untouched.
+    write() uploads in the background (etl/parquet_writer_etl.py), publish() waits for every part first.
+    With a TableValidator (etl/parquet_validation_etl.py), publish() finalizes it before touching the live prefix,
+    checks its row count against the parts and adds the table statistics to the manifest under 'validation'.
+    If nothing was written, the live prefix is left as it was (same as the old "skip empty output" behaviour).
+    """
+
+    def __init__(self, bucket, prefix, s3=None, table=None, validator=None):
+        """
+        :param bucket: S3 bucket name
+        :param prefix: Live partition key prefix (e.g. curated/location/run_date=2024-01-01)
+        :param s3: Optional boto3 S3 client
+        :param table: Optional table name selecting the parquet write options (PARQUET_WRITE_OPTIONS)
+        :param validator: Optional TableValidator updated with every written chunk by the caller
+        """
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/')
+        self.s3 = s3 or s3_client()
+        self.table = table
+        self.validator = validator
+
+        parent, _, leaf = self.prefix.rpartition('/')
+        self.attempt_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}_{uuid.uuid4().hex[:8]}"
+        self.attempt_prefix = f"{parent + '/' if parent else ''}_attempts/{leaf}/{self.attempt_id}"
+        self.parts = {}
+        self._writes = {}
+
+    def write(self, df, name):
+        """
+        Queue one part (parquet) for the attempt prefix. The upload runs in the background.
+
+        :param df: DataFrame or pyarrow Table to write (must not be modified afterwards)
+        :param name: Part file name, e.g. part_0001.parquet
+        """
+        self._writes[name] = parquet_writer().submit(df, self.bucket, f'{self.attempt_prefix}/{name}', table=self.table, s3=self.s3)
+
+    def _wait_for_writes(self):
+        writes, self._writes = self._writes, {}
+        for name, future in writes.items():
+            self.add_part(name, future.result())
+
+    def add_part(self, name, info):
+        """
+        Register a part already uploaded to <attempt_prefix>/<name> (e.g. by a worker process using put_parquet).
+
+        :param name: Part file name
+        :param info: Dictionary of {'rows', 'bytes', 'md5'} as returned by put_parquet
+        """
+        self.parts[name] = info
+
+    def _copy(self, name):
+        self.s3.copy({'Bucket': self.bucket, 'Key': f'{self.attempt_prefix}/{name}'}, self.bucket, f'{self.prefix}/{name}')
+
+    def publish(self):
+        """
+        Publish the attempt to the live prefix (see class docstring). Returns the manifest, or None if nothing was written.
+        """
+        self._wait_for_writes()
+        if not self.parts:
+            self.abort()
+            return None
+
+        manifest = {'attempt_id': self.attempt_id,
+                    'published_at': datetime.now(timezone.utc).isoformat(),
+                    'total_rows': sum(p['rows'] for p in self.parts.values()),
+                    'parts': [{'name': name, **info} for name, info in sorted(self.parts.items())]}
+
+        if self.validator is not None:
+            stats = self.validator.finalize()
+            if stats['rows'] != manifest['total_rows']:
+                raise ValueError(f"Validated {stats['rows']} rows but the parts hold {manifest['total_rows']}")
+            manifest['validation'] = stats
+
+        manifest_key = f'{self.attempt_prefix}/{MANIFEST_NAME}'
+        #default=str: min/max statistics can be dates or timestamps
+        self.s3.put_object(Bucket=self.bucket, Key=manifest_key, Body=json.dumps(manifest, indent=2, default=str).encode('utf-8'),
+                           ContentType='application/json')
+
+        live = _list_objects(self.s3, self.bucket, f'{self.prefix}/')
+        live_manifest = _read_manifest(self.s3, self.bucket, f'{self.prefix}/{MANIFEST_NAME}') or {'parts': []}
+        live_parts = {p['name']: p for p in live_manifest['parts']}
+
+        #Skip parts that are already live with identical content
+        changed = []
+        for name, info in sorted(self.parts.items()):
+            old = live_parts.get(name)
+            live_obj = live.get(f'{self.prefix}/{name}')
+            if old and live_obj and old['md5'] == info['md5'] and live_obj['Size'] == info['bytes']:
+                continue
+            changed.append(name)
+
+        with ThreadPoolExecutor(max_workers=PUBLISH_WORKERS) as pool:
+            list(pool.map(self._copy, changed))
+
+        keep = {f'{self.prefix}/{name}' for name in self.parts} | {f'{self.prefix}/{MANIFEST_NAME}'}
+        delete_s3_keys(self.bucket, (key for key in live if key not in keep), s3=self.s3)
+
+        self.s3.copy({'Bucket': self.bucket, 'Key': manifest_key}, self.bucket, f'{self.prefix}/{MANIFEST_NAME}')
+        delete_s3_prefix(self.bucket, f'{self.attempt_prefix}/')
+
+        print(f'[publish] s3://{self.bucket}/{self.prefix}: {len(changed)} of {len(self.parts)} parts copied, '
+              f"{manifest['total_rows']} rows")
+        return manifest
+
+    def abort(self):
+        """
+        Drop the attempt. The live prefix is left untouched.
+        """
+        #Let queued uploads land first, otherwise they would recreate objects after the delete
+        wait(list(self._writes.values()))
+        self._writes = {}
+        delete_s3_prefix(self.bucket, f'{self.attempt_prefix}/')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            try:
+                self.publish()
+            except BaseException:
+                #A failed validation or upload must not leave the attempt behind
+                self.abort()
+                raise
+        else:
+            self.abort()
+        return False
@@ -0,0 +1,202 @@
+from etl.cleaning_job_posting_staging import clean_job_posting_frame
+from etl.search_context_build_etl import clean_search_context_frame
+from etl.job_title_etl import clean_job_title_frame, dropable_list
+from etl.location_etl import clean_location_frame
+from etl.clean_company_etl import clean_company_frame
+from etl.skills_parsing_etl import explode_skills_frame, write_skills_parts, _boto3_client
+from etl.job_level_etl import job_level_part_values, write_job_level
+from etl.job_type_etl import job_type_part_values, write_job_type
+from etl.delete_s3_URI import delete_s3_keys
+from etl.debug_tools_etl import debug_function
+from etl.parallel_parts_etl import run_parts
+from etl.parquet_writer_etl import write_parquet, s3_client
+from etl.part_ledger_etl import PartLedger, list_objects_by_uri, _split_s3_uri
+from etl.part_cache_etl import PartCache
+
+#Dimensions aggregated across parts and published once, not written per part
+AGGREGATED_TABLES = ('job_type', 'job_level')
+
+#Raw columns each fan-out output needs. Tables that take wanted_columns from config are filled in at call time
+FAN_OUT_COLUMNS = {'job_title_staging':['job_link','job_title'],
+                   'location':['job_location'],
+                   'company':['company','job_link'],
+                   'company_w_unknown':['company','job_link'],
+                   'job_type':['job_type'],
+                   'job_level':['job_level']}
+
+
+def _fan_out_part(df, i, bucket, prefixes, wanted_columns, debug, max_rows_per_part):
+    """
+    Run every requested cleaner on one raw part and write its outputs.
+
+    :return: Dictionary of {'job_type'/'job_level': (NA count, empty count, distinct values)} for this part,
+             plus 'outputs': the URIs written
+    """
+    part_values = {}
+    outputs = []
+
+    def write(out, table, name):
+        out_path = f"s3://{bucket}/{prefixes[table]}/{name}.parquet"
+        write_parquet(out, out_path, table=table)
+        outputs.append(out_path)
+
+    if 'job_postings_staging' in prefixes:
+        out = clean_job_posting_frame(df, wanted_columns['job_postings_staging'])
+        if debug:
+            debug_function(out, True, wanted_columns['job_postings_staging'])
+        write(out, 'job_postings_staging', f'part_{i+1:05d}')
+
+    if 'job_postings_skills_staging' in prefixes:
+        out = explode_skills_frame(df, wanted_columns['job_postings_skills_staging'], debug=debug)
+        skills_prefix = prefixes['job_postings_skills_staging'].rstrip('/')
+        part_name = f'part_{i+1:05d}_{{n:03d}}'
+        next_n = write_skills_parts(out, bucket, skills_prefix, 1, _boto3_client(),
+                                    max_rows_per_part=max_rows_per_part, debug=debug, part_name=part_name)
+        outputs.extend(f's3://{bucket}/{skills_prefix}/{part_name.format(n=n)}.parquet' for n in range(1, next_n))
+
+    if 'search_context' in prefixes:
+        out = clean_search_context_frame(df, wanted_columns['search_context'])
+        write(out, 'search_context', f'part_{i+1:05d}')
+
+    if 'job_title_staging' in prefixes:
+        out = clean_job_title_frame(df, debug=debug)
+        write(out, 'job_title_staging', f'part_{i:05d}')
+
+    if 'location' in prefixes:
+        out = clean_location_frame(df)
+        if debug:
+            debug_function(out, debug=True, columns='job_location')
+        write(out, 'location', f'part_{i:05d}')
+
+    if 'company' in prefixes or 'company_w_unknown' in prefixes:
+        company, company_staging = clean_company_frame(df)
+        if 'company' in prefixes:
+            write(company, 'company', f'part_{i:05d}')
+        if 'company_w_unknown' in prefixes:
+            write(company_staging, 'company_w_unknown', f'part_{i:05d}')
+
+    if 'job_type' in prefixes:
+        part_values['job_type'] = job_type_part_values(df)
+
+    if 'job_level' in prefixes:
+        part_values['job_level'] = job_level_part_values(df)
+
+    part_values['outputs'] = outputs
+    return part_values
+
+
+def _delete_stale_parts(bucket, prefixes, results):
+    """
+    Delete the .parquet objects under the per-part output prefixes that this run did not write or reuse.
+
+    Output names come from the raw part's position, so a raw partition with fewer parts than an earlier run's
+    (or a skills part split into fewer chunks) would leave that run's higher-numbered parts behind. Runs after
+    every output has landed, so readers never see an emptied prefix.
+
+    :return: Number of objects deleted
+    """
+    s3 = s3_client()
+    written = {uri for result in results for uri in result['outputs']}
+    deleted = 0
+    for table, prefix in prefixes.items():
+        if table in AGGREGATED_TABLES:
+            continue
+        listed = list_objects_by_uri(s3, f"s3://{bucket}/{prefix.rstrip('/')}")
+        stale = [_split_s3_uri(uri)[1] for uri in listed if uri.endswith('.parquet') and uri not in written]
+        if stale:
+            print(f'[raw_fan_out] deleting {len(stale)} stale parts under s3://{bucket}/{prefix}')
+            deleted += delete_s3_keys(bucket, stale, s3=s3)
+    return deleted
+
+
+def raw_fan_out(s3_parquet_files, bucket, prefixes, wanted_columns, debug=False, max_rows_per_part=None, read_options=None, workers=None,
+                resume=False, ledger_key=None, use_cache=False):
+    """
+    Read every raw parquet part ONCE and feed it to all the per-table cleaners
+
+    Purpose:
+    - The cleaned tables (job_postings_staging, job_postings_skills_staging, search_context, job_title_staging,
+      location, company/company_w_unknown) and the job_type/job_level dimensions are all built from the same raw
+      run_date partition. Running them as separate tasks downloads every raw part once per table.
+    - Here each part is downloaded once (only the union of columns the requested tables need), every cleaner runs
+      on the same in-memory frame and all outputs are written before moving on to the next part.
+
+    Output:
+    - Part names match the standalone cleaners (cleaning_job_posting_staging, clean_location, ...) so downstream
+      curate tasks and reruns are unaffected.
+    - job_postings_skills_staging parts are named part_<raw part>_<chunk>.parquet so each raw part owns its outputs.
+    - job_type/job_level are accumulated across parts and written once at the end.
+    - Parts left in the output prefixes by an earlier run and not written by this one are deleted at the end (see
+      _delete_stale_parts).
+    - workers=N (or -1 for all cores) runs the parts in a process pool. Output names depend only on the raw part's
+      position, so serial and parallel runs write exactly the same files.
+    - resume=True keeps a PartLedger (raw part URI + ETag -> outputs and job_type/job_level values), so a retry
+      skips raw parts whose outputs are all still in place and only re-runs the rest.
+    - use_cache=True looks raw parts up in the content-addressed PartCache (raw part ETag + tables + config + etl
+      code). Raw parts identical to an earlier run (e.g. the same CSV snapshot ingested under another run_date)
+      are server-side copied from that run's outputs instead of being recomputed.
+
+    :param s3_parquet_files: List of s3 URIs (s3://...) that point to raw parquet files
+    :param bucket: S3 bucket name for output
+    :param prefixes: Dictionary of {table_name: output prefix}. Only tables present here are produced
+    :param wanted_columns: WANTED_COLUMNS config (job_postings_staging, job_postings_skills_staging, search_context)
+    :param debug: If True, logs diagnostics. Default False
+    :param max_rows_per_part: Split job_postings_skills_staging output parts above this many rows
+    :param read_options: Optional prefetch settings passed to read_parts
+    :param workers: Optional process count (-1 for all cores). Default None runs serially
+    :param resume: If True, skip raw parts completed by an earlier attempt
+    :param ledger_key: Ledger object key. Defaults to <first output prefix>/_ledger_raw_fan_out.json
+    :param use_cache: If True, replay parts from the content-addressed output cache
+    """
+    unknown = set(prefixes) - set(FAN_OUT_COLUMNS) - {'job_postings_staging','job_postings_skills_staging','search_context'}
+    if unknown:
+        raise KeyError(f'No fan-out cleaner for table(s): {unknown}')
+
+    table_columns = dict(FAN_OUT_COLUMNS)
+    table_columns['job_postings_staging'] = wanted_columns['job_postings_staging']
+    table_columns['job_postings_skills_staging'] = wanted_columns['job_postings_skills_staging']
+    table_columns['search_context'] = wanted_columns['search_context']
+
+    #Column projection: union of what the requested tables need, in a stable order
+    columns = []
+    for table in prefixes:
+        for col in table_columns[table]:
+            if col not in columns:
+                columns.append(col)
+
+    ledger = None
+    if resume:
+        ledger_key = ledger_key or f'{next(iter(prefixes.values()))}/_ledger_raw_fan_out.json'
+        ledger = PartLedger(bucket, ledger_key, config={'task': 'raw_fan_out', 'prefixes': prefixes,
+                                                        'wanted_columns': wanted_columns, 'max_rows_per_part': max_rows_per_part})
+
+    cache = None
+    if use_cache:
+        #job_type/job_level are aggregated from the part results, not written per part, so they are not prefixes here
+        part_prefixes = {t: p for t, p in prefixes.items() if t not in AGGREGATED_TABLES}
+        cache = PartCache(bucket, 'raw_fan_out', {'tables': sorted(prefixes), 'wanted_columns': wanted_columns,
+                                                  'max_rows_per_part': max_rows_per_part, 'dropable_list': dropable_list},
+                          part_prefixes)
+        cache.prune()
+
+    results = run_parts(_fan_out_part, s3_parquet_files, (bucket, prefixes, wanted_columns, debug, max_rows_per_part),
+                        columns=columns, workers=workers, read_options=read_options, ledger=ledger, cache=cache)
+
+    #Idempotent reruns for every per-part table (cleaning_job_title used to empty its prefix up front instead)
+    _delete_stale_parts(bucket, prefixes, results)
+
+    if 'job_type' in prefixes:
+        type_values, type_na, type_empty = set(), 0, 0
+        for part_na, part_empty, part_values in (r['job_type'] for r in results):
+            type_na += part_na
+            type_empty += part_empty
+            type_values.update(part_values)
+        write_job_type(type_values, type_na, type_empty, bucket, prefixes['job_type'])
+
+    if 'job_level' in prefixes:
+        level_values, level_na, level_empty = set(), 0, 0
+        for part_na, part_empty, part_values in (r['job_level'] for r in results):
+            level_na += part_na
+            level_empty += part_empty
+            level_values.update(part_values)
+        write_job_level(level_values, level_na, level_empty, bucket, prefixes['job_level'])
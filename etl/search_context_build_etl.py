@@ -1,9 +1,40 @@
-import pandas as pd
+from etl.text_normalise_etl import normalise_frame
 from etl.debug_tools_etl import debug_function
-from etl.parquet_validation_etl import validate_table
 from etl.unknown_placeholders_replace_etl import replace_unknown_placeholders
+from etl.parallel_parts_etl import run_parts
+from etl.parquet_writer_etl import write_parquet
+from etl.part_ledger_etl import PartLedger, LEDGER_NAME
+from etl.part_cache_etl import PartCache
 
-def cleaning_search_context_table(s3_parquet_files, wanted_columns, bucket, prefix, debug=False):
+def clean_search_context_frame(df, wanted_columns):
+    """
+    Clean one raw part into search_context rows (normalise, null placeholders, dedup within the part).
+
+    :param df: Raw job_postings DataFrame (one parquet part)
+    :param wanted_columns: Search context columns to keep
+    :return: Cleaned, within-part deduplicated DataFrame
+    """
+    df = normalise_frame(df, wanted_columns)
+
+    df = replace_unknown_placeholders(df)
+
+    return df.drop_duplicates(ignore_index=True)
+
+
+def _clean_search_context_part(df, i, wanted_columns, bucket, prefix, debug):
+    #One input part -> one output part. Part numbers start at 1
+    df = clean_search_context_frame(df, wanted_columns)
+
+    if debug:
+        debug_function(df,False, wanted_columns)
+
+    out_path = f's3://{bucket}/{prefix}/part_{i+1:05d}.parquet'
+    write_parquet(df, out_path, table='search_context')
+
+    return {'outputs': [out_path]}
+
+
+def cleaning_search_context_table(s3_parquet_files, wanted_columns, bucket, prefix, debug=False, read_options=None, workers=None, resume=False, use_cache=False):
     """
     Build the cleaned search_context dataset from raw parquet parts.
 
@@ -18,23 +49,16 @@ def cleaning_search_context_table(s3_parquet_files, wanted_columns, bucket, pref
 
     Output:
     - Writes one parquet file per input part to prevent OOM problems
+    - workers=N (or -1 for all cores) processes parts in a process pool with the same part numbering
+    - resume=True skips parts already cleaned by an earlier attempt (ledger at <prefix>/_ledger.json)
     """
-    n = 1
-    for file in s3_parquet_files:
-        df = pd.read_parquet(file)
-
-        df = df[wanted_columns].astype('string').apply(lambda col:col.str.replace(r'\s+', ' ', regex=True))
-
-        df = df.apply(lambda col:col.str.strip().str.casefold())
-
-        df = replace_unknown_placeholders(df)
-
-        df = df.drop_duplicates(ignore_index=True)
-
-        if debug:
-            debug_function(df,False, wanted_columns)
+    ledger = None
+    if resume:
+        ledger = PartLedger(bucket, f'{prefix}/{LEDGER_NAME}', config={'task': 'cleaning_search_context_table', 'wanted_columns': wanted_columns})
 
-        df.to_parquet(f's3://{bucket}/{prefix}/part_{n:05d}.parquet',index=False)
+    #use_cache=True replays parts from identical inputs of an earlier run (content-addressed, see etl/part_cache_etl.py)
+    cache = PartCache(bucket, 'cleaning_search_context_table', {'wanted_columns': wanted_columns}, {'output': prefix}) if use_cache else None
 
-        n+=1
+    run_parts(_clean_search_context_part, s3_parquet_files, (wanted_columns, bucket, prefix, debug), columns=wanted_columns,
+              workers=workers, read_options=read_options, ledger=ledger, cache=cache)
 
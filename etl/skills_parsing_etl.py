@@ -1,27 +1,30 @@
 import pandas as pd
-from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
 from etl.debug_tools_etl import debug_function
+from etl.text_normalise_etl import normalise_text_array
 from etl.parquet_validation_etl import validate_table
-from etl.delete_s3_URI import delete_s3_prefix
-import os
-import time
-import uuid
-import tempfile
-import boto3
-from botocore.config import Config
+from etl.partition_publish_etl import PartitionPublisher
+from etl.parquet_writer_etl import s3_client as _boto3_client, write_parquet, wait_for_writes
+from etl.parquet_reader_etl import read_parts, STRING_DTYPE, arrow_types_mapper
+from etl.part_ledger_etl import PartLedger, LEDGER_NAME
 
 
 
-def build_skills_table(s3_parquet_files, bucket, prefix, run_date):
-    seen = set()
+def build_skills_table(s3_parquet_files, bucket, prefix, run_date, read_options=None):
+    #Distinct values per part stay Arrow-backed; a global set would create one Python string per skill
+    part_uniques = []
 
-    for file in s3_parquet_files:
+    #Rows without skills are dropped by the reader (row filter pushed down to pyarrow.dataset)
+    parts = read_parts(s3_parquet_files, columns=['job_skills'], filter=pc.field('job_skills').is_valid(), read_options=read_options)
+    for file, df in zip(s3_parquet_files, parts):
         print('[skills] READING:', file)   # <-- this is the key line
-        s = (pd.read_parquet(file, columns=['job_skills'])['job_skills'].dropna().astype('string').str.strip())
+        s = (df['job_skills'].dropna().astype(STRING_DTYPE).str.strip())
 
-        seen.update(s.tolist())
+        part_uniques.append(pd.Series(s.unique(), dtype=STRING_DTYPE))
 
-    skills_df = pd.DataFrame({'job_skills': list(seen)})
+    skills = pd.concat(part_uniques, ignore_index=True).drop_duplicates() if part_uniques else pd.Series([], dtype=STRING_DTYPE)
+    skills_df = pd.DataFrame({'job_skills': skills.reset_index(drop=True)})
 
     wanted_col = ['job_skills']
     natural_key_col = ['job_skills']
@@ -29,108 +32,161 @@ def build_skills_table(s3_parquet_files, bucket, prefix, run_date):
     
     validate_table(skills_df,wanted_col,var_char,natural_key_col)
     
-    # Idempotent rerun: delete this run_date partition before writing refreshed output
-    delete_s3_prefix(bucket, f'{prefix}/run_date={run_date}/')
-
-    skills_df.to_parquet(f's3://{bucket}/{prefix}/run_date={run_date}/data.parquet', index=False)
+    # Idempotent rerun: refreshed output replaces this run_date partition on publish
+    with PartitionPublisher(bucket, f'{prefix}/run_date={run_date}/') as publisher:
+        publisher.write(skills_df, 'data.parquet')
     
 
 
 
-def _boto3_client():
-    # Robust defaults for flaky connections
-    return boto3.client('s3', config=Config(retries={'max_attempts': 10, 'mode': 'standard'},connect_timeout=30,read_timeout=300))
-
-def _write_parquet_local_then_upload(df, bucket, key, s3_client, debug: bool = False):
-    # Write locally then upload via boto3.upload_file (more reliable than streaming to s3fs)
-    fname = f'{os.path.basename(key)}_{uuid.uuid4().hex}.parquet'
-    local_path = os.path.join(tempfile.gettempdir(), fname)
-
-    t0 = time.time()
-    df.to_parquet(local_path, index=False, compression="snappy")
+def _write_skills_part(df, bucket, key, s3_client, debug=False):
+    #Background upload (boto3 multipart for large parts), see etl/parquet_writer_etl.py
+    write_parquet(df, f's3://{bucket}/{key}', table='job_postings_skills_staging', s3=s3_client)
     if debug:
-        print(f'[skills] local parquet wrote: {local_path} rows={len(df)} secs={time.time()-t0:.2f}')
+        print(f'[skills] queued s3://{bucket}/{key} rows={len(df)}')
+
+
+def explode_skills_frame(df, wanted_columns, debug=False):
+    """
+    Explode one part's comma-separated job_skills into one normalised (job_skills, job_link) row per skill,
+    deduplicated within the part.
+
+    Implementation notes:
+    - Skills are tokenised with Arrow (split -> flatten with parent indices): no Python list per posting and no
+      exploded copy of job_link. Tokens are dictionary-encoded, so normalisation runs on the distinct tokens only.
+    - Within-part dedup works on integer (skill, job_link) codes and keeps the first occurrence, in the same
+      order as explode + drop_duplicates.
+
+    :param df: DataFrame containing at least the wanted_columns
+    :param wanted_columns: ['job_skills', 'job_link']
+    :param debug: If True, logs diagnostics
+    :return: Exploded junction staging DataFrame
+    """
+    skills_col, link_col = wanted_columns
+
+    #Comma-separated skills -> flat tokens, each with the row it came from (null skills produce no tokens).
+    #Arrow-backed columns with zero or several chunks convert to a ChunkedArray: combine into one array
+    skills_arr = pa.array(df[skills_col].astype(STRING_DTYPE), type=pa.string(), from_pandas=True)
+    if isinstance(skills_arr, pa.ChunkedArray):
+        skills_arr = skills_arr.combine_chunks()
+    lists = pc.split_pattern(skills_arr, pattern=',')
+    parents = pc.list_parent_indices(lists).to_numpy()
+    tokens = pc.dictionary_encode(pc.list_flatten(lists))
+
+    #Normalise skill text (case and whitespace) once per distinct token. Tokens that normalise to the same skill
+    #share a code, empty skills are dropped
+    normalised = normalise_text_array(tokens.dictionary)
+    skills = pc.unique(normalised)
+    skill_codes = pc.index_in(normalised, value_set=skills).to_numpy()[tokens.indices.to_numpy()]
+    keep = pc.not_equal(skills, '').to_numpy(zero_copy_only=False)[skill_codes]
+
+    #Dedup within file on (skill, job_link) codes
+    link_codes, links = pd.factorize(df[link_col], use_na_sentinel=False)
+    pair_codes = skill_codes.astype('int64') * max(len(links), 1) + link_codes[parents]
+    keep &= ~pd.Series(pair_codes).duplicated().to_numpy()
+
+    junction_staging = pd.DataFrame({
+        skills_col: pd.Series(skills.take(pa.array(skill_codes[keep])).to_pandas(types_mapper=arrow_types_mapper).array),
+        link_col: df[link_col].take(parents[keep]).reset_index(drop=True),
+    })
 
-    t1 = time.time()
-    s3_client.upload_file(local_path, bucket, key)
     if debug:
-        print(f'[skills] uploaded to s3://{bucket}/{key} secs={time.time()-t1:.2f}')
+        debug_function(junction_staging, True, wanted_columns)
 
-    # Cleanup
-    try:
-        os.remove(local_path)
-    except OSError:
-        pass
+    return junction_staging
 
 
-def cleaning_skills_junction_staging_1(s3_parquet_files,bucket,prefix,wanted_columns,debug=False,batch_size=10,max_rows_per_part=None):
+def write_skills_parts(out, bucket, prefix, n, s3_client, max_rows_per_part=None, debug=False, part_name='part_{n:05d}'):
+    """
+    Write a junction staging frame as one or more parquet parts, starting at part number n.
 
-    #Explode job_skills into one row per (job_link, job_skill) and write in parts (streaming)
-    #Uses local parquet + boto3 upload for stability on large writes / S3 multipart issues
-    prefix = prefix.rstrip('/')
-    s3 = _boto3_client()
+    Make smaller parquet parts if output is massive (max_rows_per_part). Parts are uploaded in the background:
+    call wait_for_writes before relying on them.
 
-    n = 1
-    buffer = []
+    :param part_name: Format string for the part file name (without extension), filled with n
+    :return: Next free part number
+    """
+    if max_rows_per_part and len(out) > max_rows_per_part:
+        start = 0
+        while start < len(out):
+            chunk = out.iloc[start:start + max_rows_per_part]
+            key = f'{prefix}/{part_name.format(n=n)}.parquet'
+            _write_skills_part(chunk, bucket, key, s3_client, debug=debug)
+            n += 1
+            start += max_rows_per_part
+    else:
+        key = f'{prefix}/{part_name.format(n=n)}.parquet'
+        _write_skills_part(out, bucket, key, s3_client, debug=debug)
+        n += 1
 
-    for i, file in enumerate(s3_parquet_files, start=1):
-        df = pd.read_parquet(file, columns=wanted_columns)
+    return n
 
-        #Explode comma-separated skills into one skill per row
-        df['job_skills'] = df['job_skills'].astype('string').str.split(',')
-        df = df.explode('job_skills')
-        df = df.dropna(subset=['job_skills'])
 
-        #Normalise skill text (case and whitespace) and drop empty values
-        df['job_skills'] = df['job_skills'].astype('string').str.casefold()
-        df['job_skills'] = df['job_skills'].str.replace(r"\s+", ' ', regex=True).str.strip()
-        df = df[df['job_skills'] != '']
+def cleaning_skills_junction_staging_1(s3_parquet_files,bucket,prefix,wanted_columns,debug=False,batch_size=10,max_rows_per_part=None,read_options=None,
+                                       resume=False):
 
-        # dedup within file
-        df = df.drop_duplicates(subset=wanted_columns)
+    #Explode job_skills into one row per (job_link, job_skill) and write in parts (streaming)
+    #Parts upload in the background (boto3 multipart) while the next batch is exploded
+    prefix = prefix.rstrip('/')
+    s3 = _boto3_client()
+    files = list(s3_parquet_files)
 
-        junction_staging = df[wanted_columns]
+    #one batch of batch_size input files -> output parts n..next_n-1, so a batch is the unit of work
+    batches = [files[start:start + batch_size] for start in range(0, len(files), batch_size)]
 
-        if debug:
-            debug_function(junction_staging, True, wanted_columns)
+    n = 1
+    first = 0
+    ledger = None
+    if resume:
+        #resume=True: skip the leading batches completed by an earlier attempt (ledger at <prefix>/_ledger.json).
+        #Part numbers continue from the last completed batch, so the first incomplete batch is where work restarts
+        ledger = PartLedger(bucket, f'{prefix}/{LEDGER_NAME}', config={'task': 'cleaning_skills_junction_staging_1', 'wanted_columns': wanted_columns,
+                                                                       'batch_size': batch_size, 'max_rows_per_part': max_rows_per_part}, s3=s3)
+        etags = ledger.etags(files)
+        while first < len(batches):
+            entry = ledger.done(batches[first], etags)
+            if entry is None:
+                break
+            n = entry['result']['next_n']
+            first += 1
+        if first:
+            print(f'[skills] resuming: {first} of {len(batches)} batches already done')
+
+    remaining = [file for batch in batches[first:] for file in batch]
+    #Postings without skills explode to no rows: skip them in the reader
+    parts = read_parts(remaining, columns=wanted_columns, filter=pc.field('job_skills').is_valid(), read_options=read_options)
+
+    #Batches written but not yet recorded: a batch is recorded once its uploads have finished
+    written = []
+
+    def record_written(keep=0):
+        while len(written) > keep:
+            batch, outputs, next_n = written.pop(0)
+            wait_for_writes(outputs)
+            if ledger is not None:
+                ledger.record(batch, etags, outputs, {'next_n': next_n})
 
-        buffer.append(junction_staging)
+    try:
+        for batch in batches[first:]:
+            buffer = [explode_skills_frame(next(parts), wanted_columns, debug=debug) for _ in batch]
 
-        # write every batch_size input files to prevent OOM problems
-        if i % batch_size == 0:
+            # write every batch_size input files to prevent OOM problems
             out = pd.concat(buffer, ignore_index=True)
             out = out.drop_duplicates(subset=wanted_columns, ignore_index=True)
 
-            # Make smaller parquet parts if output is massive
-            if max_rows_per_part and len(out) > max_rows_per_part:
-                start = 0
-                while start < len(out):
-                    chunk = out.iloc[start:start + max_rows_per_part]
-                    key = f'{prefix}/part_{n:05d}.parquet'
-                    _write_parquet_local_then_upload(chunk, bucket, key, s3_client=s3, debug=debug)
-                    n += 1
-                    start += max_rows_per_part
-            else:
-                key = f'{prefix}/part_{n:05d}.parquet'
-                _write_parquet_local_then_upload(out, bucket, key, s3_client=s3, debug=debug)
-                n += 1
-
-            buffer = []
-
-    # write leftovers
-    if buffer:
-        out = pd.concat(buffer, ignore_index=True)
-        out = out.drop_duplicates(subset=wanted_columns, ignore_index=True)
-
-        if max_rows_per_part and len(out) > max_rows_per_part:
-            start = 0
-            while start < len(out):
-                chunk = out.iloc[start:start + max_rows_per_part]
-                key = f'{prefix}/part_{n:05d}.parquet'
-                _write_parquet_local_then_upload(chunk, bucket, key, s3_client=s3, debug=debug)
-                n += 1
-                start += max_rows_per_part
-        else:
-            key = f'{prefix}/part_{n:05d}.parquet'
-            _write_parquet_local_then_upload(out, bucket, key, s3_client=s3, debug=debug)
-            n += 1
+            start_n = n
+            n = write_skills_parts(out, bucket, prefix, n, s3, max_rows_per_part=max_rows_per_part, debug=debug)
+
+            written.append((batch, [f's3://{bucket}/{prefix}/part_{k:05d}.parquet' for k in range(start_n, n)], n))
+            #This batch uploads while the next one is exploded
+            record_written(keep=1)
+        record_written()
+    finally:
+        parts.close()
+        if ledger is not None:
+            #After a failure keep the batches whose uploads did complete, so a retry resumes after them
+            try:
+                record_written()
+            except Exception:
+                pass
+            ledger.save()
@@ -0,0 +1,111 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from etl.parquet_reader_etl import STRING_DTYPE
+from etl.distinct_values_etl import map_distinct
+
+#Exactly the characters Python's re treats as \s (and str.strip()/str.isspace() as whitespace). RE2's own \s is
+#ASCII-only, so the class is spelled out to keep results identical to the old .str.replace(r'\s+', ' ', regex=True).
+#Spelled out rather than scanned from every codepoint at import (tests/test_text_normalise.py checks it)
+WHITESPACE_CHARS = ('\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007'
+                    '\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000')
+_WHITESPACE_RUN = '[' + ''.join(f'\\x{{{ord(c):x}}}' for c in WHITESPACE_CHARS) + ']+'
+
+
+def _to_arrow_strings(series):
+    #STRING_DTYPE columns convert without copying. Anything else is stringified first
+    try:
+        return pa.array(series, type=pa.string(), from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array(series.astype(STRING_DTYPE), type=pa.string(), from_pandas=True)
+
+
+def _regex_ranges(ranges):
+    return '[' + ''.join(f'\\x{{{a:x}}}' if a == b else f'\\x{{{a:x}}}-\\x{{{b:x}}}' for a, b in ranges) + ']'
+
+
+#Codepoint ranges where Arrow's per-codepoint utf8_lower differs from str.casefold() (e.g. 'ß' -> 'ss', 'ς' -> 'σ').
+#Precomputed from every codepoint (Python 3.11 / Unicode 14, pyarrow 26) instead of at runtime; the tests recompute
+#them with the installed versions
+_CASEFOLD_EXCEPTION_RANGES = ((0xb5, 0xb5), (0xdf, 0xdf), (0x130, 0x130), (0x149, 0x149), (0x17f, 0x17f),
+                              (0x1f0, 0x1f0), (0x345, 0x345), (0x390, 0x390), (0x3b0, 0x3b0), (0x3c2, 0x3c2),
+                              (0x3d0, 0x3d1), (0x3d5, 0x3d6), (0x3f0, 0x3f1), (0x3f5, 0x3f5), (0x587, 0x587),
+                              (0x13a0, 0x13f5), (0x13f8, 0x13fd), (0x1c80, 0x1c89), (0x1e96, 0x1e9b),
+                              (0x1e9e, 0x1e9e), (0x1f50, 0x1f50), (0x1f52, 0x1f52), (0x1f54, 0x1f54),
+                              (0x1f56, 0x1f56), (0x1f80, 0x1faf), (0x1fb2, 0x1fb4), (0x1fb6, 0x1fb7),
+                              (0x1fbc, 0x1fbc), (0x1fbe, 0x1fbe), (0x1fc2, 0x1fc4), (0x1fc6, 0x1fc7),
+                              (0x1fcc, 0x1fcc), (0x1fd2, 0x1fd3), (0x1fd6, 0x1fd7), (0x1fe2, 0x1fe4),
+                              (0x1fe6, 0x1fe7), (0x1ff2, 0x1ff4), (0x1ff6, 0x1ff7), (0x1ffc, 0x1ffc),
+                              (0xa7cb, 0xa7cc), (0xa7ce, 0xa7ce), (0xa7d2, 0xa7d2), (0xa7d4, 0xa7d4),
+                              (0xa7da, 0xa7da), (0xa7dc, 0xa7dc), (0xab70, 0xabbf), (0xfb00, 0xfb06),
+                              (0xfb13, 0xfb17), (0x10d50, 0x10d65), (0x16ea0, 0x16eb8))
+_CASEFOLD_EXCEPTIONS = _regex_ranges(_CASEFOLD_EXCEPTION_RANGES)
+
+
+def _casefold(arr):
+    #utf8_lower equals str.casefold() except for a few hundred characters. Only values containing one of them go
+    #through Python's casefold
+    lowered = pc.utf8_lower(arr)
+    if pc.all(pc.fill_null(pc.string_is_ascii(arr), True)).as_py():
+        return lowered
+    exceptions = pc.fill_null(pc.match_substring_regex(arr, pattern=_CASEFOLD_EXCEPTIONS), False)
+    if not pc.any(exceptions).as_py():
+        return lowered
+    folded = pa.array([v.casefold() for v in arr.filter(exceptions).to_pylist()], type=pa.string())
+    return pc.replace_with_mask(lowered, exceptions, folded)
+
+
+def normalise_text_array(arr, collapse_whitespace=True, strip=True, casefold=True):
+    """
+    Normalise a pyarrow string array with pyarrow.compute kernels (no Python loop except non-ASCII casefolding).
+
+    :param arr: pyarrow string Array
+    :param collapse_whitespace: Replace every run of whitespace with a single space
+    :param strip: Strip leading/trailing whitespace
+    :param casefold: Casefold (lowercase, Unicode-aware)
+    :return: pyarrow string Array (nulls kept)
+    """
+    if collapse_whitespace:
+        arr = pc.replace_substring_regex(arr, pattern=_WHITESPACE_RUN, replacement=' ')
+    if strip:
+        #After collapsing, the only whitespace left is single spaces
+        arr = pc.utf8_trim(arr, characters=' ' if collapse_whitespace else WHITESPACE_CHARS)
+    if casefold:
+        arr = _casefold(arr)
+    return arr
+
+
+def normalise_text(series, collapse_whitespace=True, strip=True, casefold=True):
+    """
+    Shared text normaliser for the cleaning modules
+
+    Purpose:
+    - Replaces the per-module chains of .astype('string').str.replace(r'\\s+', ' ', regex=True).str.strip().str.casefold()
+      (each link allocating a new array of Python strings) with one pass of Arrow compute kernels per column.
+    - Results are identical to the pandas chain on Python strings (re's Unicode \\s, str.casefold), including
+      non-ASCII whitespace and casefolding.
+
+    :param series: pandas Series (any dtype, non-string values are stringified)
+    :param collapse_whitespace: Replace every run of whitespace with a single space (location/company don't)
+    :param strip: Strip leading/trailing whitespace
+    :param casefold: Casefold values
+    :return: Series with dtype STRING_DTYPE (string[pyarrow]), or categorical for categorical input, same index and name
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        #Normalise the categories only (O(distinct)), see map_distinct
+        return map_distinct(series, lambda values: normalise_text(values.astype(STRING_DTYPE), collapse_whitespace=collapse_whitespace,
+                                                                   strip=strip, casefold=casefold))
+    arr = normalise_text_array(_to_arrow_strings(series), collapse_whitespace=collapse_whitespace, strip=strip, casefold=casefold)
+    #.array: passing a Series together with index= would reindex by label instead of keeping row order
+    return pd.Series(arr.to_pandas(types_mapper={pa.string(): STRING_DTYPE}.get).array, index=series.index, name=series.name)
+
+
+def normalise_frame(df, columns=None, **options):
+    """
+    Normalise several text columns (see normalise_text). Returns a new DataFrame, the input is left untouched.
+
+    :param df: DataFrame
+    :param columns: Columns to normalise and keep (defaults to all columns)
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    return pd.DataFrame({col: normalise_text(df[col], **options) for col in columns}, index=df.index)
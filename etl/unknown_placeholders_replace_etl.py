@@ -1,6 +1,38 @@
 import pandas as pd
+from etl.config import UNKNOWN_PLACEHOLDERS
 
-def replace_unknown_placeholders(df):
+
+def _placeholders_for(column, placeholders):
+    return placeholders.get(column, placeholders['default'])
+
+
+def _count(counts, column, replaced):
+    #replaced: Series of {placeholder: rows nulled}
+    column_counts = counts.setdefault(column, {})
+    for value, n in replaced.items():
+        if n:
+            column_counts[value] = column_counts.get(value, 0) + int(n)
+
+
+def _replace_in_column(col, unknown_placeholders, counts=None):
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        #Dropping a category turns its values into NA without touching the rows
+        removed = [c for c in col.cat.categories if c in unknown_placeholders]
+        if counts is not None and removed:
+            _count(counts, col.name, col.value_counts()[removed])
+        return col.cat.remove_categories(removed)
+
+    #One hash lookup per value (pandas' replace(list) scans the column once per placeholder)
+    is_placeholder = col.isin(unknown_placeholders)
+    if not is_placeholder.any():
+        #Leave the column (and its dtype) untouched, as replace does when nothing matches
+        return col
+    if counts is not None:
+        _count(counts, col.name, col[is_placeholder].value_counts())
+    return col.mask(is_placeholder, pd.NA)
+
+
+def replace_unknown_placeholders(df, placeholders=None, counts=None):
     """
     Standardise common unknown/placeholder values to pandas NA.
 
@@ -9,9 +41,29 @@ def replace_unknown_placeholders(df):
       (e.g. '', 'n/a', '-', 'unknown').
     - Normalising these early simplifies downstream cleaning, filtering,
       and null handling in analytics (and Athena/SQL later on).
+
+    Implementation notes:
+    - Each value is hash-looked up once per column (isin) instead of one df.replace scan per placeholder.
+      Categorical columns only drop the placeholder categories.
+    - Same result as df.replace(placeholders, pd.NA): exact matches only, untouched columns keep their dtype.
+
+    :param df: DataFrame or Series (a Series uses its name to pick the placeholder set)
+    :param placeholders: Optional dictionary of {column: list of placeholders, 'default': list} (default UNKNOWN_PLACEHOLDERS)
+    :param counts: Optional dictionary, updated in place with {column: {placeholder: rows replaced}}
     """
-    unknown_placeholders = ['','n/a','na','none','nan','-','?','unknown']
+    placeholders = placeholders or UNKNOWN_PLACEHOLDERS
+
+    if isinstance(df, pd.Series):
+        return _replace_in_column(df, _placeholders_for(df.name, placeholders), counts)
 
-    df = df.replace(unknown_placeholders, pd.NA)
+    return df.apply(lambda col: _replace_in_column(col, _placeholders_for(col.name, placeholders), counts))
 
-    return df
+
+def fill_unknown(series, label):
+    """
+    Replace NA with a canonical label (e.g. 'unknown_company'). Categorical columns get the label added as a
+    category first.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype) and label not in series.cat.categories:
+        series = series.cat.add_categories([label])
+    return series.mask(series.isna(), label)
@@ -0,0 +1,122 @@
+import io
+import hashlib
+import threading
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from etl import parquet_writer_etl
+
+
+class _NoSuchKey(ClientError):
+    pass
+
+
+class _Exceptions:
+    ClientError = ClientError
+    NoSuchKey = _NoSuchKey
+
+
+def _error(code, operation, cls=ClientError):
+    return cls({'Error': {'Code': code, 'Message': code}}, operation)
+
+
+class _Paginator:
+    def __init__(self, s3):
+        self.s3 = s3
+
+    def paginate(self, Bucket, Prefix='', PaginationConfig=None):
+        keys = sorted(k for b, k in list(self.s3.objects) if b == Bucket and k.startswith(Prefix))
+        for start in range(0, max(len(keys), 1), 1000):
+            contents = [self.s3._listing(Bucket, k) for k in keys[start:start + 1000]]
+            yield {'Contents': contents} if contents else {}
+
+
+class FakeS3:
+    """
+    In-memory stand-in for the boto3 S3 client calls the pipeline makes (objects keyed by (bucket, key)).
+    """
+
+    exceptions = _Exceptions
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _listing(self, bucket, key):
+        body = self.objects[(bucket, key)]
+        return {'Key': key, 'Size': len(body), 'ETag': self.etag(bucket, key)}
+
+    def etag(self, bucket, key):
+        return f'"{hashlib.md5(self.objects[(bucket, key)]).hexdigest()}"'
+
+    def _body(self, bucket, key, operation):
+        if (bucket, key) not in self.objects:
+            raise _error('NoSuchKey', operation, _NoSuchKey)
+        return self.objects[(bucket, key)]
+
+    def _put(self, bucket, key, body):
+        with self._lock:
+            self.objects[(bucket, key)] = body.encode('utf-8') if isinstance(body, str) else bytes(body)
+
+    def get_paginator(self, name):
+        return _Paginator(self)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.calls.append(('put_object', Key))
+        self._put(Bucket, Key, Body)
+
+    def upload_fileobj(self, f, Bucket, Key, Config=None):
+        self.calls.append(('upload_fileobj', Key))
+        self._put(Bucket, Key, f.read())
+
+    def get_object(self, Bucket, Key, IfMatch=None):
+        self.calls.append(('get_object', Key))
+        body = self._body(Bucket, Key, 'GetObject')
+        if IfMatch is not None and IfMatch != self.etag(Bucket, Key):
+            raise _error('PreconditionFailed', 'GetObject')
+        return {'Body': io.BytesIO(body), 'ETag': self.etag(Bucket, Key)}
+
+    def head_object(self, Bucket, Key):
+        self.calls.append(('head_object', Key))
+        if (Bucket, Key) not in self.objects:
+            raise _error('404', 'HeadObject')
+        return {'ETag': self.etag(Bucket, Key), 'ContentLength': len(self.objects[(Bucket, Key)])}
+
+    def copy(self, CopySource, Bucket, Key, **kwargs):
+        self.calls.append(('copy', Key))
+        self._put(Bucket, Key, self._body(CopySource['Bucket'], CopySource['Key'], 'CopyObject'))
+
+    def copy_object(self, Bucket, Key, CopySource, CopySourceIfMatch=None, **kwargs):
+        self.calls.append(('copy_object', Key))
+        body = self._body(CopySource['Bucket'], CopySource['Key'], 'CopyObject')
+        if CopySourceIfMatch is not None and CopySourceIfMatch != self.etag(CopySource['Bucket'], CopySource['Key']):
+            raise _error('PreconditionFailed', 'CopyObject')
+        self._put(Bucket, Key, body)
+
+    def delete_objects(self, Bucket, Delete):
+        deleted = []
+        with self._lock:
+            for obj in Delete['Objects']:
+                self.calls.append(('delete', obj['Key']))
+                self.objects.pop((Bucket, obj['Key']), None)
+                deleted.append({'Key': obj['Key']})
+        return {'Deleted': deleted}
+
+    def delete_object(self, Bucket, Key):
+        self.delete_objects(Bucket, {'Objects': [{'Key': Key}]})
+
+    def keys(self, bucket, prefix=''):
+        return sorted(k for b, k in self.objects if b == bucket and k.startswith(prefix))
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """
+    FakeS3 returned by every boto3.client() call made during the test.
+    """
+    fake = FakeS3()
+    monkeypatch.setattr(boto3, 'client', lambda *args, **kwargs: fake)
+    #Background writes (write_parquet) go through a process-wide pool holding its own client: start a fresh one
+    monkeypatch.setattr(parquet_writer_etl, '_shared', None)
+    return fake
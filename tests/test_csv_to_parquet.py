@@ -0,0 +1,160 @@
+import os
+import sys
+import types
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+import pytest
+from etl.config import PARQUET_WRITE_OPTIONS
+
+
+@pytest.fixture
+def csv_to_parquet(monkeypatch, tmp_path):
+    #etl/env.py is deployment configuration (not in the repo): give the module the names it imports
+    try:
+        import etl.env  # noqa: F401
+    except ImportError:
+        env = types.ModuleType('etl.env')
+        env.LINKEDIN_DATA_DIR = str(tmp_path)
+        env.BUCKET = 'test-bucket'
+        env.RAW_ROOT_PREFIX = 'raw'
+        monkeypatch.setitem(sys.modules, 'etl.env', env)
+        monkeypatch.delitem(sys.modules, 'etl.csv_to_parquet', raising=False)
+    import etl.csv_to_parquet as module
+    return module
+
+
+def _multi_line_csv(path, rows):
+    #job_summary values span several lines, long enough that block boundaries fall inside them
+    with open(path, 'w', newline='') as f:
+        f.write('job_link,job_summary\n')
+        for i in range(rows):
+            f.write(f'https://example.com/{i},"line one of {i}\nline two, with a comma\n\nline four {"x" * 50}"\n')
+
+
+def _read_all(module, path):
+    read_options, parse_options, convert_options = module._csv_options(path)
+    reader = pv.open_csv(path, read_options=read_options, parse_options=parse_options, convert_options=convert_options)
+    return reader.read_all()
+
+
+def test_multi_line_values_across_block_boundaries(csv_to_parquet, monkeypatch, tmp_path):
+    path = str(tmp_path / 'job_summary.csv')
+    _multi_line_csv(path, 200)
+    monkeypatch.setattr(csv_to_parquet, 'CSV_BLOCK_SIZE', 256)
+
+    #Without newlines_in_values the block splitter cuts inside the quoted values
+    with pytest.raises(pa.ArrowInvalid):
+        pv.open_csv(path, read_options=pv.ReadOptions(block_size=256)).read_all()
+
+    table = _read_all(csv_to_parquet, path)
+    assert table.num_rows == 200
+    assert table.column('job_summary')[7].as_py() == f'line one of 7\nline two, with a comma\n\nline four {"x" * 50}'
+
+
+def test_side_table_reads_multi_line_values(csv_to_parquet, monkeypatch, tmp_path):
+    path = str(tmp_path / 'job_summary.csv')
+    _multi_line_csv(path, 50)
+    monkeypatch.setattr(csv_to_parquet, 'CSV_BLOCK_SIZE', 256)
+
+    for spill_dir in (None, str(tmp_path / 'spill')):
+        index = csv_to_parquet._read_side_table(path, spill_dir)
+        assert index.side.num_rows == 50 and len(index.keys) == 50
+
+
+def test_all_columns_read_as_nullable_strings(csv_to_parquet, tmp_path):
+    path = str(tmp_path / 'postings.csv')
+    with open(path, 'w', newline='') as f:
+        f.write('job_link,got_summary\nhttps://example.com/1,t\nhttps://example.com/2,\n')
+    table = _read_all(csv_to_parquet, path)
+    assert [str(t) for t in table.schema.types] == ['string', 'string']
+    assert table.column('got_summary').to_pylist() == ['t', None]
+
+
+def test_part_row_limit(csv_to_parquet):
+    assert csv_to_parquet._part_row_limit(0, 0, 100, None) == 100
+    assert csv_to_parquet._part_row_limit(10, 1000, None, 500) == 5
+    assert csv_to_parquet._part_row_limit(10, 1000, 3, 500) == 3
+    assert csv_to_parquet._part_row_limit(10, 1000, None, None) is None
+
+
+def _write_csv(path, header, rows):
+    import csv
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+PREFIX = 'raw/run_date=2024-01-01'
+
+
+def _ingest_data(tmp_path, postings=10, summary_chars=20):
+    data = tmp_path / 'data'
+    data.mkdir(exist_ok=True)
+    _write_csv(data / 'linkedin_job_postings.csv', ['job_link', 'job_title'],
+               [[f' https://example.com/{i} ', f'title {i}'] for i in range(postings)])
+    _write_csv(data / 'job_summary.csv', ['job_link', 'job_summary'],
+               [[f'https://example.com/{i}', f'summary {i}\nsecond line {"x" * summary_chars}'] for i in range(0, postings, 2)])
+    _write_csv(data / 'job_skills.csv', ['job_link', 'job_skills'],
+               [[f'https://example.com/{i}', f'skill {i}'] for i in range(0, postings, 3)])
+    return str(data)
+
+
+def _raw_parts(s3):
+    return {key: pq.read_table(pa.BufferReader(s3.objects[('test-bucket', key)]))
+            for key in s3.keys('test-bucket', f'{PREFIX}/') if key.endswith('.parquet')}
+
+
+def test_ingest_joins_side_tables_and_removes_spill_files(csv_to_parquet, s3, monkeypatch, tmp_path):
+    monkeypatch.setattr(csv_to_parquet, 'LINKEDIN_DATA_DIR', _ingest_data(tmp_path))
+
+    spill_dir = tmp_path / 'spill'
+    csv_to_parquet.convert_csv_to_parquet(target_part_rows=4, spill_dir=str(spill_dir), ds='2024-01-01')
+
+    parts = _raw_parts(s3)
+    assert sorted(parts) == [f'{PREFIX}/part_{i:05d}.parquet' for i in (1, 2, 3)]
+    rows = pa.concat_tables(parts[key] for key in sorted(parts)).to_pylist()
+    assert [row['job_link'] for row in rows] == [f'https://example.com/{i}' for i in range(10)]
+    assert rows[4]['job_summary'] == f'summary 4\nsecond line {"x" * 20}' and rows[5]['job_summary'] is None
+    assert rows[3]['job_skills'] == 'skill 3' and rows[4]['job_skills'] is None
+    assert os.listdir(spill_dir) == []
+
+
+def test_byte_target_counts_joined_text(csv_to_parquet, s3, monkeypatch, tmp_path):
+    #Postings rows are ~40 bytes, every other row gets a 2 KB summary: the byte target must see the summaries
+    monkeypatch.setattr(csv_to_parquet, 'LINKEDIN_DATA_DIR', _ingest_data(tmp_path, postings=40, summary_chars=2000))
+    csv_to_parquet.convert_csv_to_parquet(target_part_rows=None, target_part_bytes=10_000, ds='2024-01-01')
+
+    parts = _raw_parts(s3)
+    assert len(parts) > 1
+    assert sum(t.num_rows for t in parts.values()) == 40
+
+
+def test_no_targets_write_one_part(csv_to_parquet, s3, monkeypatch, tmp_path):
+    monkeypatch.setattr(csv_to_parquet, 'LINKEDIN_DATA_DIR', _ingest_data(tmp_path))
+    csv_to_parquet.convert_csv_to_parquet(target_part_rows=None, target_part_bytes=None, ds='2024-01-01')
+
+    parts = _raw_parts(s3)
+    assert list(parts) == [f'{PREFIX}/part_00001.parquet']
+    assert parts[f'{PREFIX}/part_00001.parquet'].num_rows == 10
+
+
+def test_rerun_with_fewer_parts_removes_stale_parts(csv_to_parquet, s3, monkeypatch, tmp_path):
+    monkeypatch.setattr(csv_to_parquet, 'LINKEDIN_DATA_DIR', _ingest_data(tmp_path))
+    csv_to_parquet.convert_csv_to_parquet(target_part_rows=2, ds='2024-01-01')
+    assert len(_raw_parts(s3)) == 5
+
+    csv_to_parquet.convert_csv_to_parquet(target_part_rows=4, ds='2024-01-01')
+    parts = _raw_parts(s3)
+    assert sorted(parts) == [f'{PREFIX}/part_{i:05d}.parquet' for i in (1, 2, 3)]
+    assert sum(t.num_rows for t in parts.values()) == 10
+
+
+def test_raw_parts_use_bounded_row_groups(csv_to_parquet, s3, monkeypatch, tmp_path):
+    monkeypatch.setitem(PARQUET_WRITE_OPTIONS, 'raw', {'row_group_size': 3})
+    monkeypatch.setattr(csv_to_parquet, 'LINKEDIN_DATA_DIR', _ingest_data(tmp_path))
+    csv_to_parquet.convert_csv_to_parquet(target_part_rows=None, ds='2024-01-01')
+
+    body = s3.objects[('test-bucket', f'{PREFIX}/part_00001.parquet')]
+    assert pq.ParquetFile(pa.BufferReader(body)).metadata.num_row_groups == 4
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from etl import dedup_backends_etl
+from etl.dedup_backends_etl import make_seen_keys, HashSeenKeys, DEDUP_BACKENDS
+
+
+def _parts(seed=0, n_parts=6):
+    rng = np.random.default_rng(seed)
+    parts = []
+    for _ in range(n_parts):
+        n = int(rng.integers(0, 400))
+        link = pd.Series(rng.integers(0, 300, n).astype(str), dtype='string').where(rng.random(n) > 0.1)
+        skill = pd.Series(rng.choice(['python', 'sql', 'excel'], n), dtype='string')
+        parts.append(pd.DataFrame({'job_link': link, 'job_skills': skill}))
+    return parts
+
+
+def _expected(parts, columns):
+    #The replaced code: first occurrence wins over all parts, null equal to null
+    all_keys = pd.concat(parts, ignore_index=True)[columns]
+    first = ~all_keys.duplicated(keep='first').to_numpy()
+    bounds = np.cumsum([0] + [len(p) for p in parts])
+    return [first[bounds[i]:bounds[i + 1]] for i in range(len(parts))]
+
+
+@pytest.fixture(params=sorted(DEDUP_BACKENDS))
+def seen(request, tmp_path):
+    store = make_seen_keys(request.param, spill_dir=str(tmp_path))
+    yield store
+    store.close()
+
+
+@pytest.mark.parametrize('columns', [['job_link'], ['job_link', 'job_skills']])
+def test_backends_match_first_wins_across_parts(seen, columns):
+    parts = _parts()
+    for part, expected in zip(parts, _expected(parts, columns)):
+        keys = part[columns[0]] if len(columns) == 1 else part[columns]
+        np.testing.assert_array_equal(seen.filter_new(keys), expected)
+
+
+def test_backends_empty_and_all_null_parts(seen):
+    empty = pd.Series([], dtype='string')
+    nulls = pd.Series([None, None, None], dtype='string')
+    assert seen.filter_new(empty).tolist() == []
+    assert seen.filter_new(nulls).tolist() == [True, False, False]
+    assert seen.filter_new(nulls).tolist() == [False, False, False]
+    assert seen.filter_new(pd.Series(['a', None], dtype='string')).tolist() == [True, False]
+
+
+def test_backends_key_dtype_does_not_matter(seen):
+    assert seen.filter_new(pd.Series(['a', 'b'], dtype='category')).tolist() == [True, True]
+    assert seen.filter_new(pd.Series(['b', 'c'], dtype=object)).tolist() == [False, True]
+
+
+def test_hash_collisions_never_drop_rows(monkeypatch, tmp_path):
+    #Every key hashes to the same value: only the stored key comparison tells them apart
+    monkeypatch.setattr(dedup_backends_etl, 'hash_keys', lambda keys: np.full(len(keys), 42, dtype=np.uint64))
+    seen = HashSeenKeys(spill_dir=str(tmp_path))
+    assert seen.filter_new(pd.Series(['x', 'y', 'x', 'z'])).tolist() == [True, True, False, True]
+    assert seen.filter_new(pd.Series(['y', 'w', 'z', 'v', 'w'])).tolist() == [False, True, False, True, False]
+    assert seen.size == 5
+    seen.close()
+
+
+def test_hash_keeps_16_bytes_per_key_in_memory(tmp_path):
+    seen = HashSeenKeys(spill_dir=str(tmp_path))
+    keys = pd.Series([f'https://example.com/jobs/view/{i}' for i in range(5000)], dtype='string')
+    assert seen.filter_new(keys[:3000]).all()
+    assert seen.filter_new(keys).tolist() == [False] * 3000 + [True] * 2000
+    assert seen.size == 5000
+    assert seen.nbytes == 5000 * 16
+    assert np.all(seen.hashes[1:] >= seen.hashes[:-1])
+
+    #Keys live in the spill files, removed on close
+    assert len(list(tmp_path.glob('seen_keys_*/*.arrow'))) == 2
+    seen.close()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_hash_max_bytes(tmp_path):
+    seen = make_seen_keys('hash', max_bytes=64 * 1024, spill_dir=str(tmp_path))
+    assert seen.filter_new(pd.Series([str(i) for i in range(4096)])).all()
+    with pytest.raises(MemoryError):
+        seen.filter_new(pd.Series(['new key']))
+    seen.close()
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        make_seen_keys('bloom')
@@ -0,0 +1,98 @@
+import threading
+import time
+import pytest
+from etl.delete_s3_URI import delete_s3_keys, delete_s3_prefix
+
+BUCKET = 'test-bucket'
+
+
+class RecordingS3:
+    """
+    Wraps FakeS3: records delete_objects batch sizes, the most batches running at once and the paginate calls.
+    Keys in error_keys are reported in the response's Errors instead of being deleted.
+    """
+
+    def __init__(self, s3, error_keys=()):
+        self.s3 = s3
+        self.error_keys = set(error_keys)
+        self.batches = []
+        self.paginate_calls = []
+        self.running = self.most_running = 0
+        self._lock = threading.Lock()
+
+    def delete_objects(self, Bucket, Delete):
+        with self._lock:
+            self.batches.append(len(Delete['Objects']))
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            #Hold the request open long enough for the others to overlap
+            time.sleep(0.05)
+            keep = [obj for obj in Delete['Objects'] if obj['Key'] in self.error_keys]
+            resp = self.s3.delete_objects(Bucket, {'Objects': [obj for obj in Delete['Objects'] if obj not in keep]})
+            if keep:
+                resp['Errors'] = [{'Key': obj['Key'], 'Code': 'AccessDenied', 'Message': 'Access Denied'} for obj in keep]
+            return resp
+        finally:
+            with self._lock:
+                self.running -= 1
+
+    def get_paginator(self, name):
+        paginator = self.s3.get_paginator(name)
+        recorder = self
+
+        class Paginator:
+            def paginate(self, *args, **kwargs):
+                #boto3 paginators only accept keyword arguments
+                assert not args
+                recorder.paginate_calls.append(kwargs)
+                return paginator.paginate(**kwargs)
+
+        return Paginator()
+
+
+def _put(s3, prefix, n):
+    keys = [f'{prefix}/part_{i:05d}.parquet' for i in range(n)]
+    for key in keys:
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b'x')
+    return keys
+
+
+def test_more_than_1000_keys_in_concurrent_batches(s3):
+    keys = _put(s3, 'p', 3500)
+    recording = RecordingS3(s3)
+    assert delete_s3_keys(BUCKET, iter(keys), max_workers=4, s3=recording) == 3500
+    assert sorted(recording.batches) == [500, 1000, 1000, 1000]
+    assert recording.most_running > 1
+    assert s3.keys(BUCKET) == []
+
+
+def test_errors_response_raises_after_every_batch(s3):
+    keys = _put(s3, 'p', 2500)
+    recording = RecordingS3(s3, error_keys={keys[10], keys[2400]})
+    with pytest.raises(RuntimeError, match=r'Failed to delete 2 object\(s\) in s3://test-bucket \(2498 deleted\)'):
+        delete_s3_keys(BUCKET, keys, s3=recording)
+    assert sorted(recording.batches) == [500, 1000, 1000]
+    assert s3.keys(BUCKET) == [keys[10], keys[2400]]
+
+
+def test_no_keys(s3):
+    recording = RecordingS3(s3)
+    assert delete_s3_keys(BUCKET, [], s3=recording) == 0
+    assert recording.batches == []
+
+
+def test_prefix_deletes_only_its_keys(s3, monkeypatch):
+    recording = RecordingS3(s3)
+    monkeypatch.setattr('boto3.client', lambda *args, **kwargs: recording)
+    _put(s3, 'clean/location/run_date=2024-01-01', 1200)
+    kept = _put(s3, 'clean/location/run_date=2024-01-02', 3)
+
+    assert delete_s3_prefix(BUCKET, 'clean/location/run_date=2024-01-01') == 1200
+    assert recording.paginate_calls == [{'Bucket': BUCKET, 'Prefix': 'clean/location/run_date=2024-01-01'}]
+    assert sorted(recording.batches) == [200, 1000]
+    assert s3.keys(BUCKET) == kept
+
+
+def test_empty_prefix(s3):
+    assert delete_s3_prefix(BUCKET, 'nothing/here') == 0
@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+from etl.distinct_values_etl import map_distinct, DistinctValueCache
+from etl.parquet_reader_etl import STRING_DTYPE
+from etl.text_normalise_etl import normalise_text
+
+
+def _upper(values):
+    return values.str.upper()
+
+
+def _recording(clean, seen):
+    #Records every value the cleaner is asked for
+    def recorded(values):
+        seen.extend(values.tolist())
+        return clean(values)
+    return recorded
+
+
+PARTS = {
+    'repeats and nulls': ['  Nurse ', 'nurse', None, '  Nurse ', 'Barista', None, 'nurse'],
+    'all null': [None, None],
+    'single value': ['Welder'] * 5,
+    'empty': [],
+}
+
+
+@pytest.mark.parametrize('clean', [_upper, normalise_text])
+@pytest.mark.parametrize('name', list(PARTS))
+def test_matches_per_row_application(name, clean):
+    series = pd.Series(PARTS[name], dtype=STRING_DTYPE, name='job_title', index=range(10, 10 + len(PARTS[name])))
+    pd.testing.assert_series_equal(map_distinct(series, clean), clean(series))
+    pd.testing.assert_series_equal(map_distinct(series, clean, cache=DistinctValueCache()), clean(series))
+
+
+@pytest.mark.parametrize('name', list(PARTS))
+def test_categorical_matches_per_row_application(name):
+    series = pd.Series(PARTS[name], dtype='category', name='job_title').cat.add_categories(['unused'])
+    result = map_distinct(series, normalise_text)
+
+    assert isinstance(result.dtype, pd.CategoricalDtype)
+    expected = normalise_text(series.astype(STRING_DTYPE))
+    pd.testing.assert_series_equal(result.astype(STRING_DTYPE), expected)
+    #Categories cleaning to the same value are merged
+    assert result.cat.categories.is_unique
+
+
+def test_cache_reused_across_parts():
+    cache = DistinctValueCache()
+    cleaned = []
+    clean = _recording(_upper, cleaned)
+    first = pd.Series(['a', 'b', None, 'a'], dtype=STRING_DTYPE)
+    second = pd.Series(['b', 'c', None, 'c', 'a'], dtype=STRING_DTYPE)
+
+    pd.testing.assert_series_equal(map_distinct(first, clean, cache=cache), _upper(first))
+    pd.testing.assert_series_equal(map_distinct(second, clean, cache=cache), _upper(second))
+    #Each distinct value cleaned once across both parts. NA is cleaned per part, never cached
+    assert [v for v in cleaned if not pd.isna(v)] == ['a', 'b', 'c']
+    assert set(cache.values) == {'a', 'b', 'c'}
+
+
+def test_evicted_values_are_cleaned_again():
+    cache = DistinctValueCache(maxsize=2)
+    cleaned = []
+    clean = _recording(_upper, cleaned)
+    for part in (['a', 'b'], ['c'], ['a', 'c']):
+        series = pd.Series(part, dtype=STRING_DTYPE)
+        pd.testing.assert_series_equal(map_distinct(series, clean, cache=cache), _upper(series))
+    #'a' was the least recently used when 'c' came in
+    assert cleaned == ['a', 'b', 'c', 'a']
+    assert list(cache.values) == ['c', 'a']
+
+
+def test_cache_shared_by_categorical_and_string_parts():
+    cache = DistinctValueCache()
+    string_part = pd.Series(['  Nurse ', None], dtype=STRING_DTYPE)
+    categorical_part = pd.Series(['  Nurse ', 'Barista', None], dtype='category')
+    pd.testing.assert_series_equal(map_distinct(string_part, normalise_text, cache=cache), normalise_text(string_part))
+    result = map_distinct(categorical_part, normalise_text, cache=cache)
+    pd.testing.assert_series_equal(result.astype(STRING_DTYPE), normalise_text(categorical_part.astype(STRING_DTYPE)))
@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+from etl import hash_partition_etl
+from etl.dedup_backends_etl import hash_keys
+from etl.hash_partition_etl import bucket_ids, _shuffle_part, _curate_bucket
+from etl.parquet_reader_etl import read_part
+
+
+def test_bucket_ids_in_range_and_balanced():
+    hashes = hash_keys(pd.Series([f'https://example.com/{i}' for i in range(64_000)]))
+    for buckets in (1, 7, 16):
+        ids = bucket_ids(hashes, buckets)
+        assert ids.min() >= 0 and ids.max() < buckets
+        counts = np.bincount(ids.astype(np.int64), minlength=buckets)
+        assert counts.min() > 0.8 * len(hashes) / buckets
+
+
+def test_bucket_does_not_fix_the_low_bits():
+    #Keys of one bucket must still spread over the seen-keys table slots (hash & mask)
+    hashes = hash_keys(pd.Series([f'https://example.com/{i}' for i in range(64_000)]))
+    in_bucket = hashes[bucket_ids(hashes, 16) == 3]
+    low_bits = np.unique(in_bucket & np.uint64(15))
+    assert len(low_bits) == 16
+
+
+def test_shuffle_part_keeps_every_key_in_one_bucket(tmp_path):
+    df = pd.DataFrame({'job_link': [f'l{i % 50}' for i in range(500)], 'job_skills': [f's{i % 7}' for i in range(500)]})
+    first = _shuffle_part(df.iloc[:250], 0, ['job_link', 'job_skills'], 8, str(tmp_path))
+    second = _shuffle_part(df.iloc[250:], 1, ['job_link', 'job_skills'], 8, str(tmp_path))
+
+    bucket_of_key = {}
+    for written in (first, second):
+        for b, path in written.items():
+            for key in read_part(path)[['job_link', 'job_skills']].itertuples(index=False, name=None):
+                assert bucket_of_key.setdefault(key, b) == b
+    assert sum(len(read_part(p)) for written in (first, second) for p in written.values()) == 500
+
+
+def test_curate_bucket_passes_dedup_limits_to_seen_keys(s3, tmp_path, monkeypatch):
+    df = pd.DataFrame({'job_link': [f'l{i}' for i in range(10)] * 2, 'job_skills': ['s'] * 20})
+    path = str(tmp_path / 'part.parquet')
+    df.to_parquet(path, index=False)
+    args = ([path], 0, ['job_link', 'job_skills'], {}, ['job_link', 'job_skills'], 'test-bucket', 'attempt', 'hash')
+
+    built = []
+    make_seen_keys = hash_partition_etl.make_seen_keys
+
+    def recording_make_seen_keys(backend, **kwargs):
+        built.append(kwargs)
+        return make_seen_keys(backend, **kwargs)
+
+    monkeypatch.setattr(hash_partition_etl, 'make_seen_keys', recording_make_seen_keys)
+    name, info, stats = _curate_bucket(*args, dedup_max_bytes=1024, dedup_spill_dir=str(tmp_path))
+    assert built == [{'max_bytes': 1024, 'spill_dir': str(tmp_path)}]
+    assert (name, info['rows']) == ('part_0001.parquet', 10)
+
+    #16 bytes per key: 10 keys don't fit in 64 bytes
+    with pytest.raises(MemoryError):
+        _curate_bucket(*args, dedup_max_bytes=64)
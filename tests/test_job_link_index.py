@@ -0,0 +1,60 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pytest
+from etl.job_link_index_etl import JobLinkIndex, spill_batches, strip_job_link
+
+
+def _merge(left, right):
+    #The replaced implementation: a pandas left merge on job_link per chunk
+    return left.to_pandas().merge(right.to_pandas(), how='left', on='job_link')
+
+
+def _assert_same(joined, expected):
+    result = joined.to_pandas()
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(result.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False)
+
+
+SIDE = pa.table({'job_link': ['a', 'b', 'b', None, 'c', 'a'],
+                 'job_skills': ['s1', 's2', 's3', 's-null', None, 's4']})
+
+
+@pytest.mark.parametrize('links', [
+    ['a', 'b', 'x', 'c'],
+    ['b', 'b', 'a'],
+    [None, 'a', None],
+    ['x', 'y'],
+    [],
+])
+def test_join_matches_pandas_left_merge(links):
+    chunk = pa.table({'job_link': pa.array(links, pa.string()), 'title': [f't{i}' for i in range(len(links))]})
+    _assert_same(JobLinkIndex(SIDE).join(chunk), _merge(chunk, SIDE))
+
+
+def test_join_empty_side_table():
+    side = SIDE.slice(0, 0)
+    chunk = pa.table({'job_link': ['a', None], 'title': ['t0', 't1']})
+    joined = JobLinkIndex(side).join(chunk)
+    assert joined.column('job_skills').to_pylist() == [None, None]
+    assert joined.column('title').to_pylist() == ['t0', 't1']
+
+
+def test_join_all_null_keys():
+    side = pa.table({'job_link': pa.array([None, None], pa.string()), 'job_skills': ['s1', 's2']})
+    chunk = pa.table({'job_link': pa.array([None, 'a'], pa.string())})
+    _assert_same(JobLinkIndex(side).join(chunk), _merge(chunk, side))
+
+
+def test_spilled_side_table_joins_the_same(tmp_path):
+    batches = [SIDE.slice(0, 3), SIDE.slice(3)]
+    spilled = spill_batches(batches, SIDE.schema, str(tmp_path))
+    assert len(os.listdir(tmp_path)) == 1
+
+    chunk = pa.table({'job_link': ['a', 'b', None, 'z']})
+    _assert_same(JobLinkIndex(spilled).join(chunk), _merge(chunk, SIDE))
+
+
+def test_strip_job_link():
+    table = strip_job_link(pa.table({'job_link': [' a ', '\tb\n', None]}))
+    assert table.column('job_link').to_pylist() == ['a', 'b', None]
@@ -0,0 +1,69 @@
+import json
+import pandas as pd
+import pytest
+from etl.job_title_etl import canonical_job_title, clean_job_title_frame, dropable_list, load_noise_tokens
+from etl.parquet_reader_etl import STRING_DTYPE
+from etl.unknown_placeholders_replace_etl import replace_unknown_placeholders
+
+
+def _pandas_canonical(titles):
+    #The replaced implementation: split once on the first hyphen, keep the non-noise side
+    normalised = titles.astype('string').str.replace(r'\s+', ' ', regex=True).str.strip().str.casefold()
+    before_hypen = normalised.str.split(' *- *', n=1).str[0]
+    after_hypen = normalised.str.split(' *- *', n=1).str[1]
+    condition = after_hypen.isin(dropable_list)
+    condition_2 = before_hypen.isin(dropable_list)
+    canonical = normalised.copy()
+    canonical = canonical.mask(condition & ~condition_2, before_hypen)
+    canonical = canonical.mask(~condition & condition_2, after_hypen)
+    canonical = replace_unknown_placeholders(canonical)
+    return canonical.mask(canonical.isna(), 'unknown_title')
+
+
+#Titles with at most one hyphen: canonical form must be unchanged
+SINGLE_HYPHEN = ['Registered Nurse - Remote', 'Remote - Registered Nurse', 'Remote', 'Remote - Hybrid',
+                 'Software  Engineer', '  Barista -  part time', 'Cashier - TJ Maxx', 'Data Analyst - London',
+                 'part-time', 'Welder-Night Shift', 'N/A', '', None, 'Unknown', 'Nurse -', '- Remote',
+                 'Driver - US', 'Sales Associate - Retail', 'PRN']
+
+
+def test_matches_pandas_chain_up_to_one_hyphen():
+    df = pd.DataFrame({'job_link': [f'l{i}' for i in range(len(SINGLE_HYPHEN))], 'job_title': SINGLE_HYPHEN})
+    result = clean_job_title_frame(df)
+    expected = _pandas_canonical(df['job_title'])
+    assert list(result['canonical_job_title']) == list(expected)
+    assert list(result.columns) == ['canonical_job_title', 'raw_job_title', 'job_link']
+    assert result['canonical_job_title'].dtype == STRING_DTYPE
+
+
+@pytest.mark.parametrize('title, canonical', [
+    ('senior nurse - part-time - remote', 'senior nurse'),
+    ('remote - hybrid - senior nurse - prn', 'senior nurse'),
+    ('nurse -- remote', 'nurse'),
+    ('icu - nurse - remote', 'icu - nurse'),
+    ('remote - hybrid - prn', 'remote - hybrid - prn'),
+    ('remote', None),
+    ('part-time', 'part-time'),
+    ('barista - part-time', 'barista'),
+    ('part-time - barista', 'barista'),
+    ('engineer', 'engineer'),
+])
+def test_segment_canonicalisation(title, canonical):
+    assert canonical_job_title(title) == canonical
+
+
+def test_duplicate_titles_and_all_null_part():
+    df = pd.DataFrame({'job_link': ['a', 'b', 'c'], 'job_title': ['Nurse - Remote', 'Nurse - Remote', None]})
+    assert list(clean_job_title_frame(df)['canonical_job_title']) == ['nurse', 'nurse', 'unknown_title']
+
+    nulls = pd.DataFrame({'job_link': pd.Series(['a'], dtype=STRING_DTYPE), 'job_title': pd.Series([None], dtype=STRING_DTYPE)})
+    assert list(clean_job_title_frame(nulls)['canonical_job_title']) == ['unknown_title']
+
+    empty = pd.DataFrame({'job_link': pd.Series([], dtype=STRING_DTYPE), 'job_title': pd.Series([], dtype=STRING_DTYPE)})
+    assert clean_job_title_frame(empty).empty
+
+
+def test_load_noise_tokens(tmp_path):
+    path = tmp_path / 'noise.json'
+    path.write_text(json.dumps({'work_pattern': ['remote', 'part-time'], 'employer_name': ['acme']}))
+    assert load_noise_tokens(str(path)) == ['remote', 'part-time', 'acme']
@@ -0,0 +1,128 @@
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from etl import local_part_cache_etl, parquet_reader_etl
+from etl.local_part_cache_etl import LocalPartCache, local_part_cache
+
+BUCKET = 'test-bucket'
+
+
+def _part(n=100, tag='a'):
+    buf = pa.BufferOutputStream()
+    pq.write_table(pa.table({'job_link': [f'{tag}{i}' for i in range(n)]}), buf)
+    return buf.getvalue().to_pybytes()
+
+
+def _put(s3, key, body):
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body)
+    return f's3://{BUCKET}/{key}'
+
+
+def _gets(s3):
+    return [key for call, key in s3.calls if call == 'get_object']
+
+
+def test_miss_downloads_then_hits(s3, tmp_path):
+    body = _part()
+    uri = _put(s3, 'raw/part_00001.parquet', body)
+    cache = LocalPartCache(str(tmp_path / 'cache'))
+
+    path = cache.fetch(uri)
+    assert open(path, 'rb').read() == body
+    assert cache.fetch(uri) == path
+    assert _gets(s3) == ['raw/part_00001.parquet']
+    #Only the part itself is left in the directory (no temporary download files)
+    assert os.listdir(tmp_path / 'cache') == [os.path.basename(path)]
+
+
+def test_changed_object_is_a_miss(s3, tmp_path):
+    uri = _put(s3, 'raw/part_00001.parquet', _part(tag='a'))
+    cache = LocalPartCache(str(tmp_path / 'cache'))
+    listed = cache.etags([uri])[uri]
+
+    #Overwritten after the listing: the listed ETag no longer matches, GetObject IfMatch fails
+    _put(s3, 'raw/part_00001.parquet', _part(tag='b'))
+    assert cache.fetch(uri, listed) is None
+    assert os.listdir(tmp_path / 'cache') == []
+
+    #The current ETag is a different entry, downloaded fresh
+    path = cache.fetch(uri)
+    assert pq.read_table(path)['job_link'][0].as_py() == 'b0'
+    assert cache.cached(uri, listed) is None
+
+
+def test_missing_object_is_a_miss(s3, tmp_path):
+    cache = LocalPartCache(str(tmp_path / 'cache'))
+    assert cache.fetch(f's3://{BUCKET}/raw/missing.parquet') is None
+
+
+def test_least_recently_read_parts_are_evicted(s3, tmp_path):
+    bodies = {name: _part(tag=name) for name in 'abc'}
+    uris = {name: _put(s3, f'raw/{name}.parquet', body) for name, body in bodies.items()}
+    #Room for two parts
+    cache = LocalPartCache(str(tmp_path / 'cache'), max_bytes=2 * max(map(len, bodies.values())))
+
+    paths = {name: cache.fetch(uris[name]) for name in 'ab'}
+    os.utime(paths['a'], (1000, 1000))
+    os.utime(paths['b'], (2000, 2000))
+    #Reading a again makes b the least recently read
+    assert cache.fetch(uris['a']) == paths['a']
+
+    paths['c'] = cache.fetch(uris['c'])
+    assert sorted(os.listdir(tmp_path / 'cache')) == sorted(os.path.basename(paths[name]) for name in 'ac')
+
+
+def test_part_above_the_limit_is_kept_for_its_reader(s3, tmp_path):
+    uri = _put(s3, 'raw/big.parquet', _part(n=1000))
+    cache = LocalPartCache(str(tmp_path / 'cache'), max_bytes=1)
+    path = cache.fetch(uri)
+    assert os.path.exists(path)
+
+
+def test_unwritable_directory_falls_back_to_s3(s3, tmp_path):
+    uri = _put(s3, 'raw/part_00001.parquet', _part())
+    directory = tmp_path / 'cache'
+    cache = LocalPartCache(str(directory))
+    #Removed under a running task (e.g. a tmp cleaner): the read goes to S3 instead of failing
+    directory.rmdir()
+    assert cache.fetch(uri) is None
+
+
+def test_uncreatable_directory_disables_cache(tmp_path, monkeypatch):
+    blocker = tmp_path / 'not_a_directory'
+    blocker.write_text('')
+    monkeypatch.setattr(local_part_cache_etl, 'LOCAL_PART_CACHE_DIR', str(blocker / 'cache'))
+    monkeypatch.setattr(local_part_cache_etl, '_shared', None)
+    monkeypatch.setattr(local_part_cache_etl, '_shared_pid', None)
+    assert local_part_cache() is None
+    #Not retried on every read
+    monkeypatch.setattr(local_part_cache_etl, 'LocalPartCache', None)
+    assert local_part_cache() is None
+
+
+def test_estimated_bytes_reads_cached_footer(s3, tmp_path, monkeypatch):
+    uri = _put(s3, 'raw/part_00001.parquet', _part())
+    other = _put(s3, 'raw/part_00002.parquet', _part(tag='b'))
+    cache = LocalPartCache(str(tmp_path / 'cache'))
+    local = cache.fetch(uri)
+    monkeypatch.setattr(parquet_reader_etl, 'local_part_cache', lambda: cache)
+
+    read = []
+    read_metadata = pq.read_metadata
+
+    def recording_read_metadata(source):
+        read.append(source)
+        if source.startswith('s3://'):
+            raise OSError('no network in tests')
+        return read_metadata(source)
+
+    monkeypatch.setattr(pq, 'read_metadata', recording_read_metadata)
+    etags = cache.etags([uri, other])
+
+    expected = read_metadata(local).row_group(0).column(0).total_uncompressed_size
+    assert parquet_reader_etl._estimated_bytes(uri, ['job_link'], etags[uri]) == expected
+    #Not cached: the footer comes from S3
+    assert parquet_reader_etl._estimated_bytes(other, ['job_link'], etags[other]) == 0
+    assert read == [local, other]
+    #Estimating is not a read: nothing downloaded for the uncached part
+    assert _gets(s3) == ['raw/part_00001.parquet']
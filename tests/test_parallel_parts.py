@@ -0,0 +1,42 @@
+import os
+from etl.parallel_parts_etl import memory_bounded_workers, resolve_workers
+
+GIB = 1024 ** 3
+
+
+def _machine(monkeypatch, cores, available_bytes):
+    monkeypatch.setattr(os, 'cpu_count', lambda: cores)
+    pages = {'SC_AVPHYS_PAGES': available_bytes // 4096, 'SC_PAGE_SIZE': 4096}
+    monkeypatch.setattr(os, 'sysconf', lambda name: pages[name])
+
+
+def test_memory_bounded_workers_limited_by_memory(monkeypatch):
+    _machine(monkeypatch, cores=16, available_bytes=6 * GIB)
+    assert memory_bounded_workers(2 * GIB) == 3
+
+
+def test_memory_bounded_workers_limited_by_cores(monkeypatch):
+    _machine(monkeypatch, cores=4, available_bytes=64 * GIB)
+    assert memory_bounded_workers(GIB) == 4
+    assert memory_bounded_workers(GIB, max_workers=2) == 2
+
+
+def test_memory_bounded_workers_at_least_one(monkeypatch):
+    _machine(monkeypatch, cores=8, available_bytes=GIB // 2)
+    assert memory_bounded_workers(2 * GIB) == 1
+
+
+def test_memory_bounded_workers_without_sysconf(monkeypatch):
+    monkeypatch.setattr(os, 'cpu_count', lambda: 3)
+
+    def unsupported(name):
+        raise ValueError(name)
+
+    monkeypatch.setattr(os, 'sysconf', unsupported)
+    assert memory_bounded_workers(GIB) == 3
+
+
+def test_resolve_workers():
+    assert resolve_workers(None) == 1
+    assert resolve_workers(0) == 1
+    assert resolve_workers(5) == 5
@@ -0,0 +1,105 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from etl import job_level_etl
+from etl.job_level_etl import build_job_level, job_level_metadata_values, job_level_part_values
+from etl.parquet_footer_etl import dictionary_column_values
+from etl.parquet_reader_etl import read_part
+
+LEVELS = ['Mid senior', 'Associate', None, 'Director', 'ÉTUDIANT', 'Mid senior']
+
+
+def _write(path, values, **options):
+    pq.write_table(pa.table({'job_link': [f'l{i}' for i in range(len(values))], 'job_level': pa.array(values, pa.string())}),
+                   path, **options)
+    return str(path)
+
+
+def _column_values(path):
+    column = pq.read_table(path, columns=['job_level'])['job_level']
+    return column.null_count, set(v for v in column.to_pylist() if v is not None)
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'row_group_size': 7},
+    {'compression': 'zstd'},
+    {'compression': 'gzip'},
+    {'compression': 'none'},
+    {'data_page_version': '2.0'},
+    {'write_statistics': ['job_level']},
+])
+def test_dictionary_values_match_column_read(tmp_path, options):
+    path = _write(tmp_path / 'part.parquet', LEVELS * 10, **options)
+    assert dictionary_column_values(path, 'job_level') == _column_values(path)
+
+
+def test_dictionary_typed_column(tmp_path):
+    path = str(tmp_path / 'part.parquet')
+    pq.write_table(pa.table({'job_level': pa.array(LEVELS, pa.string()).dictionary_encode()}), path)
+    assert dictionary_column_values(path, 'job_level') == _column_values(path)
+
+
+def test_all_null_row_groups(tmp_path):
+    path = _write(tmp_path / 'part.parquet', [None] * 5 + ['Associate'] * 5, row_group_size=5)
+    assert dictionary_column_values(path, 'job_level') == (5, {'Associate'})
+
+
+@pytest.mark.parametrize('options', [
+    #Plain data pages only
+    {'use_dictionary': False},
+    #Dictionary page far below 1 MiB, but the writer fell back to plain pages after it
+    {'dictionary_pagesize_limit': 64, 'write_batch_size': 16},
+    #No null counts in the footer
+    {'write_statistics': False},
+    #Codec pa.decompress can't read as parquet writes it
+    {'compression': 'lz4'},
+])
+def test_not_answered_from_metadata(tmp_path, options):
+    path = _write(tmp_path / 'part.parquet', [f'level {i}' for i in range(500)], **options)
+    assert dictionary_column_values(path, 'job_level') is None
+
+
+def test_missing_column(tmp_path):
+    path = _write(tmp_path / 'part.parquet', LEVELS)
+    assert dictionary_column_values(path, 'job_type') is None
+
+
+def test_metadata_values_match_part_values(tmp_path):
+    path = _write(tmp_path / 'part.parquet', ['  Mid   senior ', 'ASSOCIATE', None, 'associate'])
+    assert job_level_metadata_values(path) == job_level_part_values(read_part(path, columns=['job_level']))
+
+
+def test_values_normalising_to_empty_are_counted_on_rows(tmp_path):
+    #'  ' is one dictionary value but may sit on any number of rows
+    path = _write(tmp_path / 'part.parquet', ['Associate', '  ', '  '])
+    assert job_level_metadata_values(path) is None
+    assert job_level_part_values(read_part(path, columns=['job_level']))[1] == 2
+
+
+def test_build_reads_only_unanswered_parts(s3, tmp_path, monkeypatch):
+    files = [_write(tmp_path / 'a.parquet', ['Associate', 'Director']),
+             _write(tmp_path / 'b.parquet', [f'level {i}' for i in range(300)],
+                    dictionary_pagesize_limit=64, write_batch_size=16),
+             _write(tmp_path / 'c.parquet', ['Mid senior'])]
+    read = []
+    read_parts = job_level_etl.read_parts
+
+    def recording_read_parts(parts, **kwargs):
+        read.extend(parts)
+        return read_parts(parts, **kwargs)
+
+    monkeypatch.setattr(job_level_etl, 'read_parts', recording_read_parts)
+    build_job_level(files, 'test-bucket', 'curated/job_level/run_date=2024-01-01', read_options={'max_workers': 2})
+
+    assert read == [files[1]]
+    written = pd.read_parquet(pa.BufferReader(s3.objects[('test-bucket', 'curated/job_level/run_date=2024-01-01/data.parquet')]))
+    expected = set().union(*(job_level_part_values(read_part(f, columns=['job_level']))[2] for f in files))
+    assert list(written['job_level']) == sorted(expected)
+
+
+def test_build_raises_on_nulls_from_footer(s3, tmp_path):
+    files = [_write(tmp_path / 'a.parquet', ['Associate', None])]
+    with pytest.raises(ValueError, match='1 NAs'):
+        build_job_level(files, 'test-bucket', 'curated/job_level/run_date=2024-01-01')
@@ -0,0 +1,70 @@
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from etl import parquet_reader_etl
+from etl.parquet_reader_etl import read_parts, STRING_DTYPE
+
+
+@pytest.fixture
+def parts(tmp_path):
+    files = []
+    for i in range(6):
+        table = pa.table({'job_link': [f'{i}-{j}' * 10 for j in range(5000)], 'n': list(range(5000))})
+        path = str(tmp_path / f'part-{i:05d}.parquet')
+        pq.write_table(table, path)
+        files.append(path)
+    return files
+
+
+def _track_in_flight(monkeypatch):
+    #Wrap the pool-side read to record the largest number of parts downloaded-but-not-consumed
+    state = {'in_flight': 0, 'peak': 0}
+    lock = threading.Lock()
+    read = parquet_reader_etl._read_part
+
+    def tracked(*args):
+        with lock:
+            state['in_flight'] += 1
+            state['peak'] = max(state['peak'], state['in_flight'])
+        return read(*args)
+
+    monkeypatch.setattr(parquet_reader_etl, '_read_part', tracked)
+    return state, lock
+
+
+def test_read_parts_keeps_input_order_and_projection(parts):
+    frames = list(read_parts(parts, columns=['job_link'], read_options={'max_workers': 4}))
+    assert [df['job_link'].iloc[0] for df in frames] == [f'{i}-0' * 10 for i in range(6)]
+    assert all(list(df.columns) == ['job_link'] for df in frames)
+    assert all(df['job_link'].dtype == STRING_DTYPE for df in frames)
+
+
+def test_read_parts_budget_reserves_estimated_size(parts, monkeypatch):
+    state, lock = _track_in_flight(monkeypatch)
+    estimate = parquet_reader_etl._estimated_bytes(parts[0], ['job_link'])
+    assert estimate > 0
+
+    #Budget for two parts: never more than two submitted and unconsumed, even before any download finished
+    frames = []
+    for df in read_parts(parts, columns=['job_link'], read_options={'max_workers': 4, 'max_buffered_bytes': 2 * estimate + 1}):
+        frames.append(df)
+        with lock:
+            state['in_flight'] -= 1
+    assert len(frames) == len(parts)
+    assert state['peak'] <= 2
+
+
+def test_read_parts_budget_below_one_part_still_progresses(parts, monkeypatch):
+    state, lock = _track_in_flight(monkeypatch)
+    frames = []
+    for df in read_parts(parts, read_options={'max_workers': 4, 'max_buffered_bytes': 1}):
+        frames.append(df)
+        with lock:
+            state['in_flight'] -= 1
+    assert len(frames) == len(parts)
+    assert state['peak'] == 1
+
+
+def test_estimated_bytes_missing_file_is_zero(tmp_path):
+    assert parquet_reader_etl._estimated_bytes(str(tmp_path / 'missing.parquet'), None) == 0
@@ -0,0 +1,186 @@
+import pandas as pd
+import pytest
+from etl.parquet_validation_etl import TableValidator, validate_table, table_stats
+from etl.parquet_reader_etl import STRING_DTYPE
+
+WANTED = ['job_link', 'job_location', 'job_summary']
+LIMITS = {'job_link': 20, 'job_location': 4}
+KEY = ['job_link']
+
+
+def _pandas_validate(df_new, wanted_columns, VAR_CHAR_LIMITS, natural_key_columns):
+    #The replaced implementation: one pandas pass per check. Its `observed_max is None` guard never fired (an empty or
+    #all-null column gives pd.NA, which then raised TypeError); validate_table treats those columns as length 0
+    missing = set(wanted_columns) - set(df_new.columns)
+    if missing:
+        raise KeyError(f'column mismatch. Missing: {missing}')
+    if df_new.duplicated(subset=natural_key_columns).sum() > 0:
+        raise ValueError('duplicates')
+    if (df_new[natural_key_columns].isna().sum() > 0).any():
+        raise ValueError('NAs')
+    if ((df_new[natural_key_columns] == '').sum() > 0).any():
+        raise ValueError('Empty strings')
+    for col, limit in VAR_CHAR_LIMITS.items():
+        if col in wanted_columns:
+            observed_max = df_new[col].astype(STRING_DTYPE).str.len().dropna().max()
+            if not pd.isna(observed_max) and observed_max > limit:
+                raise ValueError('VARCHAR')
+
+
+def _frame(links, locations=None, summaries=None, dtype=STRING_DTYPE):
+    n = len(links)
+    return pd.DataFrame({'job_link': pd.array(links, dtype=dtype),
+                         'job_location': pd.array(locations if locations is not None else ['nyc'] * n, dtype=dtype),
+                         'job_summary': pd.array(summaries if summaries is not None else ['text'] * n, dtype=dtype)})
+
+
+def _outcome(fn, *args):
+    try:
+        fn(*args)
+    except (KeyError, ValueError) as e:
+        return type(e)
+    return None
+
+
+FRAMES = {
+    'clean': _frame(['a', 'b', 'c']),
+    'duplicate key': _frame(['a', 'b', 'a']),
+    'null key': _frame(['a', None]),
+    'two null keys': _frame([None, None]),
+    'empty key': _frame(['a', '']),
+    'varchar exceeded': _frame(['a', 'b'], ['nyc', 'paris']),
+    'varchar at limit': _frame(['a', 'b'], ['nyc', 'rome']),
+    #4 characters, 8 bytes: the limit counts characters
+    'non-ascii at limit': _frame(['a', 'b'], ['nyc', 'éééé']),
+    'non-ascii exceeded': _frame(['a', 'b'], ['nyc', 'ééééé']),
+    'null bounded column': _frame(['a', 'b'], [None, None]),
+    'null free text': _frame(['a', 'b'], summaries=[None, None]),
+    'empty': _frame([]),
+    'categorical': _frame(['a', 'b', 'c'], ['nyc', 'paris', 'nyc'], dtype='category'),
+    'categorical duplicate': _frame(['a', 'b', 'a'], dtype='category'),
+    'object dtype': _frame(['a', 'b'], ['nyc', None], dtype=object),
+    'missing column': _frame(['a']).drop(columns=['job_summary']),
+}
+
+
+@pytest.mark.parametrize('name', list(FRAMES))
+def test_validate_table_matches_pandas_checks(name):
+    df = FRAMES[name]
+    assert _outcome(validate_table, df, WANTED, LIMITS, KEY) == _outcome(_pandas_validate, df, WANTED, LIMITS, KEY)
+
+
+@pytest.mark.parametrize('name', [name for name in FRAMES if name != 'missing column'])
+def test_validator_single_chunk_matches_validate_table(name):
+    df = FRAMES[name]
+
+    def run():
+        validator = TableValidator(WANTED, LIMITS, KEY)
+        validator.update(df)
+        return validator.finalize()
+
+    assert _outcome(run) == _outcome(validate_table, df, WANTED, LIMITS, KEY)
+
+
+def test_composite_key_duplicates():
+    df = pd.DataFrame({'a': pd.array(['x', 'x', 'y', None, None], dtype=STRING_DTYPE),
+                       'b': pd.array(['1', '2', '1', '1', '1'], dtype=STRING_DTYPE)})
+    assert table_stats(df, ['a', 'b'], {}, ['a', 'b'])['duplicates'] == df.duplicated(subset=['a', 'b']).sum() == 1
+
+
+def test_merged_chunk_stats_equal_whole_table_stats():
+    chunks = [_frame(['a', 'b'], ['nyc', None], ['x' * 10, 'y']),
+              _frame(['c'], ['la'], [None]),
+              _frame([]),
+              _frame(['d', 'e'], ['rome', 'bonn'], ['', 'zz'])]
+    validator = TableValidator(WANTED, LIMITS, KEY)
+    for df in chunks:
+        validator.update(df)
+    merged = validator.finalize()
+    whole = validate_table(pd.concat(chunks, ignore_index=True), WANTED, LIMITS, KEY)
+
+    assert merged['rows'] == whole['rows'] == 5
+    for col in WANTED:
+        for stat in ('nulls', 'empty', 'max_bytes', 'min', 'max'):
+            assert merged['columns'][col].get(stat) == whole['columns'][col].get(stat), (col, stat)
+    assert whole['columns']['job_location']['min'] == 'bonn'
+    assert 'min' not in whole['columns']['job_summary']
+
+
+def test_violations_are_raised_on_table_totals():
+    validator = TableValidator(WANTED, LIMITS, KEY)
+    validator.update(_frame(['a'], ['nyc']))
+    validator.update(_frame(['b'], [None]))
+    validator.update(_frame(['c'], ['paris']))
+    with pytest.raises(ValueError, match='VARCHAR'):
+        validator.finalize()
+
+    validator = TableValidator(WANTED, LIMITS, KEY)
+    validator.update(_frame(['a']))
+    validator.update(_frame([None]))
+    with pytest.raises(ValueError, match='NAs'):
+        validator.finalize()
+
+
+def test_duplicates_within_a_chunk_raise():
+    validator = TableValidator(WANTED, LIMITS, KEY)
+    validator.update(_frame(['a', 'b']))
+    validator.update(_frame(['c', 'c']))
+    with pytest.raises(ValueError, match='duplicates'):
+        validator.finalize()
+
+
+def test_duplicates_across_chunks_are_counted_per_chunk():
+    #As with the per-chunk validate_table it replaced: keys are only compared within a chunk. Streams that can repeat
+    #a key across chunks deduplicate with a seen-keys store first, or partition by key (hash_partition_etl)
+    validator = TableValidator(WANTED, LIMITS, KEY)
+    validator.update(_frame(['a', 'b']))
+    validator.update(_frame(['b', 'c']))
+    assert validator.finalize()['duplicates'] == 0
+
+
+def test_check_duplicates_off():
+    validator = TableValidator(WANTED, LIMITS, KEY, check_duplicates=False)
+    validator.update(_frame(['a', 'a']))
+    assert validator.finalize()['duplicates'] == 0
+
+
+def test_missing_column_raises_on_update():
+    validator = TableValidator(WANTED, LIMITS, KEY)
+    with pytest.raises(KeyError, match='Missing'):
+        validator.update(FRAMES['missing column'])
+
+
+def test_merge_of_worker_stats():
+    #Per-bucket validate_table results merged in the parent, as in hash_partition_etl
+    validator = TableValidator(WANTED, LIMITS, KEY)
+    validator.merge(validate_table(_frame(['a', 'b'], ['nyc', 'la']), WANTED, LIMITS, KEY))
+    validator.merge(validate_table(_frame(['c']), WANTED, LIMITS, KEY))
+    stats = validator.finalize()
+    assert stats['rows'] == 3
+    assert (stats['columns']['job_link']['min'], stats['columns']['job_link']['max']) == ('a', 'c')
+    assert stats['columns']['job_location']['max_bytes'] == 3
+
+
+def test_no_chunks():
+    stats = TableValidator(WANTED, LIMITS, KEY).finalize()
+    assert stats == {'rows': 0, 'duplicates': 0, 'columns': {}}
+
+
+def test_merged_distinct_is_a_lower_bound():
+    #'a' and 'b' appear in both chunks: the table has 3 distinct keys, neither chunk count is the table's
+    first = validate_table(_frame(['a', 'b'], dtype='category'), WANTED, LIMITS, KEY)
+    second = validate_table(_frame(['b', 'a', 'c'], dtype='category'), WANTED, LIMITS, KEY)
+    assert (first['columns']['job_link']['distinct'], second['columns']['job_link']['distinct']) == (2, 3)
+
+    validator = TableValidator(WANTED, LIMITS, KEY)
+    validator.merge(first)
+    validator.merge(second)
+    validator.merge(validate_table(_frame(['d']), WANTED, LIMITS, KEY))
+    merged = validator.finalize()['columns']['job_link']
+    assert 'distinct' not in merged
+    assert merged['distinct_lower_bound'] == 3
+
+    #A single chunk's count stays exact
+    validator = TableValidator(WANTED, LIMITS, KEY)
+    validator.update(_frame(['a', 'b'], dtype='category'))
+    assert validator.finalize()['columns']['job_link']['distinct'] == 2
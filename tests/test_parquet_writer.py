@@ -0,0 +1,116 @@
+import io
+import threading
+import pandas as pd
+import pytest
+from etl.parquet_writer_etl import ParquetWriterPool, write_parquet, wait_for_writes
+
+BUCKET = 'test-bucket'
+
+
+class GatedS3:
+    """
+    Wraps FakeS3: uploads block until released, and the most uploads running at once is recorded.
+    """
+
+    def __init__(self, s3, fail_keys=()):
+        self.s3 = s3
+        self.fail_keys = set(fail_keys)
+        self.gate = threading.Event()
+        self.started = threading.Semaphore(0)
+        self.running = self.most_running = 0
+        self._lock = threading.Lock()
+
+    def upload_fileobj(self, f, Bucket, Key, Config=None):
+        with self._lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        self.started.release()
+        try:
+            self.gate.wait(timeout=10)
+            if Key in self.fail_keys:
+                raise OSError(f'upload of {Key} failed')
+            self.s3.upload_fileobj(f, Bucket, Key, Config=Config)
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def _frame(n=3):
+    return pd.DataFrame({'job_link': [f'l{i}' for i in range(n)]})
+
+
+def test_finished_writes_leave_pending(s3):
+    pool = ParquetWriterPool(s3=s3)
+    futures = [pool.submit(_frame(), BUCKET, f'p/part_{i}.parquet') for i in range(20)]
+    for future in futures:
+        future.result()
+    #Done callbacks run on the upload threads: let them finish before looking
+    pool._uploader.shutdown(wait=True)
+    assert pool.pending == {}
+    assert pool.wait() == {}
+    pool.close()
+    assert len(pd.read_parquet(io.BytesIO(s3.objects[(BUCKET, 'p/part_0.parquet')]))) == 3
+
+
+def test_submit_blocks_beyond_max_in_flight(s3):
+    gated = GatedS3(s3)
+    pool = ParquetWriterPool(s3=gated, upload_workers=1, max_in_flight=2)
+    pool.submit(_frame(), BUCKET, 'p/part_0.parquet')
+    pool.submit(_frame(), BUCKET, 'p/part_1.parquet')
+
+    third = threading.Thread(target=pool.submit, args=(_frame(), BUCKET, 'p/part_2.parquet'))
+    third.start()
+    assert gated.started.acquire(timeout=5)
+    third.join(timeout=0.2)
+    #Two parts accepted and not uploaded: the third submit waits for a slot
+    assert third.is_alive()
+    assert 's3://test-bucket/p/part_2.parquet' not in pool.pending
+
+    gated.gate.set()
+    third.join(timeout=5)
+    assert not third.is_alive()
+    pool.close()
+    assert pool.pending == {}
+    assert s3.keys(BUCKET, 'p/') == [f'p/part_{i}.parquet' for i in range(3)]
+
+
+def test_uploads_run_concurrently_up_to_the_worker_count(s3):
+    gated = GatedS3(s3)
+    pool = ParquetWriterPool(s3=gated, upload_workers=2, max_in_flight=8)
+    for i in range(6):
+        pool.submit(_frame(), BUCKET, f'p/part_{i}.parquet')
+    for _ in range(2):
+        assert gated.started.acquire(timeout=5)
+    assert not gated.started.acquire(timeout=0.2)
+
+    gated.gate.set()
+    pool.close()
+    assert gated.most_running == 2
+    assert len(s3.keys(BUCKET, 'p/')) == 6
+
+
+def test_failed_upload_is_raised_from_wait_for_writes(s3):
+    gated = GatedS3(s3, fail_keys={'p/part_1.parquet'})
+    gated.gate.set()
+    futures = [write_parquet(_frame(), f's3://{BUCKET}/p/part_{i}.parquet', s3=gated) for i in range(3)]
+    #Wait for every upload to finish first: the failure must still be reported afterwards
+    for future in futures:
+        future.exception(timeout=5)
+
+    with pytest.raises(OSError, match='part_1'):
+        wait_for_writes()
+    #Only the failed write was still pending; it is reported once
+    assert wait_for_writes() == {}
+    assert s3.keys(BUCKET, 'p/') == ['p/part_0.parquet', 'p/part_2.parquet']
+
+
+def test_wait_for_given_uris_only(s3):
+    gated = GatedS3(s3, fail_keys={'p/part_1.parquet'})
+    gated.gate.set()
+    futures = [write_parquet(_frame(), f's3://{BUCKET}/p/part_{i}.parquet', s3=gated) for i in range(2)]
+    for future in futures:
+        future.exception(timeout=5)
+    written = wait_for_writes([f's3://{BUCKET}/p/part_0.parquet', 's3://other/never_written.parquet'])
+    assert set(written) <= {f's3://{BUCKET}/p/part_0.parquet'}
+    with pytest.raises(OSError):
+        wait_for_writes([f's3://{BUCKET}/p/part_1.parquet'])
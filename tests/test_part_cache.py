@@ -0,0 +1,82 @@
+import io
+import pandas as pd
+import pytest
+from etl import parallel_parts_etl, part_cache_etl
+from etl.parallel_parts_etl import run_parts
+from etl.part_cache_etl import PartCache, CACHE_PREFIX
+from etl.parquet_writer_etl import put_parquet
+
+BUCKET = 'test-bucket'
+
+
+@pytest.fixture
+def raw_parts(s3, monkeypatch):
+    files = []
+    for i in range(3):
+        key = f'raw/run_date=2024-01-01/part_{i + 1}.parquet'
+        put_parquet(pd.DataFrame({'job_location': [f'city {i}']}), BUCKET, key, s3=s3)
+        files.append(f's3://{BUCKET}/{key}')
+
+    def read_parts(uris, **kwargs):
+        for uri in uris:
+            yield pd.read_parquet(io.BytesIO(s3.objects[(BUCKET, uri[len(f's3://{BUCKET}/'):])]))
+
+    monkeypatch.setattr(parallel_parts_etl, 'read_parts', read_parts)
+    return files
+
+
+computed = []
+
+
+def clean_part(df, i, prefix):
+    computed.append(i)
+    key = f'{prefix}/part_{i + 1:05d}.parquet'
+    put_parquet(df.assign(job_location=df['job_location'].str.upper()), BUCKET, key)
+    return {'outputs': [f's3://{BUCKET}/{key}'], 'rows': len(df)}
+
+
+def _run(s3, files, run_date, config=None):
+    computed.clear()
+    prefix = f'clean/location/run_date={run_date}'
+    cache = PartCache(BUCKET, 'clean_location', config or {'columns': ['job_location']}, {'location': prefix}, s3=s3)
+    return run_parts(clean_part, files, part_args=(prefix,), cache=cache)
+
+
+def test_backfill_of_same_inputs_copies_outputs(s3, raw_parts):
+    _run(s3, raw_parts, '2024-01-01')
+    assert computed == [0, 1, 2]
+
+    results = _run(s3, raw_parts, '2024-01-02')
+    assert computed == []
+    assert results[0]['outputs'] == [f's3://{BUCKET}/clean/location/run_date=2024-01-02/part_00001.parquet']
+    assert s3.objects[(BUCKET, 'clean/location/run_date=2024-01-02/part_00002.parquet')] == \
+        s3.objects[(BUCKET, 'clean/location/run_date=2024-01-01/part_00002.parquet')]
+
+
+def test_changed_config_misses(s3, raw_parts):
+    _run(s3, raw_parts, '2024-01-01')
+    _run(s3, raw_parts, '2024-01-02', config={'columns': ['job_location', 'company']})
+    assert computed == [0, 1, 2]
+
+
+def test_overwritten_source_output_is_recomputed(s3, raw_parts):
+    _run(s3, raw_parts, '2024-01-01')
+    put_parquet(pd.DataFrame({'job_location': ['edited']}), BUCKET, 'clean/location/run_date=2024-01-01/part_00003.parquet', s3=s3)
+    _run(s3, raw_parts, '2024-01-02')
+    assert computed == [2]
+
+
+def test_prune_deletes_entries_of_other_code_versions(s3, raw_parts, monkeypatch):
+    monkeypatch.setattr(part_cache_etl, 'code_fingerprint', lambda: 'old')
+    _run(s3, raw_parts, '2024-01-01')
+    assert len(s3.keys(BUCKET, f'{CACHE_PREFIX}/old/')) == 3
+
+    monkeypatch.setattr(part_cache_etl, 'code_fingerprint', lambda: 'new')
+    cache = PartCache(BUCKET, 'clean_location', {'columns': ['job_location']}, {'location': 'clean/location/run_date=2024-01-02'}, s3=s3)
+    assert cache.prune() == 3
+    assert s3.keys(BUCKET, CACHE_PREFIX) == []
+
+    _run(s3, raw_parts, '2024-01-02')
+    assert computed == [0, 1, 2]
+    assert cache.prune() == 0
+    assert len(s3.keys(BUCKET, f'{CACHE_PREFIX}/new/')) == 3
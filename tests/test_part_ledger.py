@@ -0,0 +1,102 @@
+import io
+import pandas as pd
+import pytest
+from etl import parallel_parts_etl
+from etl.parallel_parts_etl import run_parts
+from etl.part_ledger_etl import PartLedger, list_etags
+from etl.parquet_writer_etl import put_parquet
+
+BUCKET = 'test-bucket'
+LEDGER_KEY = 'clean/location/run_date=2024-01-01/_ledger.json'
+
+
+@pytest.fixture
+def raw_parts(s3, monkeypatch):
+    #Four raw parts in the fake bucket, read back from it by run_parts' serial path
+    files = []
+    for i in range(4):
+        key = f'raw/run_date=2024-01-01/part_{i + 1}.parquet'
+        put_parquet(pd.DataFrame({'job_location': [f'city {i}', f'town {i}']}), BUCKET, key, s3=s3)
+        files.append(f's3://{BUCKET}/{key}')
+
+    def read_parts(uris, **kwargs):
+        for uri in uris:
+            yield pd.read_parquet(io.BytesIO(s3.objects[(BUCKET, uri[len(f's3://{BUCKET}/'):])]))
+
+    monkeypatch.setattr(parallel_parts_etl, 'read_parts', read_parts)
+    return files
+
+
+computed = []
+
+
+def clean_part(df, i, fail_at=None):
+    if i == fail_at:
+        raise RuntimeError(f'part {i} failed')
+    computed.append(i)
+    key = f'clean/location/run_date=2024-01-01/part_{i + 1:05d}.parquet'
+    put_parquet(df.assign(job_location=df['job_location'].str.upper()), BUCKET, key)
+    return {'outputs': [f's3://{BUCKET}/{key}'], 'rows': len(df)}
+
+
+def _ledger(s3, config=None):
+    return PartLedger(BUCKET, LEDGER_KEY, config=config or {'task': 'clean_location'}, s3=s3)
+
+
+def _run(s3, files, fail_at=None, config=None):
+    computed.clear()
+    return run_parts(clean_part, files, part_args=(fail_at,), ledger=_ledger(s3, config))
+
+
+def test_resume_after_partial_run(s3, raw_parts):
+    with pytest.raises(RuntimeError):
+        _run(s3, raw_parts, fail_at=2)
+    assert computed == [0, 1]
+
+    #The retry skips the parts the failed attempt completed and returns their stored results
+    results = _run(s3, raw_parts)
+    assert computed == [2, 3]
+    assert [r['rows'] for r in results] == [2, 2, 2, 2]
+
+    #Nothing left to do on a second retry
+    _run(s3, raw_parts)
+    assert computed == []
+
+
+def test_changed_input_is_recomputed(s3, raw_parts):
+    _run(s3, raw_parts)
+    put_parquet(pd.DataFrame({'job_location': ['new city']}), BUCKET, 'raw/run_date=2024-01-01/part_2.parquet', s3=s3)
+    results = _run(s3, raw_parts)
+    assert computed == [1]
+    assert results[1]['rows'] == 1
+
+
+def test_missing_output_is_recomputed(s3, raw_parts):
+    _run(s3, raw_parts)
+    del s3.objects[(BUCKET, 'clean/location/run_date=2024-01-01/part_00003.parquet')]
+    _run(s3, raw_parts)
+    assert computed == [2]
+
+
+def test_ledger_with_other_config_is_ignored(s3, raw_parts):
+    _run(s3, raw_parts)
+    _run(s3, raw_parts, config={'task': 'clean_location', 'columns': ['job_location']})
+    assert computed == [0, 1, 2, 3]
+
+
+def test_ledger_round_trip(s3):
+    ledger = _ledger(s3)
+    etags = {'s3://b/raw/part_1.parquet': '"e1"'}
+    ledger.record(['s3://b/raw/part_1.parquet'], etags, [], {'values': {'b', 'a'}})
+    ledger.save()
+
+    reloaded = _ledger(s3)
+    assert reloaded.entries['s3://b/raw/part_1.parquet']['result'] == {'values': ['a', 'b']}
+    assert reloaded.done(['s3://b/raw/part_1.parquet'], etags) is not None
+    assert reloaded.done(['s3://b/raw/part_1.parquet'], {'s3://b/raw/part_1.parquet': '"e2"'}) is None
+
+
+def test_list_etags_missing_object(s3, raw_parts):
+    etags = list_etags(s3, raw_parts + [f's3://{BUCKET}/raw/run_date=2024-01-01/part_9.parquet'])
+    assert etags[raw_parts[0]] == s3.etag(BUCKET, 'raw/run_date=2024-01-01/part_1.parquet')
+    assert etags[f's3://{BUCKET}/raw/run_date=2024-01-01/part_9.parquet'] is None
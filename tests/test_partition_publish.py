@@ -0,0 +1,110 @@
+import json
+import pandas as pd
+import pytest
+from etl.partition_publish_etl import PartitionPublisher, MANIFEST_NAME
+from etl.parquet_validation_etl import TableValidator
+from etl.parquet_reader_etl import STRING_DTYPE
+
+BUCKET = 'test-bucket'
+PREFIX = 'curated/location/run_date=2024-01-01'
+
+
+def _frame(values):
+    return pd.DataFrame({'job_location': pd.array(values, dtype=STRING_DTYPE)})
+
+
+def _publish(s3, parts, validator=None):
+    with PartitionPublisher(BUCKET, PREFIX, s3=s3, validator=validator) as publisher:
+        for name, values in parts.items():
+            df = _frame(values)
+            if validator is not None:
+                validator.update(df)
+            publisher.write(df, name)
+    return json.loads(s3.objects[(BUCKET, f'{PREFIX}/{MANIFEST_NAME}')])
+
+
+def _copies(s3):
+    return [key for call, key in s3.calls if call == 'copy' and not key.endswith(MANIFEST_NAME)]
+
+
+def test_publish_writes_parts_and_manifest(s3):
+    manifest = _publish(s3, {'part_0001.parquet': ['a', 'b'], 'part_0002.parquet': ['c']})
+
+    assert s3.keys(BUCKET, PREFIX) == [f'{PREFIX}/{MANIFEST_NAME}', f'{PREFIX}/part_0001.parquet', f'{PREFIX}/part_0002.parquet']
+    assert manifest['total_rows'] == 3
+    assert [p['name'] for p in manifest['parts']] == ['part_0001.parquet', 'part_0002.parquet']
+    assert s3.keys(BUCKET, 'curated/location/_attempts') == []
+
+
+def test_rerun_with_same_output_copies_nothing(s3):
+    _publish(s3, {'part_0001.parquet': ['a', 'b'], 'part_0002.parquet': ['c']})
+    s3.calls.clear()
+    _publish(s3, {'part_0001.parquet': ['a', 'b'], 'part_0002.parquet': ['c']})
+    assert _copies(s3) == []
+
+
+def test_rerun_replaces_changed_and_removes_stale_parts(s3):
+    _publish(s3, {'part_0001.parquet': ['a', 'b'], 'part_0002.parquet': ['c']})
+    s3.calls.clear()
+    manifest = _publish(s3, {'part_0001.parquet': ['a', 'x']})
+
+    assert _copies(s3) == [f'{PREFIX}/part_0001.parquet']
+    assert s3.keys(BUCKET, PREFIX) == [f'{PREFIX}/{MANIFEST_NAME}', f'{PREFIX}/part_0001.parquet']
+    assert manifest['total_rows'] == 2
+
+
+def test_failure_leaves_live_prefix_untouched(s3):
+    _publish(s3, {'part_0001.parquet': ['a']})
+    before = dict(s3.objects)
+
+    with pytest.raises(RuntimeError):
+        with PartitionPublisher(BUCKET, PREFIX, s3=s3) as publisher:
+            publisher.write(_frame(['z']), 'part_0001.parquet')
+            raise RuntimeError('transform failed')
+
+    assert s3.objects == before
+
+
+def test_nothing_written_keeps_previous_partition(s3):
+    _publish(s3, {'part_0001.parquet': ['a']})
+    before = dict(s3.objects)
+    with PartitionPublisher(BUCKET, PREFIX, s3=s3):
+        pass
+    assert s3.objects == before
+
+
+def test_validation_stats_in_manifest(s3):
+    validator = TableValidator(['job_location'], {'job_location': 10}, ['job_location'])
+    manifest = _publish(s3, {'part_0001.parquet': ['a', 'b'], 'part_0002.parquet': ['c', 'd']}, validator)
+    assert manifest['validation']['rows'] == 4
+    assert manifest['validation']['columns']['job_location']['min'] == 'a'
+    assert manifest['validation']['columns']['job_location']['max'] == 'd'
+
+
+def test_free_text_values_stay_out_of_manifest(s3):
+    #Unbounded non-key text columns keep their counts and lengths but not their min/max values
+    validator = TableValidator(['job_location', 'job_summary'], {'job_location': 10}, ['job_location'])
+    with PartitionPublisher(BUCKET, PREFIX, s3=s3, validator=validator) as publisher:
+        df = _frame(['a', 'b']).assign(job_summary=pd.array(['x' * 5000, 'y'], dtype=STRING_DTYPE))
+        validator.update(df)
+        publisher.write(df, 'part_0001.parquet')
+    summary = json.loads(s3.objects[(BUCKET, f'{PREFIX}/{MANIFEST_NAME}')])['validation']['columns']['job_summary']
+
+    assert summary['max_bytes'] == 5000
+    assert 'min' not in summary and 'max' not in summary
+
+
+def test_failed_validation_publishes_nothing(s3):
+    validator = TableValidator(['job_location'], {'job_location': 3}, ['job_location'])
+    with pytest.raises(ValueError):
+        _publish(s3, {'part_0001.parquet': ['a', 'too long']}, validator)
+    assert s3.keys(BUCKET) == []
+
+
+def test_validator_row_count_must_match_parts(s3):
+    validator = TableValidator(['job_location'], {'job_location': 10}, ['job_location'])
+    with pytest.raises(ValueError, match='Validated'):
+        with PartitionPublisher(BUCKET, PREFIX, s3=s3, validator=validator) as publisher:
+            validator.update(_frame(['a']))
+            publisher.write(_frame(['a', 'b']), 'part_0001.parquet')
+    assert s3.keys(BUCKET) == []
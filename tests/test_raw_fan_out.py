@@ -0,0 +1,169 @@
+import io
+import pandas as pd
+import pytest
+from etl import parallel_parts_etl
+from etl.config import WANTED_COLUMNS
+from etl.raw_fan_out_etl import raw_fan_out
+from etl.cleaning_job_posting_staging import cleaning_job_posting_staging
+from etl.search_context_build_etl import cleaning_search_context_table
+from etl.job_title_etl import cleaning_job_title
+from etl.location_etl import clean_location
+from etl.clean_company_etl import clean_company_parts
+from etl.skills_parsing_etl import explode_skills_frame
+from etl.job_level_etl import job_level_part_values
+from etl.job_type_etl import job_type_part_values
+from etl.parquet_reader_etl import read_part
+
+BUCKET = 'test-bucket'
+PER_PART_TABLES = ['job_postings_staging', 'job_postings_skills_staging', 'search_context', 'job_title_staging',
+                   'location', 'company', 'company_w_unknown']
+
+
+def _raw_frame(i):
+    n = 6
+    return pd.DataFrame({
+        'job_link': [f'https://example.com/{i}/{k}' for k in range(n)],
+        'job_title': ['Registered Nurse - Remote', ' Barista ', None, 'Data  Analyst - London', 'N/A', 'Welder'],
+        'company': ['Acme', ' acme ', None, 'Globex', 'n/a', 'Initech'],
+        'job_location': ['New York, NY', ' london ', None, 'Paris', '-', 'Austin, TX'],
+        'search_city': ['New York', 'London', 'Paris', None, 'Austin', 'Austin'],
+        'search_country': ['United States', 'United Kingdom', 'France', 'France', None, 'United States'],
+        'search_position': ['Nurse', 'Barista', 'Analyst', 'Analyst', 'Welder', None],
+        'job_level': ['Mid senior', 'Associate', 'Associate', 'Mid senior', 'Associate', 'Mid senior'],
+        'job_type': ['Onsite', 'Remote', 'Hybrid', 'Onsite', 'Onsite', 'Remote'],
+        'job_summary': [f'summary {k}' for k in range(n)],
+        'job_skills': ['python, sql', None, 'Excel,  SQL', 'python', '', f'skill {i}'],
+    })
+
+
+@pytest.fixture
+def raw_files(s3, monkeypatch, tmp_path):
+    #Raw parts under two run_dates (same bytes, so the same ETags) in the fake bucket. Reads go through the real
+    #read_part on a local copy, so column projection and dictionary decoding match production
+    local = {}
+    files = {}
+    for run_date in ('2024-01-01', '2024-01-02'):
+        files[run_date] = []
+        for i in range(2):
+            path = tmp_path / f'raw_{i}.parquet'
+            _raw_frame(i).to_parquet(path, index=False)
+            key = f'raw/run_date={run_date}/part_{i + 1:05d}.parquet'
+            s3.put_object(Bucket=BUCKET, Key=key, Body=path.read_bytes())
+            uri = f's3://{BUCKET}/{key}'
+            local[uri] = str(path)
+            files[run_date].append(uri)
+
+    reads = []
+
+    def read_parts(uris, columns=None, filter=None, read_options=None):
+        for uri in uris:
+            reads.append(uri)
+            yield read_part(local[uri], columns, filter)
+
+    monkeypatch.setattr(parallel_parts_etl, 'read_parts', read_parts)
+    files['reads'] = reads
+    files['local'] = local
+    return files
+
+
+def _prefixes(root, run_date='2024-01-01'):
+    return {table: f'{root}/{table}/run_date={run_date}' for table in PER_PART_TABLES + ['job_type', 'job_level']}
+
+
+def _parts(s3, prefix):
+    return {key[len(prefix) + 1:]: pd.read_parquet(io.BytesIO(s3.objects[(BUCKET, key)]))
+            for key in s3.keys(BUCKET, f'{prefix}/') if key.endswith('.parquet')}
+
+
+def _fan_out(files, prefixes, **kwargs):
+    raw_fan_out(files, BUCKET, prefixes, WANTED_COLUMNS, **kwargs)
+
+
+def test_outputs_match_standalone_cleaners(s3, raw_files):
+    files = raw_files['2024-01-01']
+    fan_out = _prefixes('fan_out')
+    _fan_out(files, fan_out)
+
+    standalone = _prefixes('standalone')
+    cleaning_job_posting_staging(files, WANTED_COLUMNS['job_postings_staging'], BUCKET, standalone['job_postings_staging'])
+    cleaning_search_context_table(files, WANTED_COLUMNS['search_context'], BUCKET, standalone['search_context'])
+    cleaning_job_title(files, BUCKET, standalone['job_title_staging'])
+    clean_location(files, BUCKET, standalone['location'])
+    clean_company_parts(files, BUCKET, standalone['company'], standalone['company_w_unknown'], False)
+
+    expected_names = {'job_postings_staging': ['part_00001.parquet', 'part_00002.parquet'],
+                      'search_context': ['part_00001.parquet', 'part_00002.parquet'],
+                      'job_title_staging': ['part_00000.parquet', 'part_00001.parquet'],
+                      'location': ['part_00000.parquet', 'part_00001.parquet'],
+                      'company': ['part_00000.parquet', 'part_00001.parquet'],
+                      'company_w_unknown': ['part_00000.parquet', 'part_00001.parquet']}
+    for table, names in expected_names.items():
+        ours, theirs = _parts(s3, fan_out[table]), _parts(s3, standalone[table])
+        assert sorted(ours) == sorted(theirs) == names, table
+        for name in names:
+            pd.testing.assert_frame_equal(ours[name], theirs[name], obj=f'{table}/{name}')
+
+    #Skills: one output per raw part, named after it, equal to exploding that part on its own
+    skills = _parts(s3, fan_out['job_postings_skills_staging'])
+    assert sorted(skills) == ['part_00001_001.parquet', 'part_00002_001.parquet']
+    for i, file in enumerate(files):
+        expected = explode_skills_frame(read_part(raw_files['local'][file]), WANTED_COLUMNS['job_postings_skills_staging'])
+        pd.testing.assert_frame_equal(skills[f'part_{i + 1:05d}_001.parquet'], expected.reset_index(drop=True))
+
+
+def test_dimensions_aggregate_every_part(s3, raw_files):
+    files = raw_files['2024-01-01']
+    prefixes = _prefixes('fan_out')
+    _fan_out(files, prefixes)
+
+    for table, part_values in (('job_type', job_type_part_values), ('job_level', job_level_part_values)):
+        expected = set().union(*(part_values(read_part(raw_files['local'][f]))[2] for f in files))
+        written = _parts(s3, prefixes[table])
+        assert list(written) == ['data.parquet']
+        assert list(written['data.parquet'][table]) == sorted(expected)
+
+
+def test_resume_replays_from_ledger(s3, raw_files):
+    files = raw_files['2024-01-01']
+    prefixes = _prefixes('fan_out')
+    _fan_out(files, prefixes, resume=True)
+    first = {table: _parts(s3, prefix) for table, prefix in prefixes.items()}
+    assert len(raw_files['reads']) == 2
+
+    _fan_out(files, prefixes, resume=True)
+    assert len(raw_files['reads']) == 2
+    for table, prefix in prefixes.items():
+        again = _parts(s3, prefix)
+        assert sorted(again) == sorted(first[table])
+        for name in again:
+            pd.testing.assert_frame_equal(again[name], first[table][name])
+
+
+def test_cache_replays_identical_raw_parts_under_another_run_date(s3, raw_files):
+    day_one, day_two = _prefixes('fan_out', '2024-01-01'), _prefixes('fan_out', '2024-01-02')
+    _fan_out(raw_files['2024-01-01'], day_one, use_cache=True)
+    assert len(raw_files['reads']) == 2
+
+    _fan_out(raw_files['2024-01-02'], day_two, use_cache=True)
+    #Every part was a cache hit: nothing read, outputs copied under the new run_date
+    assert len(raw_files['reads']) == 2
+    for table in day_one:
+        ours, theirs = _parts(s3, day_two[table]), _parts(s3, day_one[table])
+        assert sorted(ours) == sorted(theirs), table
+        for name in ours:
+            pd.testing.assert_frame_equal(ours[name], theirs[name])
+
+
+def test_stale_parts_of_an_earlier_run_are_deleted(s3, raw_files):
+    prefixes = _prefixes('fan_out')
+    for table in PER_PART_TABLES:
+        s3.put_object(Bucket=BUCKET, Key=f'{prefixes[table]}/part_00009.parquet', Body=b'stale')
+    s3.put_object(Bucket=BUCKET, Key=f"{prefixes['job_postings_skills_staging']}/part_00001_002.parquet", Body=b'stale')
+
+    _fan_out(raw_files['2024-01-01'], prefixes, resume=True)
+
+    for table in PER_PART_TABLES:
+        names = [key.rsplit('/', 1)[1] for key in s3.keys(BUCKET, f'{prefixes[table]}/')]
+        assert 'part_00009.parquet' not in names and 'part_00001_002.parquet' not in names, table
+    #The ledger (not a part) stays
+    assert s3.keys(BUCKET, f"{prefixes['job_postings_staging']}/_ledger")
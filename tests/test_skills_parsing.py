@@ -0,0 +1,69 @@
+import re
+import pandas as pd
+import pyarrow as pa
+import pytest
+from etl.skills_parsing_etl import explode_skills_frame
+from etl.parquet_reader_etl import STRING_DTYPE
+
+WANTED = ['job_skills', 'job_link']
+
+
+def _pandas_explode(df):
+    #The replaced implementation: split, explode, normalise, drop empty, drop duplicates
+    df = df[WANTED].copy()
+    df['job_skills'] = df['job_skills'].astype(object).where(df['job_skills'].notna(), None)
+    df['job_skills'] = df['job_skills'].map(lambda v: v.split(',') if isinstance(v, str) else v)
+    df = df.explode('job_skills').dropna(subset=['job_skills'])
+    df['job_skills'] = df['job_skills'].map(lambda v: re.sub(r'\s+', ' ', v).strip().casefold())
+    df = df[df['job_skills'] != '']
+    return df.drop_duplicates(subset=WANTED)[WANTED].reset_index(drop=True)
+
+
+def _assert_parity(df):
+    result = explode_skills_frame(df, WANTED)
+    expected = _pandas_explode(df)
+    assert list(result.columns) == WANTED
+    assert result['job_skills'].dtype == STRING_DTYPE
+    assert result['job_skills'].tolist() == expected['job_skills'].tolist()
+    assert [None if pd.isna(v) else v for v in result['job_link']] == [None if pd.isna(v) else v for v in expected['job_link']]
+
+
+def test_matches_pandas_explode():
+    _assert_parity(pd.DataFrame({
+        'job_skills': ['Python, SQL,python ,  Machine   Learning', None, 'Excel,,excel', ' ', 'SQL, Straße', 'Python',
+                       'Nursing,CPR , nursing'],
+        'job_link': ['l1', 'l2', 'l3', 'l4', 'l5', 'l1', None],
+    }, dtype=STRING_DTYPE))
+
+
+def test_duplicate_and_null_links():
+    _assert_parity(pd.DataFrame({
+        'job_skills': ['A, B', 'b, c', 'A', 'x', 'X ,y'],
+        'job_link': ['l1', 'l1', None, None, 'l2'],
+    }, dtype=STRING_DTYPE))
+
+
+def test_all_null_and_empty_parts():
+    nulls = pd.DataFrame({'job_skills': pd.Series([None, None], dtype=STRING_DTYPE), 'job_link': ['l1', 'l2']})
+    assert explode_skills_frame(nulls, WANTED).empty
+    empty = pd.DataFrame({'job_skills': pd.Series([], dtype=STRING_DTYPE), 'job_link': pd.Series([], dtype=STRING_DTYPE)})
+    result = explode_skills_frame(empty, WANTED)
+    assert result.empty and list(result.columns) == WANTED
+
+
+def test_multi_chunk_column():
+    #Parts read from several row groups arrive as multi-chunk Arrow columns
+    chunked = pa.chunked_array([pa.array(['a, b', 'c'], pa.large_string()), pa.array(['b, a'], pa.large_string())])
+    df = pd.DataFrame({'job_skills': pd.Series(pd.arrays.ArrowExtensionArray(chunked)).astype(STRING_DTYPE),
+                       'job_link': ['l1', 'l2', 'l1']})
+    _assert_parity(df)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_random_parts(seed):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    vocab = ['Python', ' python', 'SQL', 'sql ', 'Excel', '', 'Project  Management', 'CPR']
+    skills = [None if rng.random() < 0.1 else ','.join(rng.choice(vocab, rng.integers(1, 5))) for _ in range(300)]
+    links = [f'l{int(i)}' for i in rng.integers(0, 80, 300)]
+    _assert_parity(pd.DataFrame({'job_skills': skills, 'job_link': links}, dtype=STRING_DTYPE))
@@ -0,0 +1,81 @@
+import re
+import sys
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pytest
+from etl import text_normalise_etl
+from etl.text_normalise_etl import normalise_text, normalise_frame, WHITESPACE_CHARS
+from etl.parquet_reader_etl import STRING_DTYPE
+
+SAMPLES = ['  Senior   Data\tEngineer ', 'STRASSE straße', 'ΣΊΣΥΦΟΣ ς', 'İstanbul', 'ﬁnance ﬀ', 'Ꭰ Cherokee',
+           'a b c　', ' line ', 'ǰ ŉ', 'µ', '', '   ', 'already clean', 'Ünïcödé',
+           'ԷՐԵՎԱՆ և']
+
+
+def _pandas_chain(value, collapse_whitespace=True, strip=True, casefold=True):
+    #The replaced per-module chain, applied to Python strings:
+    #.str.replace(r'\s+', ' ', regex=True).str.strip().str.casefold()
+    if value is None:
+        return None
+    if collapse_whitespace:
+        value = re.sub(r'\s+', ' ', value)
+    if strip:
+        value = value.strip()
+    if casefold:
+        value = value.casefold()
+    return value
+
+
+def test_whitespace_constant_matches_python():
+    assert WHITESPACE_CHARS == ''.join(chr(c) for c in range(sys.maxunicode + 1) if chr(c).isspace())
+
+
+def test_casefold_exceptions_match_installed_unicode_tables():
+    #Recompute the precomputed ranges from every codepoint with the installed Python and pyarrow
+    chars = [chr(c) for c in range(sys.maxunicode + 1) if not 0xD800 <= c <= 0xDFFF]
+    lowered = pc.utf8_lower(pa.array(chars)).to_pylist()
+    expected = {ord(c) for c, low in zip(chars, lowered) if low != c.casefold()}
+    ranges = {c for a, b in text_normalise_etl._CASEFOLD_EXCEPTION_RANGES for c in range(a, b + 1)}
+    assert ranges == expected
+
+
+@pytest.mark.parametrize('options', [{}, {'collapse_whitespace': False}, {'strip': False}, {'casefold': False},
+                                     {'collapse_whitespace': False, 'strip': True, 'casefold': True}])
+def test_matches_pandas_chain(options):
+    series = pd.Series(SAMPLES + [None], index=range(10, 10 + len(SAMPLES) + 1), name='job_title', dtype=object)
+    result = normalise_text(series, **options)
+    assert result.dtype == STRING_DTYPE
+    assert result.name == 'job_title' and list(result.index) == list(series.index)
+    assert [None if pd.isna(v) else v for v in result] == [_pandas_chain(v, **options) for v in series]
+
+
+def test_every_casefold_exception_character():
+    chars = [chr(c) for a, b in text_normalise_etl._CASEFOLD_EXCEPTION_RANGES for c in range(a, b + 1)]
+    values = [f'Ab{c}Cd' for c in chars]
+    assert list(normalise_text(pd.Series(values, dtype=STRING_DTYPE))) == [_pandas_chain(v) for v in values]
+
+
+def test_empty_and_all_null():
+    assert len(normalise_text(pd.Series([], dtype=STRING_DTYPE))) == 0
+    result = normalise_text(pd.Series([None, None], dtype=STRING_DTYPE))
+    assert result.isna().all() and result.dtype == STRING_DTYPE
+
+
+def test_non_string_values_are_stringified():
+    assert list(normalise_text(pd.Series([1, 22], dtype='int64'))) == ['1', '22']
+
+
+def test_categorical_normalises_categories():
+    series = pd.Series(['  Mid-Senior  level', 'ENTRY level', '  Mid-Senior  level', None], dtype='category')
+    result = normalise_text(series)
+    assert isinstance(result.dtype, pd.CategoricalDtype)
+    assert [None if pd.isna(v) else v for v in result] == ['mid-senior level', 'entry level', 'mid-senior level', None]
+
+
+def test_normalise_frame_keeps_requested_columns():
+    df = pd.DataFrame({'a': [' X '], 'b': ['Y'], 'c': ['z']})
+    result = normalise_frame(df, ['a', 'b'])
+    assert list(result.columns) == ['a', 'b']
+    assert result.iloc[0].tolist() == ['x', 'y']
+    assert df['a'].iloc[0] == ' X '
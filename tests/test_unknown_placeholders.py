@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+from etl.config import UNKNOWN_PLACEHOLDERS
+from etl.parquet_reader_etl import STRING_DTYPE
+from etl.unknown_placeholders_replace_etl import replace_unknown_placeholders
+
+PLACEHOLDERS = UNKNOWN_PLACEHOLDERS['default']
+
+VALUES = {
+    'mixed': ['Acme', 'n/a', '', None, 'unknown', 'N/A', ' n/a ', 'nan', 'Globex', '?'],
+    'no placeholders': ['Acme', 'Globex', None],
+    'only placeholders': ['', '-', 'none'],
+    'empty': [],
+}
+
+
+@pytest.mark.parametrize('name', list(VALUES))
+@pytest.mark.parametrize('dtype', [STRING_DTYPE, object])
+def test_matches_series_replace(name, dtype):
+    series = pd.Series(VALUES[name], dtype=dtype, name='company')
+    pd.testing.assert_series_equal(replace_unknown_placeholders(series), series.replace(PLACEHOLDERS, pd.NA))
+
+
+@pytest.mark.parametrize('name', list(VALUES))
+def test_categorical_matches_series_replace(name):
+    #Unused categories, placeholders among them: they are dropped too, and never counted
+    series = pd.Series(VALUES[name], dtype='category', name='company').cat.add_categories(['unused', '-zz', 'na'])
+    expected = series.replace(PLACEHOLDERS, pd.NA)
+    counts = {}
+    result = replace_unknown_placeholders(series, counts=counts)
+
+    assert isinstance(result.dtype, pd.CategoricalDtype)
+    pd.testing.assert_series_equal(result.astype(object), expected.astype(object))
+    #Same categories as Series.replace, minus the placeholders nothing can hold any more
+    assert set(result.cat.categories) == set(expected.cat.categories) - set(PLACEHOLDERS)
+    assert counts.get('company', {}) == {value: n for value, n in series.value_counts().items() if value in PLACEHOLDERS and n}
+
+
+def test_frame_uses_per_column_placeholders():
+    df = pd.DataFrame({'company': pd.array(['-', 'Acme', 'n/a'], dtype=STRING_DTYPE),
+                       'job_level': pd.Categorical(['-', 'Associate', 'n/a']),
+                       'job_summary': pd.array(['-', 'text', None], dtype=object)})
+    placeholders = {'default': PLACEHOLDERS, 'job_level': ['n/a']}
+    result = replace_unknown_placeholders(df, placeholders)
+
+    for col in ('company', 'job_summary'):
+        pd.testing.assert_series_equal(result[col], df[col].replace(PLACEHOLDERS, pd.NA))
+    assert list(result['job_level'].astype(object)) == list(df['job_level'].replace(['n/a'], pd.NA).astype(object))